@@ -58,10 +58,25 @@ def redis_hget(key1, key2):
     return _redis.hget(key1, key2)
 
 
-def redis_set(key, value, ttl=None):
+def redis_set(key, value, ttl=None, nx=False):
     if not redis_healthcheck():
         return
-    return _redis.set(key, value, ex=ttl)
+    return _redis.set(key, value, ex=ttl, nx=nx)
+
+
+def redis_mget(keys):
+    if not redis_healthcheck() or not keys:
+        return [None] * len(keys)
+    return _redis.mget(keys)
+
+
+def redis_set_many(mapping, ttl=None):
+    if not redis_healthcheck() or not mapping:
+        return
+    pipeline = _redis.pipeline(transaction=False)
+    for key, value in mapping.items():
+        pipeline.set(key, value, ex=ttl)
+    return pipeline.execute()
 
 
 def redis_hset(key1, key2, value):
@@ -76,6 +91,37 @@ def redis_delete(key):
     return _redis.delete(key)
 
 
+def redis_incr(key):
+    if not redis_healthcheck():
+        return
+    return _redis.incr(key)
+
+
+def redis_rpush(key, values, ttl=None, replace=False):
+    if not redis_healthcheck():
+        return
+    pipeline = _redis.pipeline()
+    if replace:
+        pipeline.delete(key)
+    if values:
+        pipeline.rpush(key, *values)
+    if ttl is not None:
+        pipeline.expire(key, ttl)
+    return pipeline.execute()
+
+
+def redis_lpop(key):
+    if not redis_healthcheck():
+        return
+    return _redis.lpop(key)
+
+
+def redis_llen(key):
+    if not redis_healthcheck():
+        return 0
+    return _redis.llen(key)
+
+
 def start_job_async_or_sync(job, *args, in_seconds=0, **kwargs):
     """
     Start job async with redis or sync if redis is not connected
@@ -408,6 +408,7 @@ SENTRY_IGNORED_EXCEPTIONS = [
 
 ROOT_URLCONF = 'core.urls'
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 GRAPHIQL = True
 
 # Internationalization
@@ -506,23 +507,45 @@ os.makedirs(TEST_DATA_ROOT, exist_ok=True)
 EXPORT_DIR = os.path.join(BASE_DATA_DIR, 'export')
 EXPORT_URL_ROOT = '/export/'
 EXPORT_MIXIN = 'data_export.mixins.ExportMixin'
+# tasks per shard file and number of threads serializing shards of one export
+EXPORT_SHARD_SIZE = int(get_env('EXPORT_SHARD_SIZE', 10000))
+EXPORT_WORKERS = int(get_env('EXPORT_WORKERS', 4))
+# background export jobs are retried after failures and worker crashes, retries continue from completed shards
+EXPORT_JOB_RETRIES = int(get_env('EXPORT_JOB_RETRIES', 3))
+EXPORT_JOB_RETRY_INTERVAL = int(get_env('EXPORT_JOB_RETRY_INTERVAL', 60))
 # old export dir
 os.makedirs(EXPORT_DIR, exist_ok=True)
 # dir for delayed export
 DELAYED_EXPORT_DIR = 'export'
 os.makedirs(os.path.join(BASE_DATA_DIR, MEDIA_ROOT, DELAYED_EXPORT_DIR), exist_ok=True)
+# total size of converted export files kept for reuse, the least recently used are removed above it (0 - no limit)
+CONVERTED_FORMATS_CACHE_MAX_SIZE = int(get_env('CONVERTED_FORMATS_CACHE_MAX_SIZE', 10 * 1024 * 1024 * 1024))
 
 # file / task size limits
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(get_env('DATA_UPLOAD_MAX_MEMORY_SIZE', 250 * 1024 * 1024))
 DATA_UPLOAD_MAX_NUMBER_FILES = int(get_env('DATA_UPLOAD_MAX_NUMBER_FILES', 100))
 TASKS_MAX_NUMBER = 1000000
 TASKS_MAX_FILE_SIZE = DATA_UPLOAD_MAX_MEMORY_SIZE
+# async imports of uploaded files of this total size or larger are parsed, validated and saved by chunks,
+# tasks of the saved chunks are visible in the project while the import is running
+IMPORT_STREAMING_MIN_FILE_SIZE = int(get_env('IMPORT_STREAMING_MIN_FILE_SIZE', 10 * 1024 * 1024))
+IMPORT_STREAMING_CHUNK_SIZE = int(get_env('IMPORT_STREAMING_CHUNK_SIZE', 1000))
 
 TASK_LOCK_TTL = int(get_env('TASK_LOCK_TTL', default=86400))
 
 LABEL_STREAM_HISTORY_LIMIT = int(get_env('LABEL_STREAM_HISTORY_LIMIT', default=100))
 
 RANDOM_NEXT_TASK_SAMPLE_SIZE = int(get_env('RANDOM_NEXT_TASK_SAMPLE_SIZE', 50))
+# pick next task with one set-based query (lock & annotation counts in WHERE, FOR UPDATE SKIP LOCKED)
+# instead of checking Task.has_lock() for candidates one by one
+NEXT_TASK_SET_BASED_SELECTION = get_bool_env('NEXT_TASK_SET_BASED_SELECTION', True)
+NEXT_TASK_SELECTION_BATCH_SIZE = int(get_env('NEXT_TASK_SELECTION_BATCH_SIZE', 50))
+# prefetched per-annotator next task queues in redis, see projects.functions.next_task_queue
+NEXT_TASK_QUEUE_ENABLED = get_bool_env('NEXT_TASK_QUEUE_ENABLED', False)
+NEXT_TASK_QUEUE_SIZE = int(get_env('NEXT_TASK_QUEUE_SIZE', 100))
+NEXT_TASK_QUEUE_WATERMARK = int(get_env('NEXT_TASK_QUEUE_WATERMARK', 20))
+NEXT_TASK_QUEUE_MAX_POPS = int(get_env('NEXT_TASK_QUEUE_MAX_POPS', 5))
+NEXT_TASK_QUEUE_TTL = int(get_env('NEXT_TASK_QUEUE_TTL', 600))
 
 TASK_API_PAGE_SIZE_MAX = int(get_env('TASK_API_PAGE_SIZE_MAX', 0)) or None
 
@@ -549,6 +572,10 @@ REACT_APP_ROOT = os.path.join(BASE_DIR, '../../web/dist/apps/labelstudio')
 
 # per project settings
 BATCH_SIZE = 1000
+# tasks per UPDATE statement when task counters are recalculated without PostgreSQL
+UPDATE_TASKS_COUNTERS_CHUNK_SIZE = int(get_env('UPDATE_TASKS_COUNTERS_CHUNK_SIZE', 10000))
+# max time a project summary compaction job is considered pending, new jobs aren't scheduled meanwhile
+PROJECT_SUMMARY_COMPACTION_TTL = int(get_env('PROJECT_SUMMARY_COMPACTION_TTL', 600))
 PROJECT_TITLE_MIN_LEN = 3
 PROJECT_TITLE_MAX_LEN = 50
 LOGIN_REDIRECT_URL = '/'
@@ -586,6 +613,13 @@ DATA_MANAGER_ANNOTATIONS_MAP = {}
 DATA_MANAGER_ACTIONS = {}
 DATA_MANAGER_CUSTOM_FILTER_EXPRESSIONS = 'data_manager.functions.custom_filter_expressions'
 DATA_MANAGER_PREPROCESS_FILTER = 'data_manager.functions.preprocess_filter'
+# read aggregated Data Manager columns from data_manager.MaterializedTaskColumns when they are built for a project
+DATA_MANAGER_MATERIALIZED_COLUMNS = get_bool_env('DATA_MANAGER_MATERIALIZED_COLUMNS', False)
+DATA_MANAGER_TASK_COUNT_CACHE_TIMEOUT = int(get_env('DATA_MANAGER_TASK_COUNT_CACHE_TIMEOUT', 30))
+# number of compiled data manager view query plans kept in memory per process, 0 disables plan caching
+DATA_MANAGER_QUERY_PLAN_CACHE_SIZE = int(get_env('DATA_MANAGER_QUERY_PLAN_CACHE_SIZE', 1000))
+# how long requests to retrieve ML predictions for the same Data Manager page are coalesced into one background job
+DATA_MANAGER_PREDICTIONS_FILL_TTL = int(get_env('DATA_MANAGER_PREDICTIONS_FILL_TTL', 600))
 USER_LOGIN_FORM = 'users.forms.LoginForm'
 PROJECT_MIXIN = 'projects.mixins.ProjectMixin'
 TASK_MIXIN = 'tasks.mixins.TaskMixin'
@@ -671,6 +705,16 @@ COLLECT_ANALYTICS = get_bool_env('COLLECT_ANALYTICS', get_bool_env('collect_anal
 SVG_SECURITY_CLEANUP = get_bool_env('SVG_SECURITY_CLEANUP', False)
 
 ML_BLOCK_LOCAL_IP = get_bool_env('ML_BLOCK_LOCAL_IP', False)
+# predictions are requested from ML backend in batches of N tasks sent by M concurrent requests,
+# failed batches are retried with exponential backoff
+ML_PREDICT_BATCH_SIZE = int(get_env('ML_PREDICT_BATCH_SIZE', 100))
+ML_PREDICT_CONCURRENCY = int(get_env('ML_PREDICT_CONCURRENCY', 4))
+ML_PREDICT_MAX_RETRIES = int(get_env('ML_PREDICT_MAX_RETRIES', 3))
+ML_PREDICT_RETRY_BACKOFF = float(get_env('ML_PREDICT_RETRY_BACKOFF', 1.0))
+# ML backend responses are reused for tasks with the same data, model version and context
+ML_PREDICTION_CACHE_ENABLED = get_bool_env('ML_PREDICTION_CACHE_ENABLED', False)
+ML_PREDICTION_CACHE_TTL = int(get_env('ML_PREDICTION_CACHE_TTL', 7 * 24 * 60 * 60))  # seconds
+ML_PREDICTION_CACHE_MAX_SIZE = int(get_env('ML_PREDICTION_CACHE_MAX_SIZE', 100000))  # entries per ML backend
 
 RQ_LONG_JOB_TIMEOUT = int(get_env('RQ_LONG_JOB_TIMEOUT', 36000))
 
@@ -681,7 +725,30 @@ BATCH_JOB_RETRY_TIMEOUT = int(get_env('BATCH_JOB_RETRY_TIMEOUT', 60))
 FUTURE_SAVE_TASK_TO_STORAGE = get_bool_env('FUTURE_SAVE_TASK_TO_STORAGE', default=False)
 FUTURE_SAVE_TASK_TO_STORAGE_JSON_EXT = get_bool_env('FUTURE_SAVE_TASK_TO_STORAGE_JSON_EXT', default=True)
 STORAGE_IN_PROGRESS_TIMER = float(get_env('STORAGE_IN_PROGRESS_TIMER', 5.0))
+# storage sync & export progress is written to the database at most once per N seconds or every M processed items
+STORAGE_PROGRESS_FLUSH_SECONDS = float(get_env('STORAGE_PROGRESS_FLUSH_SECONDS', STORAGE_IN_PROGRESS_TIMER))
+STORAGE_PROGRESS_FLUSH_ITEMS = int(get_env('STORAGE_PROGRESS_FLUSH_ITEMS', 10000))
 STORAGE_EXPORT_CHUNK_SIZE = int(get_env('STORAGE_EXPORT_CHUNK_SIZE', 100))
+# number of storage objects written to DB in one bulk transaction during import storage sync
+STORAGE_IMPORT_BATCH_SIZE = int(get_env('STORAGE_IMPORT_BATCH_SIZE', 100))
+# number of storage keys checked against existing storage links in one query during import storage sync
+STORAGE_IMPORT_KEYS_PAGE_SIZE = int(get_env('STORAGE_IMPORT_KEYS_PAGE_SIZE', 1000))
+# number of threads downloading and parsing storage objects ahead of task creation during import storage sync,
+# and the maximum size of downloaded but not yet processed data, storage classes can override both
+STORAGE_IMPORT_PREFETCH_WORKERS = int(get_env('STORAGE_IMPORT_PREFETCH_WORKERS', 8))
+STORAGE_IMPORT_PREFETCH_MAX_BYTES = int(get_env('STORAGE_IMPORT_PREFETCH_MAX_BYTES', 64 * 1024 * 1024))
+# cloud storage clients kept per process, their max age in seconds (0 - unlimited) and HTTP connections
+# per client, 0 means it's sized by the number of import prefetch and export threads
+STORAGE_CLIENT_POOL_SIZE = int(get_env('STORAGE_CLIENT_POOL_SIZE', 64))
+STORAGE_CLIENT_POOL_MAX_AGE = int(get_env('STORAGE_CLIENT_POOL_MAX_AGE', 3600))
+STORAGE_CLIENT_MAX_POOL_CONNECTIONS = int(get_env('STORAGE_CLIENT_MAX_POOL_CONNECTIONS', 0))
+# presigned urls kept in memory per process (0 disables the cache), optionally shared through redis;
+# an url is cached for the share of the storage presign_ttl, so it stays valid for the rest of the ttl
+PRESIGNED_URL_CACHE_SIZE = int(get_env('PRESIGNED_URL_CACHE_SIZE', 10000))
+PRESIGNED_URL_CACHE_REDIS = get_bool_env('PRESIGNED_URL_CACHE_REDIS', False)
+PRESIGNED_URL_CACHE_TTL_RATIO = float(get_env('PRESIGNED_URL_CACHE_TTL_RATIO', 0.5))
+# sign storage urls of the data manager page in one pass while the page is loaded
+PRESIGNED_URL_CACHE_PREFETCH = get_bool_env('PRESIGNED_URL_CACHE_PREFETCH', False)
 
 USE_NGINX_FOR_EXPORT_DOWNLOADS = get_bool_env('USE_NGINX_FOR_EXPORT_DOWNLOADS', False)
 
@@ -848,3 +915,17 @@ RESOLVER_PROXY_GCS_DOWNLOAD_URL = get_env(
 RESOLVER_PROXY_GCS_HTTP_TIMEOUT = int(get_env('RESOLVER_PROXY_GCS_HTTP_TIMEOUT', 5))
 RESOLVER_PROXY_ENABLE_ETAG_CACHE = get_bool_env('RESOLVER_PROXY_ENABLE_ETAG_CACHE', True)
 RESOLVER_PROXY_CACHE_TIMEOUT = int(get_env('RESOLVER_PROXY_CACHE_TIMEOUT', 3600))
+# local disk read-through cache of proxied storage objects, max size in bytes (0 disables the cache),
+# the max size of one cached object and seconds while the object ETag isn't checked in the storage again
+RESOLVER_PROXY_DISK_CACHE_DIR = get_env('RESOLVER_PROXY_DISK_CACHE_DIR', os.path.join(BASE_DATA_DIR, 'proxy_cache'))
+RESOLVER_PROXY_DISK_CACHE_MAX_SIZE = int(get_env('RESOLVER_PROXY_DISK_CACHE_MAX_SIZE', 0))
+RESOLVER_PROXY_DISK_CACHE_MAX_OBJECT_SIZE = int(get_env('RESOLVER_PROXY_DISK_CACHE_MAX_OBJECT_SIZE', 1024**3))
+RESOLVER_PROXY_DISK_CACHE_INFO_TTL = int(get_env('RESOLVER_PROXY_DISK_CACHE_INFO_TTL', 10))
+# threads downloading missed objects into the disk cache while the requests are streamed from storages
+RESOLVER_PROXY_DISK_CACHE_FILL_WORKERS = int(get_env('RESOLVER_PROXY_DISK_CACHE_FILL_WORKERS', 4))
+# async storage proxy for ASGI deployments: objects are streamed from signed urls in the event loop,
+# so the stream time limit is longer than RESOLVER_PROXY_TIMEOUT of the sync proxy
+RESOLVER_PROXY_ASYNC = get_bool_env('RESOLVER_PROXY_ASYNC', False)
+RESOLVER_PROXY_ASYNC_TIMEOUT = int(get_env('RESOLVER_PROXY_ASYNC_TIMEOUT', 600))
+RESOLVER_PROXY_ASYNC_HTTP_TIMEOUT = int(get_env('RESOLVER_PROXY_ASYNC_HTTP_TIMEOUT', 10))
+RESOLVER_PROXY_ASYNC_MAX_CONNECTIONS = int(get_env('RESOLVER_PROXY_ASYNC_MAX_CONNECTIONS', 1000))
@@ -15,6 +15,7 @@ from django.core.files import File
 from django.core.files.storage import FileSystemStorage
 from django.db import transaction
 from django.http import FileResponse, HttpResponse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from drf_yasg import openapi as openapi
 from drf_yasg.utils import swagger_auto_schema
@@ -262,19 +263,24 @@ class ExportAPI(generics.RetrieveAPIView):
 
         task_ids = query.values_list('id', flat=True)
 
-        logger.debug('Serialize tasks for export')
-        tasks = []
-        for _task_ids in batch(task_ids, 1000):
-            tasks += ExportDataSerializer(
-                self.get_task_queryset(query.filter(id__in=_task_ids)),
-                many=True,
-                expand=['drafts'],
-                context={'interpolate_key_frames': interpolate_key_frames},
-            ).data
-        logger.debug('Prepare export files')
+        def iter_tasks():
+            for _task_ids in batch(task_ids, 1000):
+                yield from ExportDataSerializer(
+                    self.get_task_queryset(query.filter(id__in=_task_ids)),
+                    many=True,
+                    expand=['drafts'],
+                    context={'interpolate_key_frames': interpolate_key_frames},
+                ).data
+
+        logger.debug('Serialize tasks and prepare export files')
 
         export_file, content_type, filename = DataExport.generate_export_file(
-            project, tasks, export_type, download_resources, request.GET, hostname=request.build_absolute_uri('/')
+            project,
+            iter_tasks(),
+            export_type,
+            download_resources,
+            request.GET,
+            hostname=request.build_absolute_uri('/'),
         )
 
         r = FileResponse(export_file, as_attachment=True, content_type=content_type, filename=filename)
@@ -625,6 +631,8 @@ class ExportDownloadAPI(generics.RetrieveAPIView):
             file = snapshot.file
             if export_type is not None and export_type != 'JSON':
                 converted_file = snapshot.converted_formats.filter(export_type=export_type).first()
+                if converted_file is None:
+                    converted_file = ConvertedFormat.use_cached(snapshot, export_type, created_by=request.user)
                 if converted_file is None:
                     raise NotFound(f'{export_type} format is not converted yet')
                 file = converted_file.file
@@ -656,6 +664,8 @@ class ExportDownloadAPI(generics.RetrieveAPIView):
         else:
             if export_type is None:
                 file_ = snapshot.file
+            elif (cached := ConvertedFormat.use_cached(snapshot, export_type, created_by=request.user)) is not None:
+                file_ = File(cached.file.open('rb'), name=os.path.basename(cached.file.name))
             else:
                 file_ = snapshot.convert_file(export_type)
 
@@ -684,6 +694,8 @@ def async_convert(converted_format_id, export_type, project, hostname, download_
         converted_format.save(update_fields=['status'])
 
     snapshot = converted_format.export
+    # conversion cache key, identical snapshots reuse this file while the label config is the same
+    cache_md5 = ConvertedFormat.get_cache_md5(snapshot)
     converted_file = snapshot.convert_file(export_type, download_resources=download_resources, hostname=hostname)
     if converted_file is None:
         raise ValidationError('No converted file found, probably there are no annotations in the export snapshot')
@@ -694,9 +706,17 @@ def async_convert(converted_format_id, export_type, project, hostname, download_
     file_name = f'project-{project.id}-at-{now.strftime("%Y-%m-%d-%H-%M")}-{md5[0:8]}.{ext}'
     file_path = f'{project.id}/{file_name}'  # finally file will be in settings.DELAYED_EXPORT_DIR/project.id/file_name
     file_ = File(converted_file, name=file_path)
-    converted_format.file.save(file_path, file_)
+    converted_format.file.save(file_path, file_, save=False)
+    converted_file.close()
     converted_format.status = ConvertedFormat.Status.COMPLETED
-    converted_format.save(update_fields=['file', 'status'])
+    converted_format.md5 = cache_md5
+    converted_format.download_resources = bool(download_resources)
+    converted_format.size = converted_format.file.size
+    converted_format.finished_at = converted_format.updated_at = timezone.now()
+    converted_format.save(
+        update_fields=['file', 'status', 'md5', 'download_resources', 'size', 'finished_at', 'updated_at']
+    )
+    ConvertedFormat.evict_cache(keep=converted_format)
 
 
 def set_convert_background_failure(job, connection, type, value, traceback_obj):
@@ -753,6 +773,13 @@ class ExportConvertAPI(generics.RetrieveAPIView):
         export_type = serializer.validated_data['export_type']
         download_resources = serializer.validated_data.get('download_resources')
 
+        # the same conversion of a snapshot with identical content is reused
+        converted_format = ConvertedFormat.use_cached(
+            snapshot, export_type, download_resources, created_by=request.user
+        )
+        if converted_format is not None:
+            return Response({'export_type': export_type, 'converted_format': converted_format.id, 'cached': True})
+
         with transaction.atomic():
             converted_format, created = ConvertedFormat.objects.get_or_create(export=snapshot, export_type=export_type)
 
@@ -0,0 +1,25 @@
+from data_export.models import ConvertedFormat
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Show hits, misses and size of the converted export files cache, optionally evict old files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict', action='store_true', default=False, help='remove least recently used files')
+        parser.add_argument(
+            '--max-size',
+            type=int,
+            default=None,
+            help='max total size of converted files in bytes, CONVERTED_FORMATS_CACHE_MAX_SIZE by default',
+        )
+
+    def handle(self, *args, **options):
+        if options['evict']:
+            removed = ConvertedFormat.evict_cache(max_size=options['max_size'])
+            self.stdout.write(f'{removed} converted files evicted')
+
+        stats = ConvertedFormat.get_cache_stats()
+        self.stdout.write(
+            f'hits: {stats["hits"]}, misses: {stats["misses"]}, files: {stats["files"]}, size: {stats["size"]} bytes'
+        )
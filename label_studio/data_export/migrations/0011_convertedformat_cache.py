@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-18 00:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_export', '0010_alter_convertedformat_export_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='convertedformat',
+            name='download_resources',
+            field=models.BooleanField(default=False, help_text='Resources were downloaded during the conversion', verbose_name='download resources'),
+        ),
+        migrations.AddField(
+            model_name='convertedformat',
+            name='hits',
+            field=models.PositiveIntegerField(default=0, help_text='Number of requests answered with this converted file', verbose_name='hits'),
+        ),
+        migrations.AddField(
+            model_name='convertedformat',
+            name='md5',
+            field=models.CharField(default='', help_text='md5 of the export snapshot and the project label config used for the conversion, conversions with the same md5 are reused', max_length=128, verbose_name='conversion md5'),
+        ),
+        migrations.AddField(
+            model_name='convertedformat',
+            name='size',
+            field=models.BigIntegerField(default=None, help_text='Size of the converted file in bytes', null=True, verbose_name='size'),
+        ),
+        migrations.AddIndex(
+            model_name='convertedformat',
+            index=models.Index(fields=['md5', 'export_type'], name='convertedformat_md5_type_idx'),
+        ),
+    ]
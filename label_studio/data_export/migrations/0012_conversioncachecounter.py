@@ -0,0 +1,21 @@
+# Generated by Django 5.1.15 on 2026-10-18 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_export', '0011_convertedformat_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversionCacheCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='name')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='value')),
+            ],
+        ),
+    ]
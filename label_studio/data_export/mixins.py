@@ -1,9 +1,11 @@
 import hashlib
-import io
 import json
 import logging
+import os
 import pathlib
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from functools import reduce
 
@@ -11,20 +13,21 @@ import django_rq
 from core.redis import redis_connected
 from core.utils.common import batch
 from core.utils.io import (
-    SerializableGenerator,
     get_all_dirs_from_dir,
     get_all_files_from_dir,
     get_temp_dir,
+    path_to_open_binary_file,
 )
 from data_manager.models import View
 from django.conf import settings
 from django.core.files import File
 from django.core.files import temp as tempfile
-from django.db import transaction
+from django.db import connections, transaction
 from django.db.models import Prefetch
 from django.db.models.query_utils import Q
 from django.utils import dateformat, timezone
 from label_studio_sdk.converter import Converter
+from rq import Retry
 from tasks.models import Annotation, AnnotationDraft, Task
 
 ONLY = 'only'
@@ -186,8 +189,6 @@ class ExportMixin:
                 })
         })
         """
-        from .serializers import ExportDataSerializer
-
         logger.debug('Run get_task_queryset')
 
         start = datetime.now()
@@ -195,39 +196,54 @@ class ExportMixin:
             # TODO: make counters from queryset
             # counters = Project.objects.with_counts().filter(id=self.project.id)[0].get_counters()
             self.counters = {'task_number': 0}
-            all_tasks = self.project.tasks
-            logger.debug('Tasks filtration')
-            task_ids = (
-                self._get_filtered_tasks(all_tasks, task_filter_options=task_filter_options)
-                .distinct()
-                .values_list('id', flat=True)
-            )
+            task_ids = self._get_export_task_ids(task_filter_options)
             base_export_serializer_option = self._get_export_serializer_option(serialization_options)
             i = 0
             BATCH_SIZE = 1000
             for ids in batch(task_ids, BATCH_SIZE):
                 i += 1
-                tasks = list(self.get_task_queryset(ids, annotation_filter_options))
                 logger.debug(f'Batch: {i*BATCH_SIZE}')
-                if isinstance(task_filter_options, dict) and task_filter_options.get('only_with_annotations'):
-                    tasks = [task for task in tasks if task.annotations.exists()]
-
-                if serialization_options and serialization_options.get('include_annotation_history') is True:
-                    task_ids = [task.id for task in tasks]
-                    annotation_ids = Annotation.objects.filter(task_id__in=task_ids).values_list('id', flat=True)
-                    base_export_serializer_option = self.update_export_serializer_option(
-                        base_export_serializer_option, annotation_ids
-                    )
-
-                serializer = ExportDataSerializer(tasks, many=True, **base_export_serializer_option)
-                self.counters['task_number'] += len(tasks)
-                for task in serializer.data:
+                data = self._serialize_export_tasks(
+                    ids,
+                    task_filter_options,
+                    annotation_filter_options,
+                    serialization_options,
+                    base_export_serializer_option,
+                )
+                self.counters['task_number'] += len(data)
+                for task in data:
                     yield task
         duration = datetime.now() - start
         logger.info(
             f'{self.counters["task_number"]} tasks from project {self.project_id} exported in {duration.total_seconds():.2f} seconds'
         )
 
+    def _get_export_task_ids(self, task_filter_options=None):
+        logger.debug('Tasks filtration')
+        return (
+            self._get_filtered_tasks(self.project.tasks, task_filter_options=task_filter_options)
+            .distinct()
+            .values_list('id', flat=True)
+        )
+
+    def _serialize_export_tasks(
+        self, ids, task_filter_options, annotation_filter_options, serialization_options, base_export_serializer_option
+    ):
+        from .serializers import ExportDataSerializer
+
+        tasks = list(self.get_task_queryset(ids, annotation_filter_options))
+        if isinstance(task_filter_options, dict) and task_filter_options.get('only_with_annotations'):
+            tasks = [task for task in tasks if task.annotations.exists()]
+
+        if serialization_options and serialization_options.get('include_annotation_history') is True:
+            task_ids = [task.id for task in tasks]
+            annotation_ids = Annotation.objects.filter(task_id__in=task_ids).values_list('id', flat=True)
+            base_export_serializer_option = self.update_export_serializer_option(
+                base_export_serializer_option, annotation_ids
+            )
+
+        return ExportDataSerializer(tasks, many=True, **base_export_serializer_option).data
+
     def update_export_serializer_option(self, base_export_serializer_option, annotation_ids):
         return base_export_serializer_option
 
@@ -251,7 +267,105 @@ class ExportMixin:
         self.md5 = md5
         self.save(update_fields=['file', 'md5', 'counters'])
 
-    def export_to_file(self, task_filter_options=None, annotation_filter_options=None, serialization_options=None):
+    @property
+    def shards_dir(self):
+        return os.path.join(settings.EXPORT_DIR, 'shards', str(self.id))
+
+    def _get_shard_path(self, index):
+        return os.path.join(self.shards_dir, f'{index:06d}.json')
+
+    def _get_export_shards(self, task_ids, params_digest):
+        """Split exported task ids into id ranges of EXPORT_SHARD_SIZE tasks.
+        Ranges and completed shards of an interrupted export with the same params are reused.
+        """
+        checkpoint = self.counters.get('shards') if isinstance(self.counters, dict) else None
+        if checkpoint and checkpoint.get('params') == params_digest:
+            completed = {
+                index: count
+                for index, count in checkpoint['completed'].items()
+                if os.path.exists(self._get_shard_path(int(index)))
+            }
+            logger.info(f'Export {self.id} resumed, {len(completed)}/{len(checkpoint["ranges"])} shards are done')
+            return {'params': params_digest, 'ranges': checkpoint['ranges'], 'completed': completed}
+
+        shutil.rmtree(self.shards_dir, ignore_errors=True)
+        ranges = []
+        for i, task_id in enumerate(task_ids.order_by('id').iterator(chunk_size=settings.EXPORT_SHARD_SIZE)):
+            if i % settings.EXPORT_SHARD_SIZE == 0:
+                ranges.append([task_id, task_id])
+            ranges[-1][1] = task_id
+        return {'params': params_digest, 'ranges': ranges, 'completed': {}}
+
+    def _export_shard(
+        self,
+        index,
+        first_id,
+        last_id,
+        task_ids,
+        task_filter_options,
+        annotation_filter_options,
+        serialization_options,
+        base_export_serializer_option,
+    ):
+        """Serialize tasks of the id range into a shard file of comma separated JSON objects
+        :return: Number of exported tasks
+        """
+        encoder = json.JSONEncoder(ensure_ascii=False)
+        path = self._get_shard_path(index)
+        count = 0
+        try:
+            ids = list(task_ids.filter(id__gte=first_id, id__lte=last_id).order_by('id'))
+            with open(path + '.part', 'wb') as f:
+                for ids_batch in batch(ids, 1000):
+                    data = self._serialize_export_tasks(
+                        ids_batch,
+                        task_filter_options,
+                        annotation_filter_options,
+                        serialization_options,
+                        base_export_serializer_option,
+                    )
+                    for task in data:
+                        f.write(((', ' if count else '') + encoder.encode(task)).encode('utf-8'))
+                        count += 1
+            # shard is completed only when the whole file is written
+            os.replace(path + '.part', path)
+        finally:
+            # pool threads have their own db connections
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+        return count
+
+    def _assemble_shards(self, shards, file):
+        """Concatenate shard files into a JSON list and calculate md5 of the written bytes"""
+        md5_object = hashlib.md5()   # nosec
+
+        def write(chunk):
+            md5_object.update(chunk)
+            file.write(chunk)
+
+        write(b'[')
+        first = True
+        for index in range(len(shards['ranges'])):
+            if not shards['completed'][str(index)]:
+                continue
+            if not first:
+                write(b', ')
+            first = False
+            with open(self._get_shard_path(index), 'rb') as shard:
+                for chunk in iter(lambda: shard.read(1024 * 1024), b''):
+                    write(chunk)
+        write(b']')
+        return md5_object.hexdigest()
+
+    def export_to_file(
+        self, task_filter_options=None, annotation_filter_options=None, serialization_options=None, retried=False
+    ):
+        """Export tasks to a JSON file. Tasks are serialized by id range shards in a thread pool,
+        completed shards are checkpointed in counters, so a restarted export job continues
+        from the shards which are not finished yet.
+        :param retried: errors are raised to retry the background job, the export stays in progress
+        and its shards are kept, otherwise the export is failed and the shards are removed
+        """
         logger.debug(
             f'Run export for {self.id} with params:\n'
             f'task_filter_options: {task_filter_options}\n'
@@ -259,31 +373,82 @@ class ExportMixin:
             f'serialization_options: {serialization_options}\n'
         )
         try:
-            iter_json = json.JSONEncoder(ensure_ascii=False).iterencode(
-                SerializableGenerator(
-                    self.get_export_data(
-                        task_filter_options=task_filter_options,
-                        annotation_filter_options=annotation_filter_options,
-                        serialization_options=serialization_options,
-                    )
-                )
+            start = datetime.now()
+            params_digest = hashlib.md5(  # nosec
+                json.dumps(
+                    [task_filter_options, annotation_filter_options, serialization_options],
+                    sort_keys=True,
+                    default=str,
+                ).encode()
+            ).hexdigest()
+            task_ids = self._get_export_task_ids(task_filter_options)
+            shards = self._get_export_shards(task_ids, params_digest)
+            self.counters = {'task_number': sum(shards['completed'].values()), 'shards': shards}
+            self.save(update_fields=['counters'])
+
+            os.makedirs(self.shards_dir, exist_ok=True)
+            base_export_serializer_option = self._get_export_serializer_option(serialization_options)
+            shard_args = (
+                task_ids,
+                task_filter_options,
+                annotation_filter_options,
+                serialization_options,
+                base_export_serializer_option,
             )
+            pending = [
+                (index, first_id, last_id)
+                for index, (first_id, last_id) in enumerate(shards['ranges'])
+                if str(index) not in shards['completed']
+            ]
+
+            def complete_shard(index, count):
+                shards['completed'][str(index)] = count
+                self.counters['task_number'] += count
+                self.save(update_fields=['counters'])
+
+            if settings.EXPORT_WORKERS <= 1 or len(pending) <= 1:
+                for index, first_id, last_id in pending:
+                    complete_shard(index, self._export_shard(index, first_id, last_id, *shard_args))
+            else:
+                # load project in the main thread, shards read it concurrently
+                self.project
+                with ThreadPoolExecutor(max_workers=settings.EXPORT_WORKERS) as executor:
+                    futures = {
+                        executor.submit(self._export_shard, index, first_id, last_id, *shard_args): index
+                        for index, first_id, last_id in pending
+                    }
+                    # checkpoint all shards which succeeded before failing the export
+                    error = None
+                    for future in as_completed(futures):
+                        if future.exception() is None:
+                            complete_shard(futures[future], future.result())
+                        else:
+                            error = error or future.exception()
+                    if error is not None:
+                        raise error
+
             with tempfile.NamedTemporaryFile(suffix='.export.json', dir=settings.FILE_UPLOAD_TEMP_DIR) as file:
-                for chunk in iter_json:
-                    encoded_chunk = chunk.encode('utf-8')
-                    file.write(encoded_chunk)
+                md5 = self._assemble_shards(shards, file)
                 file.seek(0)
-
-                md5 = self.eval_md5(file)
+                self.counters = {'task_number': self.counters['task_number']}
                 self.save_file(file, md5)
+            shutil.rmtree(self.shards_dir, ignore_errors=True)
 
+            duration = datetime.now() - start
+            logger.info(
+                f'{self.counters["task_number"]} tasks from project {self.project_id} exported '
+                f'in {duration.total_seconds():.2f} seconds'
+            )
             self.status = self.Status.COMPLETED
             self.save(update_fields=['status'])
 
         except Exception as e:
+            logger.exception('Export was failed: %s', e)
+            if retried:
+                raise
             self.status = self.Status.FAILED
             self.save(update_fields=['status'])
-            logger.exception('Export was failed: %s', e)
+            shutil.rmtree(self.shards_dir, ignore_errors=True)
         finally:
             self.finished_at = datetime.now()
             self.save(update_fields=['finished_at'])
@@ -306,6 +471,7 @@ class ExportMixin:
                 serialization_options,
                 on_failure=set_export_background_failure,
                 job_timeout='3h',  # 3 hours
+                retry=Retry(max=settings.EXPORT_JOB_RETRIES, interval=settings.EXPORT_JOB_RETRY_INTERVAL),
             )
         else:
             self.export_to_file(
@@ -315,6 +481,8 @@ class ExportMixin:
             )
 
     def convert_file(self, to_format, download_resources=False, hostname=None):
+        from .models import DataExport
+
         with get_temp_dir() as tmp_dir:
             OUT = 'out'
             out_dir = pathlib.Path(tmp_dir) / OUT
@@ -332,10 +500,10 @@ class ExportMixin:
             input_name = pathlib.Path(self.file.name).name
             input_file_path = pathlib.Path(tmp_dir) / input_name
 
-            with open(input_file_path, 'wb') as file_:
-                file_.write(self.file.open().read())
+            with open(input_file_path, 'wb') as file_, self.file.open('rb') as export_file:
+                shutil.copyfileobj(export_file, file_)
 
-            converter.convert(input_file_path, out_dir, to_format, is_dir=False)
+            DataExport.convert(converter, input_file_path, out_dir, to_format)
 
             files = get_all_files_from_dir(out_dir)
             dirs = get_all_dirs_from_dir(out_dir)
@@ -350,12 +518,8 @@ class ExportMixin:
                 output_file = pathlib.Path(tmp_dir) / (str(out_dir.stem) + '.zip')
                 filename = pathlib.Path(input_name).stem + '.zip'
 
-            # TODO(jo): can we avoid the `f.read()` here?
-            with open(output_file, mode='rb') as f:
-                return File(
-                    io.BytesIO(f.read()),
-                    name=filename,
-                )
+            # the temporary copy is removed when the returned file is closed
+            return File(path_to_open_binary_file(output_file), name=filename)
 
 
 def export_background(
@@ -367,6 +531,7 @@ def export_background(
         task_filter_options,
         annotation_filter_options,
         serialization_options,
+        retried=True,
     )
 
 
@@ -374,4 +539,11 @@ def set_export_background_failure(job, connection, type, value, traceback):
     from data_export.models import Export
 
     export_id = job.args[0]
+    if job.retries_left:
+        # the job is retried and continues from the checkpointed shards
+        logger.info(f'Export {export_id} failed, {job.retries_left} retries left')
+        return
     Export.objects.filter(id=export_id).update(status=Export.Status.FAILED)
+    export = Export.objects.filter(id=export_id).first()
+    if export is not None:
+        shutil.rmtree(export.shards_dir, ignore_errors=True)
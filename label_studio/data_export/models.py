@@ -4,25 +4,30 @@ import hashlib
 import logging
 import os
 import shutil
+import tempfile
 from copy import deepcopy
 from datetime import datetime
 
 import ujson as json
 from core import version
 from core.feature_flags import flag_set
+from core.redis import redis_get, redis_incr
 from core.utils.common import load_func
 from core.utils.io import get_all_files_from_dir, get_temp_dir, path_to_open_binary_file
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, Sum
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from label_studio_sdk.converter import Converter
+from label_studio_sdk.converter.converter import Format
+from label_studio_sdk.converter.utils import get_annotator, prettify_result
 from tasks.models import Annotation
 
 logger = logging.getLogger(__name__)
 
-
 ExportMixin = load_func(settings.EXPORT_MIXIN)
 
 
@@ -97,6 +102,14 @@ class DataExport(object):
     def save_export_files(project, now, get_args, data, md5, name):
         """Generate two files: meta info and result file and store them locally for logging"""
         filename_results = os.path.join(settings.EXPORT_DIR, name + '.json')
+        with open(filename_results, 'w', encoding='utf-8') as f:
+            f.write(data)
+        DataExport.save_export_info(project, now, get_args, filename_results, md5, name)
+        return filename_results
+
+    @staticmethod
+    def save_export_info(project, now, get_args, filename_results, md5, name):
+        """Generate meta info file for the result file"""
         filename_info = os.path.join(settings.EXPORT_DIR, name + '-info.json')
         annotation_number = Annotation.objects.filter(project=project).count()
         try:
@@ -121,12 +134,67 @@ class DataExport(object):
                 'md5': md5,
             },
         }
-
-        with open(filename_results, 'w', encoding='utf-8') as f:
-            f.write(data)
         with open(filename_info, 'w', encoding='utf-8') as f:
             json.dump(info, f, ensure_ascii=False)
-        return filename_results
+
+    @staticmethod
+    def write_tasks_json(tasks, file):
+        """Write tasks one by one as a JSON list into the binary file,
+        md5 is calculated from the written chunks, so the whole export is never kept in memory
+        :return: md5 of the file content
+        """
+        md5_object = hashlib.md5()   # nosec
+
+        def write(chunk):
+            md5_object.update(chunk)
+            file.write(chunk)
+
+        write(b'[')
+        for i, task in enumerate(tasks):
+            write((b',' if i else b'') + json.dumps(task, ensure_ascii=False).encode('utf-8'))
+        write(b']')
+        return md5_object.hexdigest()
+
+    @staticmethod
+    def convert_to_json_min(converter, input_json, output_dir):
+        """The same output as Converter.convert_to_json_min, but records are written
+        as soon as they are read from the input file instead of collecting them into a list
+        """
+        # Mirrors label_studio_sdk.converter.converter.Converter.convert_to_json_min (label-studio-sdk 1.0.x):
+        # the SDK builds records inline without a per-record function, so the loop body below must be kept
+        # in sync with it, test_generate_export_file_streams_tasks compares both outputs byte by byte
+        converter._check_format(Format.JSON_MIN)
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, 'result.json'), mode='w', encoding='utf8') as fout:
+            count = 0
+            for item in converter.iter_from_json_file(input_json):
+                record = deepcopy(item['input'])
+                if item.get('id') is not None:
+                    record['id'] = item['id']
+                for name, value in item['output'].items():
+                    record[name] = prettify_result(value)
+                record['annotator'] = get_annotator(item, int_id=True)
+                record['annotation_id'] = item['annotation_id']
+                record['created_at'] = item['created_at']
+                record['updated_at'] = item['updated_at']
+                record['lead_time'] = item['lead_time']
+                if 'agreement' in item:
+                    record['agreement'] = item['agreement']
+                # indent nested record lines to get the same layout as json.dump(records, indent=2)
+                record = json.dumps(record, indent=2, ensure_ascii=False).replace('\n', '\n  ')
+                fout.write(('[\n  ' if count == 0 else ',\n  ') + record)
+                count += 1
+            fout.write('\n]' if count else '[]')
+
+    @staticmethod
+    def convert(converter, input_json, output_dir, output_format):
+        """Convert JSON export file to the output format.
+        CSV, TSV and CONLL2003 converters read the input file by items, JSON_MIN is streamed here.
+        """
+        if str(output_format).upper() == Format.JSON_MIN.name:
+            DataExport.convert_to_json_min(converter, input_json, output_dir)
+        else:
+            converter.convert(input_json, output_dir, output_format, is_dir=False)
 
     @staticmethod
     def get_export_formats(project):
@@ -144,17 +212,24 @@ class DataExport(object):
     @staticmethod
     def generate_export_file(project, tasks, output_format, download_resources, get_args, hostname=None):
         """Generate export file and return it as an open file object.
+        Tasks can be any iterable of serialized tasks, e.g. a generator over serializer batches.
 
         Be sure to close the file after using it, to avoid wasting disk space.
         """
 
-        # prepare for saving
+        # tasks are streamed into the export file, the name includes md5 which is known only at the end
         now = datetime.now()
-        data = json.dumps(tasks, ensure_ascii=False)
-        md5 = hashlib.md5(json.dumps(data).encode('utf-8')).hexdigest()   # nosec
-        name = 'project-' + str(project.id) + '-at-' + now.strftime('%Y-%m-%d-%H-%M') + f'-{md5[0:8]}'
-
-        input_json = DataExport.save_export_files(project, now, get_args, data, md5, name)
+        file = tempfile.NamedTemporaryFile(dir=settings.EXPORT_DIR, suffix='.json', delete=False)
+        try:
+            with file:
+                md5 = DataExport.write_tasks_json(tasks, file)
+            name = 'project-' + str(project.id) + '-at-' + now.strftime('%Y-%m-%d-%H-%M') + f'-{md5[0:8]}'
+            input_json = os.path.join(settings.EXPORT_DIR, name + '.json')
+            os.replace(file.name, input_json)
+        except Exception:
+            os.remove(file.name)
+            raise
+        DataExport.save_export_info(project, now, get_args, input_json, md5, name)
 
         converter = Converter(
             config=project.get_parsed_config(),
@@ -165,7 +240,7 @@ class DataExport(object):
             hostname=hostname,
         )
         with get_temp_dir() as tmp_dir:
-            converter.convert(input_json, tmp_dir, output_format, is_dir=False)
+            DataExport.convert(converter, input_json, tmp_dir, output_format)
             files = get_all_files_from_dir(tmp_dir)
             # if only one file is exported - no need to create archive
             if len(os.listdir(tmp_dir)) == 1:
@@ -220,6 +295,20 @@ class ConvertedFormat(models.Model):
     )
     traceback = models.TextField(null=True, blank=True, help_text='Traceback report in case of errors')
     export_type = models.CharField(max_length=64)
+    download_resources = models.BooleanField(
+        _('download resources'), default=False, help_text='Resources were downloaded during the conversion'
+    )
+    md5 = models.CharField(
+        _('conversion md5'),
+        max_length=128,
+        default='',
+        help_text='md5 of the export snapshot and the project label config used for the conversion, '
+        'conversions with the same md5 are reused',
+    )
+    size = models.BigIntegerField(_('size'), null=True, default=None, help_text='Size of the converted file in bytes')
+    hits = models.PositiveIntegerField(
+        _('hits'), default=0, help_text='Number of requests answered with this converted file'
+    )
     created_at = models.DateTimeField(
         _('created at'),
         null=True,
@@ -246,8 +335,152 @@ class ConvertedFormat(models.Model):
         verbose_name=_('created by'),
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['md5', 'export_type'], name='convertedformat_md5_type_idx'),
+        ]
+
     def delete(self, *args, **kwargs):
         if flag_set('ff_back_dev_4664_remove_storage_file_on_export_delete_29032023_short'):
-            if self.file:
-                self.file.delete()
+            # converted files can be shared by snapshots with the same content
+            if self.file and not ConvertedFormat.objects.filter(file=self.file.name).exclude(id=self.id).exists():
+                self.file.delete(save=False)
         super().delete(*args, **kwargs)
+
+    @staticmethod
+    def _count_cache_miss():
+        # redis is a fast path, misses are stored in the database when it is not connected
+        if redis_incr('export_conversion_cache:misses') is None:
+            ConversionCacheCounter.increment('misses')
+
+    @classmethod
+    def get_cache_stats(cls):
+        """Hits are summed over the cached files, misses are taken from redis and the database"""
+        stats = {
+            'hits': cls.objects.aggregate(hits=Sum('hits'))['hits'] or 0,
+            'misses': int(redis_get('export_conversion_cache:misses') or 0) + ConversionCacheCounter.get('misses'),
+        }
+        files = list(cls._get_cached_files())
+        stats['files'] = len(files)
+        stats['size'] = sum(f['file_size'] for f in files)
+        return stats
+
+    @classmethod
+    def _get_cached_files(cls):
+        """Converted files ordered by the last access, the same file can be shared by several snapshots"""
+        return (
+            cls.objects.filter(status=cls.Status.COMPLETED, size__isnull=False)
+            .exclude(file='')
+            .values('file')
+            .annotate(last_used_at=Max('updated_at'), file_size=Max('size'))
+            .order_by('last_used_at')
+        )
+
+    @staticmethod
+    def get_cache_md5(export):
+        """Conversion cache key, the converter output depends on the snapshot and the project label config"""
+        if not export.md5:
+            return ''
+        label_config = export.project.label_config or ''
+        return hashlib.md5(f'{export.md5}:{label_config}'.encode()).hexdigest()  # nosec
+
+    @classmethod
+    def get_cached(cls, export, export_type, download_resources=False):
+        """Find a completed conversion of the export or another snapshot of the project with the same md5"""
+        md5 = cls.get_cache_md5(export)
+        if not md5:
+            return None
+        return (
+            cls.objects.filter(
+                export__project_id=export.project_id,
+                md5=md5,
+                export_type=export_type,
+                download_resources=bool(download_resources),
+                status=cls.Status.COMPLETED,
+            )
+            .exclude(file='')
+            .exclude(file__isnull=True)
+            .order_by('-updated_at')
+            .first()
+        )
+
+    @classmethod
+    def use_cached(cls, export, export_type, download_resources=False, created_by=None):
+        """Get a converted file for the export from the conversion cache and count the hit or miss
+        :return: ConvertedFormat of this export or None if there is no cached conversion
+        """
+        cached = cls.get_cached(export, export_type, download_resources)
+        if cached is None:
+            cls._count_cache_miss()
+            return None
+
+        now = timezone.now()
+        cls.objects.filter(id=cached.id).update(hits=F('hits') + 1, updated_at=now)
+        if cached.export_id == export.id:
+            return cached
+
+        with transaction.atomic():
+            converted_format, _ = cls.objects.select_for_update().update_or_create(
+                export=export,
+                export_type=export_type,
+                defaults={
+                    'project_id': export.project_id,
+                    'organization_id': cached.organization_id,
+                    'file': cached.file.name,
+                    'status': cls.Status.COMPLETED,
+                    'download_resources': cached.download_resources,
+                    'md5': cached.md5,
+                    'size': cached.size,
+                    'created_by': created_by,
+                    'updated_at': now,
+                    'finished_at': now,
+                },
+            )
+        return converted_format
+
+    @classmethod
+    def evict_cache(cls, max_size=None, keep=None):
+        """Remove the least recently used converted files while their total size exceeds max_size
+        :param keep: ConvertedFormat which file must stay
+        :return: Number of removed files
+        """
+        max_size = settings.CONVERTED_FORMATS_CACHE_MAX_SIZE if max_size is None else max_size
+        if not max_size:
+            return 0
+
+        files = list(cls._get_cached_files())
+        total = sum(f['file_size'] for f in files)
+        removed = 0
+        for f in files:
+            if total <= max_size:
+                break
+            if keep is not None and f['file'] == keep.file.name:
+                continue
+            converted_formats = cls.objects.filter(file=f['file'])
+            first = converted_formats.first()
+            if first is not None:
+                first.file.delete(save=False)
+            converted_formats.delete()
+            total -= f['file_size']
+            removed += 1
+        if removed:
+            logger.info(f'{removed} converted export files evicted, {total} bytes are left')
+        return removed
+
+
+class ConversionCacheCounter(models.Model):
+    """Conversion cache counters which can't be stored on ConvertedFormat, e.g. misses"""
+
+    name = models.CharField(_('name'), max_length=64, unique=True)
+    value = models.PositiveBigIntegerField(_('value'), default=0)
+
+    @classmethod
+    def increment(cls, name):
+        if not cls.objects.filter(name=name).update(value=F('value') + 1):
+            counter, created = cls.objects.get_or_create(name=name, defaults={'value': 1})
+            if not created:
+                cls.objects.filter(id=counter.id).update(value=F('value') + 1)
+
+    @classmethod
+    def get(cls, name):
+        return cls.objects.filter(name=name).values_list('value', flat=True).first() or 0
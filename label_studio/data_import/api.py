@@ -14,6 +14,7 @@ from core.redis import start_job_async_or_sync
 from core.utils.common import retry_database_locked, timeit
 from core.utils.params import bool_from_request, list_of_strings_from_request
 from csp.decorators import csp
+from data_manager.functions import maintain_materialized_columns
 from django.conf import settings
 from django.db import transaction
 from django.http import HttpResponse
@@ -421,6 +422,7 @@ class ImportPredictionsAPI(generics.CreateAPIView):
                 )
             )
         predictions_obj = Prediction.objects.bulk_create(predictions, batch_size=settings.BATCH_SIZE)
+        maintain_materialized_columns(project.id, [prediction.task_id for prediction in predictions_obj])
         start_job_async_or_sync(update_tasks_counters, Task.objects.filter(id__in=tasks_ids))
         return Response({'created': len(predictions_obj)}, status=status.HTTP_201_CREATED)
 
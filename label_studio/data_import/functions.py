@@ -1,12 +1,15 @@
 import logging
 import time
 import traceback
+from collections import Counter
 from typing import Callable, Optional
 
 from core.utils.common import load_func
 from django.conf import settings
 from django.db import transaction
 from projects.models import ProjectImport, ProjectReimport, ProjectSummary
+from rest_framework.exceptions import ValidationError
+from tasks.models import Task
 from users.models import User
 from webhooks.models import WebhookAction
 from webhooks.utils import emit_webhooks_for_instance
@@ -36,6 +39,13 @@ def async_import_background(
     user = User.objects.get(id=user_id)
 
     start = time.time()
+    if project_import.commit_to_project and is_streaming_import(project_import):
+        import_tasks_by_chunks(project_import, user)
+        project_import.duration = time.time() - start
+        project_import.status = ProjectImport.Status.COMPLETED
+        project_import.save()
+        return
+
     project = project_import.project
     tasks = None
     # upload files from request, and parse all tasks
@@ -102,6 +112,98 @@ def async_import_background(
     project_import.save()
 
 
+def is_streaming_import(project_import):
+    """Large uploaded files are imported by chunks to keep the worker memory bounded"""
+    if not project_import.file_upload_ids:
+        return False
+    file_uploads = FileUpload.objects.filter(project=project_import.project, id__in=project_import.file_upload_ids)
+    total_size = sum(file_upload.file.size for file_upload in file_uploads)
+    return total_size >= settings.IMPORT_STREAMING_MIN_FILE_SIZE
+
+
+def import_tasks_by_chunks(project_import, user):
+    """Parse, validate and save tasks from uploaded files by chunks of IMPORT_STREAMING_CHUNK_SIZE tasks,
+    ProjectImport counters are updated after each chunk. If any chunk fails, tasks created
+    from these file uploads are removed, so the import is still applied entirely or not at all.
+
+    Each chunk is committed separately, so the tasks of the saved chunks are visible in the project
+    while the import is running and until they are removed after a failure.
+    TASKS_CREATED webhooks are sent only after the last chunk is saved.
+    """
+    project = project_import.project
+    file_upload_ids = project_import.file_upload_ids
+    task_count, annotation_count, prediction_count = 0, 0, 0
+    found_formats, data_columns, task_ids = [], set(), []
+    last_file_upload_id = None
+
+    try:
+        for file_upload, tasks in FileUpload.iter_tasks_chunks_from_uploaded_files(project, file_upload_ids):
+            if file_upload.id != last_file_upload_id:
+                last_file_upload_id = file_upload.id
+                found_formats.append(file_upload.format)
+                data_columns = FileUpload.merge_data_fields(data_columns, tasks, file_upload.file.name)
+            if task_count + len(tasks) > settings.TASKS_MAX_NUMBER:
+                raise ValidationError(f'Maximum task number is {settings.TASKS_MAX_NUMBER}')
+
+            if project_import.preannotated_from_fields:
+                tasks = reformat_predictions(tasks, project_import.preannotated_from_fields)
+
+            with transaction.atomic():
+                # Lock summary for update to avoid race conditions
+                summary = ProjectSummary.objects.select_for_update().get(project=project)
+
+                serializer = ImportApiSerializer(data=tasks, many=True, context={'project': project})
+                serializer.is_valid(raise_exception=True)
+                tasks = serializer.save(project_id=project.id)
+
+                recalculate_stats_counts = {
+                    'task_count': len(tasks),
+                    'annotation_count': len(serializer.db_annotations),
+                    'prediction_count': len(serializer.db_predictions),
+                }
+                # task states depend on the number of tasks, they are updated once after the last chunk
+                project.update_tasks_counters_and_task_states(
+                    tasks_queryset=tasks,
+                    maximum_annotations_changed=False,
+                    overlap_cohort_percentage_changed=False,
+                    tasks_number_changed=False,
+                    recalculate_stats_counts=recalculate_stats_counts,
+                )
+                summary.update_data_columns(tasks)
+
+            task_count += recalculate_stats_counts['task_count']
+            annotation_count += recalculate_stats_counts['annotation_count']
+            prediction_count += recalculate_stats_counts['prediction_count']
+            task_ids.extend(task.id for task in tasks)
+
+            project_import.task_count = task_count
+            project_import.annotation_count = annotation_count
+            project_import.prediction_count = prediction_count
+            project_import.save(update_fields=['task_count', 'annotation_count', 'prediction_count'])
+            logger.info(f'Import {project_import.id}: {task_count} tasks saved')
+
+        if not task_count:
+            raise ValidationError('load_tasks: No tasks added')
+    except Exception:
+        project.remove_tasks_by_file_uploads(file_upload_ids)
+        raise
+
+    project.update_tasks_states(
+        maximum_annotations_changed=False, overlap_cohort_percentage_changed=False, tasks_number_changed=True
+    )
+    logger.info('Tasks bulk_update finished (async import by chunks)')
+
+    # webhooks aren't sent for tasks that can be removed by a failed chunk
+    for i in range(0, len(task_ids), settings.WEBHOOK_BATCH_SIZE):
+        tasks = list(Task.objects.filter(id__in=task_ids[i : i + settings.WEBHOOK_BATCH_SIZE]))
+        emit_webhooks_for_instance(user.active_organization, project, WebhookAction.TASKS_CREATED, tasks)
+
+    project_import.file_upload_ids = file_upload_ids
+    project_import.found_formats = dict(Counter(found_formats))
+    project_import.data_columns = list(data_columns)
+    project_import.task_ids = task_ids if project_import.return_task_ids else []
+
+
 def set_import_background_failure(job, connection, type, value, _):
     import_id = job.args[0]
     ProjectImport.objects.filter(id=import_id).update(
@@ -12,6 +12,11 @@ try:
 except:  # noqa: E722
     import json
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 from django.conf import settings
 from django.db import models
 from django.utils.functional import cached_property
@@ -79,6 +84,14 @@ class FileUpload(models.Model):
         tasks = [{'data': task} for task in tasks]
         return tasks
 
+    def iter_tasks_from_csv(self, sep=','):
+        """Read CSV file by chunks of IMPORT_STREAMING_CHUNK_SIZE rows"""
+        logger.debug('Stream tasks from CSV file {}'.format(self.filepath))
+        with self.file.open() as f:
+            for chunk in pd.read_csv(f, sep=sep, chunksize=settings.IMPORT_STREAMING_CHUNK_SIZE):
+                for task in chunk.fillna('').to_dict('records'):
+                    yield {'data': task}
+
     def read_tasks_list_from_tsv(self):
         return self.read_tasks_list_from_csv('\t')
 
@@ -99,14 +112,33 @@ class FileUpload(models.Model):
             tasks = json.loads(raw_data.decode('utf8'))
         if isinstance(tasks, dict):
             tasks = [tasks]
-        tasks_formatted = []
-        for i, task in enumerate(tasks):
-            if not task.get('data'):
-                task = {'data': task}
-            if not isinstance(task['data'], dict):
-                raise ValidationError('Task item should be dict')
-            tasks_formatted.append(task)
-        return tasks_formatted
+        return [self._format_json_task(task) for task in tasks]
+
+    def iter_tasks_from_json(self):
+        """Parse JSON file incrementally, only the current task is kept in memory"""
+        if ijson is None:
+            yield from self.read_tasks_list_from_json()
+            return
+
+        logger.debug('Stream tasks from JSON file {}'.format(self.filepath))
+        with self.file.open('rb') as f:
+            f.seek(0)
+            root = f.read(1)
+            while root.isspace():
+                root = f.read(1)
+            f.seek(0)
+            # a single task can be stored as the root object
+            prefix = '' if root == b'{' else 'item'
+            for task in ijson.items(f, prefix, use_float=True):
+                yield self._format_json_task(task)
+
+    @staticmethod
+    def _format_json_task(task):
+        if not task.get('data'):
+            task = {'data': task}
+        if not isinstance(task['data'], dict):
+            raise ValidationError('Task item should be dict')
+        return task
 
     def read_task_from_hypertext_body(self):
         logger.debug('Read 1 task from hypertext file {}'.format(self.filepath))
@@ -156,6 +188,58 @@ class FileUpload(models.Model):
             raise ValidationError('Failed to parse input file ' + self.file_name + ': ' + str(exc))
         return tasks
 
+    def iter_tasks(self, file_as_tasks_list=True):
+        """Same as read_tasks(), but CSV, TSV and JSON files are parsed incrementally"""
+        file_format = self.format
+        if file_format in ('.csv', '.tsv') and file_as_tasks_list:
+            tasks = self.iter_tasks_from_csv('\t' if file_format == '.tsv' else ',')
+        elif file_format == '.json':
+            tasks = self.iter_tasks_from_json()
+        else:
+            yield from self.read_tasks(file_as_tasks_list)
+            return
+
+        try:
+            yield from tasks
+        except Exception as exc:
+            raise ValidationError('Failed to parse input file ' + self.file_name + ': ' + str(exc))
+
+    @classmethod
+    def iter_tasks_chunks_from_uploaded_files(
+        cls, project, file_upload_ids=None, formats=None, files_as_tasks_list=True, chunk_size=None
+    ):
+        """Yield (file_upload, tasks) with at most chunk_size tasks per chunk,
+        memory doesn't depend on the file sizes for CSV, TSV and JSON files
+        """
+        chunk_size = chunk_size or settings.IMPORT_STREAMING_CHUNK_SIZE
+        file_uploads = FileUpload.objects.filter(project=project)
+        if file_upload_ids:
+            file_uploads = file_uploads.filter(id__in=file_upload_ids)
+        for file_upload in file_uploads:
+            if formats and file_upload.format not in formats:
+                continue
+            chunk = []
+            for task in file_upload.iter_tasks(files_as_tasks_list):
+                task['file_upload_id'] = file_upload.id
+                chunk.append(task)
+                if len(chunk) >= chunk_size:
+                    yield file_upload, chunk
+                    chunk = []
+            if chunk:
+                yield file_upload, chunk
+
+    @staticmethod
+    def merge_data_fields(common_data_fields, new_tasks, file_name):
+        """Intersect data keys of the new tasks with keys found in the other files"""
+        new_data_fields = set(iter(new_tasks[0]['data'].keys())) if len(new_tasks) > 0 else set()
+        if not common_data_fields:
+            return new_data_fields
+        elif not common_data_fields.intersection(new_data_fields):
+            raise ValidationError(
+                _old_vs_new_data_keys_inconsistency_message(new_data_fields, common_data_fields, file_name)
+            )
+        return common_data_fields & new_data_fields
+
     @classmethod
     def load_tasks_from_uploaded_files(
         cls, project, file_upload_ids=None, formats=None, files_as_tasks_list=True, trim_size=None
@@ -176,17 +260,7 @@ class FileUpload(models.Model):
             for task in new_tasks:
                 task['file_upload_id'] = file_upload.id
 
-            new_data_fields = set(iter(new_tasks[0]['data'].keys())) if len(new_tasks) > 0 else set()
-            if not common_data_fields:
-                common_data_fields = new_data_fields
-            elif not common_data_fields.intersection(new_data_fields):
-                raise ValidationError(
-                    _old_vs_new_data_keys_inconsistency_message(
-                        new_data_fields, common_data_fields, file_upload.file.name
-                    )
-                )
-            else:
-                common_data_fields &= new_data_fields
+            common_data_fields = cls.merge_data_fields(common_data_fields, new_tasks, file_upload.file.name)
 
             tasks += new_tasks
             fileformats.append(file_format)
@@ -1,17 +1,21 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import base64
+import hashlib
 import logging
 
+import ujson as json
 from asgiref.sync import async_to_sync, sync_to_async
 from core.feature_flags import flag_set
 from core.permissions import ViewClassPermission, all_permissions
 from core.utils.common import int_from_request, load_func
 from core.utils.params import bool_from_request
 from data_manager.actions import get_all_actions, perform_action
-from data_manager.functions import evaluate_predictions, get_prepare_params, get_prepared_queryset
+from data_manager.functions import get_prepare_params, get_prepared_queryset, schedule_predictions_fill
 from data_manager.managers import get_fields_for_evaluation
 from data_manager.models import View
 from data_manager.prepare_params import filters_schema, ordering_schema, prepare_params_schema
+from data_manager.query_plan import QueryPlan, invalidate_query_plans
 from data_manager.serializers import (
     DataManagerTaskSerializer,
     ViewOrderSerializer,
@@ -19,17 +23,23 @@ from data_manager.serializers import (
     ViewSerializer,
 )
 from django.conf import settings
-from django.db.models import Sum
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Sum
+from django.db.models.expressions import OrderBy
 from django.db.models.functions import Coalesce
 from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from io_storages.presign_cache import prefetch_presigned_urls
 from projects.models import Project
 from projects.serializers import ProjectSerializer
 from rest_framework import generics, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from tasks.models import Annotation, Prediction, Task
@@ -167,7 +177,10 @@ class ViewAPI(viewsets.ModelViewSet):
             Project.objects.for_user(request.user), pk=serializer.validated_data['project'].id
         )
         queryset = self.filter_queryset(self.get_queryset()).filter(project=project)
+        view_ids = list(queryset.values_list('id', flat=True))
         queryset.all().delete()
+        for view_id in view_ids:
+            invalidate_query_plans(view_id)
         return Response(status=204)
 
     @swagger_auto_schema(
@@ -201,6 +214,52 @@ class ViewAPI(viewsets.ModelViewSet):
 
         return Response(status=200)
 
+    @swagger_auto_schema(
+        method='get',
+        tags=['Data Manager'],
+        operation_summary='Get view query plan',
+        operation_description='Debug the compiled filters & ordering of the view and the SQL generated for its tasks',
+        manual_parameters=[
+            openapi.Parameter(
+                name='explain',
+                type=openapi.TYPE_BOOLEAN,
+                in_=openapi.IN_QUERY,
+                description='Run EXPLAIN for the generated SQL',
+            ),
+        ],
+    )
+    @action(detail=True, methods=['get'], url_path='plan')
+    def plan(self, request, pk=None):
+        view = self.get_object()
+        cached = False
+        if settings.DATA_MANAGER_QUERY_PLAN_CACHE_SIZE:
+            plan, cached = view.get_query_plan(add_selected_items=True)
+            prepare_params = plan.get_prepare_params(request)
+        else:
+            prepare_params = view.get_prepare_tasks_params(add_selected_items=True)
+            prepare_params.request = request
+            plan = QueryPlan(view.project, prepare_params)
+
+        queryset = Task.prepared.only_filtered(prepare_params=prepare_params)
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            sql = None
+
+        result = {'cached': cached, 'plan': plan.describe(), 'sql': sql}
+        if sql is not None and bool_from_request(request.GET, 'explain', False):
+            result['explain'] = queryset.explain()
+        return Response(result)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_query_plans(serializer.instance.id)
+
+    def perform_destroy(self, instance):
+        view_id = instance.id
+        super().perform_destroy(instance)
+        invalidate_query_plans(view_id)
+
     def get_queryset(self):
         return View.objects.filter(project__organization=self.request.user.active_organization).order_by('order', 'id')
 
@@ -251,6 +310,94 @@ class TaskPagination(PageNumberPagination):
         )
 
 
+class TaskCursorPagination(BasePagination):
+    """Keyset pagination for the data manager task list
+
+    The cursor stores the ordering key of the last row on the page (and its id as a tie-breaker),
+    the next page is selected with a seek predicate instead of OFFSET, so deep pages cost the same
+    as the first one. Totals are not calculated here, use TaskCountAPI for them.
+    """
+
+    page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    max_page_size = settings.TASK_API_PAGE_SIZE_MAX
+
+    def get_page_size(self, request):
+        page_size = int_from_request(request.GET, self.page_size_query_param, self.page_size)
+        if page_size <= 0:
+            raise ValidationError({self.page_size_query_param: 'Page size must be a positive integer'})
+        if self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        return page_size
+
+    @staticmethod
+    def get_ordering(queryset):
+        """Get the field name and direction the queryset is ordered by, see apply_ordering()"""
+        ordering = queryset.query.order_by
+        if not ordering:
+            return 'id', False
+
+        first = ordering[0]
+        if isinstance(first, str):
+            return first.lstrip('-'), first.startswith('-')
+        if isinstance(first, OrderBy) and hasattr(first.expression, 'name'):
+            return first.expression.name, first.descending
+        raise ValidationError({'cursor': f'Cursor pagination is not supported for ordering {first}'})
+
+    def decode_cursor(self, request):
+        cursor = request.GET.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            return cursor['value'], int(cursor['id'])
+        except Exception:
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+    @staticmethod
+    def encode_cursor(task, field):
+        value = task.id if field == 'id' else task.serializable_value(field)
+        if isinstance(value, (list, tuple, dict)):
+            raise ValidationError({'cursor': f'Cursor pagination is not supported for ordering by "{field}"'})
+        cursor = DjangoJSONEncoder().encode({'value': value, 'id': task.id})
+        return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+    @staticmethod
+    def seek_filter(field, descending, value, last_id):
+        """Rows after (value, last_id) for ORDER BY field [DESC] NULLS LAST, id"""
+        if field == 'id':
+            return Q(id__lt=last_id) if descending else Q(id__gt=last_id)
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'id__gt': last_id})
+
+        lookup = 'lt' if descending else 'gt'
+        return (
+            Q(**{f'{field}__{lookup}': value})
+            | Q(**{field: value, 'id__gt': last_id})
+            | Q(**{f'{field}__isnull': True})
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        field, descending = self.get_ordering(queryset)
+        if field != 'id':
+            queryset = queryset.order_by(*queryset.query.order_by, 'id')
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(field, descending, *cursor))
+
+        tasks = list(queryset[: self.page_size + 1])
+        has_next = len(tasks) > self.page_size
+        tasks = tasks[: self.page_size]
+        self.next_cursor = self.encode_cursor(tasks[-1], field) if has_next else None
+        return tasks
+
+    def get_paginated_response(self, data):
+        return Response({'next_cursor': self.next_cursor, 'tasks': data})
+
+
 class TaskListAPI(generics.ListCreateAPIView):
     task_serializer_class = DataManagerTaskSerializer
     permission_required = ViewClassPermission(
@@ -261,6 +408,14 @@ class TaskListAPI(generics.ListCreateAPIView):
         DELETE=all_permissions.tasks_delete,
     )
     pagination_class = TaskPagination
+    cursor_pagination_class = TaskCursorPagination
+
+    @property
+    def paginator(self):
+        """Cursor (keyset) pagination is opt-in: it's used when `cursor` is passed, the first page is `cursor=`"""
+        if not hasattr(self, '_paginator') and TaskCursorPagination.cursor_query_param in self.request.GET:
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
 
     @staticmethod
     def get_task_serializer_context(request, project):
@@ -324,6 +479,12 @@ class TaskListAPI(generics.ListCreateAPIView):
             all_fields = None
         if page is not None:
             ids = [task.id for task in page]  # page is a list already
+
+            # retrieve ML predictions if tasks don't have them, it's done in background and doesn't block the page
+            predictions_pending = None
+            if not review and project.evaluate_predictions_automatically:
+                predictions_pending = schedule_predictions_fill(project, ids)
+
             tasks = list(
                 self.prefetch(
                     Task.prepared.annotate_queryset(
@@ -337,27 +498,116 @@ class TaskListAPI(generics.ListCreateAPIView):
             tasks_by_ids = {task.id: task for task in tasks}
             # keep ids ordering
             page = [tasks_by_ids[_id] for _id in ids]
-
-            # retrieve ML predictions if tasks don't have them
-            if not review and project.evaluate_predictions_automatically:
-                # TODO MM TODO this needs a discussion, because I'd expect
-                # people to retrieve manually instead on DM load, plus it
-                # will slow down initial DM load
-                # if project.retrieve_predictions_automatically is deprecated now and no longer used
-                tasks_for_predictions = Task.objects.filter(id__in=ids, predictions__isnull=True)
-                evaluate_predictions(tasks_for_predictions)
-                [tasks_by_ids[_id].refresh_from_db() for _id in ids]
+            if context.get('resolve_uri'):
+                if settings.PRESIGNED_URL_CACHE_PREFETCH:
+                    prefetch_presigned_urls(page, project)
+                Task.resolve_tasks_uri(page, project)
 
             serializer = self.task_serializer_class(page, many=True, context=context)
-            return self.get_paginated_response(serializer.data)
+            data = serializer.data
+            if predictions_pending is not None:
+                for task in data:
+                    task['predictions_pending'] = task['id'] in predictions_pending
+            return self.get_paginated_response(data)
         # all tasks
+        predictions_pending = None
         if project.evaluate_predictions_automatically:
-            evaluate_predictions(queryset.filter(predictions__isnull=True))
+            predictions_pending = schedule_predictions_fill(project, queryset.values_list('id', flat=True))
         queryset = Task.prepared.annotate_queryset(
             queryset, fields_for_evaluation=fields_for_evaluation, all_fields=all_fields, request=request
         )
         serializer = self.task_serializer_class(queryset, many=True, context=context)
-        return Response(serializer.data)
+        data = serializer.data
+        if predictions_pending is not None:
+            for task in data:
+                task['predictions_pending'] = task['id'] in predictions_pending
+        return Response(data)
+
+
+@method_decorator(
+    name='get',
+    decorator=swagger_auto_schema(
+        tags=['Data Manager'],
+        x_fern_audiences=['internal'],
+        operation_summary='Get task totals',
+        operation_description=(
+            'Count tasks, annotations and predictions for the data manager task list with the same filters '
+            'as `GET api/tasks`. Use it together with the cursor pagination mode of the task list.'
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                name='project', type=openapi.TYPE_INTEGER, in_=openapi.IN_QUERY, description='Project ID'
+            ),
+            openapi.Parameter(name='view', type=openapi.TYPE_INTEGER, in_=openapi.IN_QUERY, description='View ID'),
+            openapi.Parameter(
+                name='approximate',
+                type=openapi.TYPE_BOOLEAN,
+                in_=openapi.IN_QUERY,
+                description='Return the planner estimation of the task count (PostgreSQL only) '
+                'and skip annotation and prediction totals',
+            ),
+        ],
+    ),
+)
+class TaskCountAPI(APIView):
+    permission_required = all_permissions.tasks_view
+
+    @staticmethod
+    def get_cache_key(project, prepare_params, approximate):
+        params = {
+            'filters': prepare_params.filters.model_dump(mode='json') if prepare_params.filters else None,
+            'selected_items': (
+                prepare_params.selectedItems.model_dump(mode='json') if prepare_params.selectedItems else None
+            ),
+            'approximate': approximate,
+        }
+        digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return f'data_manager:task_count:{project.id}:{digest}'
+
+    @staticmethod
+    def estimate_count(queryset):
+        """Get the row estimation from the query planner instead of running COUNT(*)"""
+        if settings.DJANGO_DB != settings.DJANGO_DB_POSTGRESQL:
+            return None
+        try:
+            plan = json.loads(queryset.values('id').explain(format='json'))
+            return int(plan[0]['Plan']['Plan Rows'])
+        except Exception as exc:
+            logger.warning(f'Failed to estimate task count: {exc}')
+            return None
+
+    def get(self, request):
+        view_pk = int_from_request(request.GET, 'view', 0)
+        project_pk = int_from_request(request.GET, 'project', 0)
+        if project_pk:
+            project = generics.get_object_or_404(Project, pk=project_pk)
+        elif view_pk:
+            project = generics.get_object_or_404(View, pk=view_pk).project
+        else:
+            return Response({'detail': 'Neither project nor view id specified'}, status=404)
+        self.check_object_permissions(request, project)
+
+        prepare_params = get_prepare_params(request, project)
+        approximate = bool_from_request(request.GET, 'approximate', False)
+        cache_key = self.get_cache_key(project, prepare_params, approximate)
+        result = cache.get(cache_key)
+        if result is not None:
+            return Response(result)
+
+        queryset = Task.prepared.only_filtered(prepare_params=prepare_params).order_by()
+        total = self.estimate_count(queryset) if approximate else None
+        if total is not None:
+            result = {'total': total, 'total_annotations': None, 'total_predictions': None, 'approximate': True}
+        else:
+            result = queryset.aggregate(
+                total=Count('id'),
+                total_annotations=Coalesce(Sum('total_annotations'), 0),
+                total_predictions=Coalesce(Sum('total_predictions'), 0),
+            )
+            result['approximate'] = False
+
+        cache.set(cache_key, result, settings.DATA_MANAGER_TASK_COUNT_CACHE_TIMEOUT)
+        return Response(result)
 
 
 @method_decorator(
@@ -1,17 +1,20 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import hashlib
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from typing import Any, Iterable, Tuple
 from urllib.parse import unquote
 
 import ujson as json
+from core.redis import redis_connected, redis_delete, redis_set, start_job_async_or_sync
 from core.utils.common import int_from_request
-from data_manager.models import View
+from data_manager.models import MaterializedColumnsState, MaterializedTaskColumns, View
 from data_manager.prepare_params import PrepareParams
 from django.conf import settings
+from django.utils.timezone import now
 from rest_framework.generics import get_object_or_404
-from tasks.models import Task
+from tasks.models import Annotation, Prediction, Task
 
 TASKS = 'tasks:'
 logger = logging.getLogger(__name__)
@@ -343,6 +346,43 @@ def evaluate_predictions(tasks):
         return backend.predict_tasks(tasks=tasks)
 
 
+def _predictions_fill_key(project_id, task_ids):
+    digest = hashlib.md5(','.join(map(str, sorted(task_ids))).encode()).hexdigest()
+    return f'dm-predictions-fill:{project_id}:{digest}'
+
+
+def fill_predictions(project_id, task_ids, fill_key=None):
+    """Background job: retrieve ML predictions for the tasks which still don't have them"""
+    try:
+        evaluate_predictions(Task.objects.filter(project_id=project_id, id__in=task_ids, predictions__isnull=True))
+    finally:
+        if fill_key:
+            redis_delete(fill_key)
+
+
+def schedule_predictions_fill(project, task_ids):
+    """Retrieve ML predictions for tasks without predictions in the background
+
+    Requests for the same tasks are coalesced while the job is pending, so many viewers of one
+    Data Manager page produce one job. Without redis predictions are retrieved synchronously.
+
+    :return: ids of tasks with pending predictions
+    """
+    if project.ml_backend is None:
+        return set()
+    task_ids = list(Task.objects.filter(id__in=task_ids, predictions__isnull=True).values_list('id', flat=True))
+    if not task_ids:
+        return set()
+    if not redis_connected():
+        fill_predictions(project.id, task_ids)
+        return set()
+
+    fill_key = _predictions_fill_key(project.id, task_ids)
+    if redis_set(fill_key, 1, ttl=settings.DATA_MANAGER_PREDICTIONS_FILL_TTL, nx=True):
+        start_job_async_or_sync(fill_predictions, project.id, task_ids, fill_key, queue_name='low')
+    return set(task_ids)
+
+
 def filters_ordering_selected_items_exist(data):
     return data.get('filters') or data.get('ordering') or data.get('selectedItems')
 
@@ -427,3 +467,114 @@ def intersperse(items: Iterable, separator: Any) -> list:
     if output:
         output.pop()
     return output
+
+
+MATERIALIZED_COLUMNS = (
+    'annotations_results',
+    'predictions_results',
+    'annotators',
+    'annotations_ids',
+    'predictions_model_versions',
+)
+
+
+def _append_unique(items, seen, value):
+    key = json.dumps(value, sort_keys=True)
+    if key not in seen:
+        seen.add(key)
+        items.append(value)
+
+
+def calculate_materialized_columns(task_ids):
+    """Calculate Data Manager aggregated columns for tasks with two plain queries
+    instead of ArrayAgg/GroupConcat joins
+
+    :param task_ids: list of task ids
+    :return: dict {task_id: {column: list}}
+    """
+    columns = {task_id: {column: [] for column in MATERIALIZED_COLUMNS} for task_id in task_ids}
+    seen = defaultdict(set)
+
+    annotations = (
+        Annotation.objects.filter(task_id__in=task_ids)
+        .order_by('id')
+        .values_list('task_id', 'id', 'result', 'completed_by_id')
+    )
+    for task_id, annotation_id, result, completed_by_id in annotations:
+        row = columns[task_id]
+        row['annotations_ids'].append(annotation_id)
+        _append_unique(row['annotations_results'], seen[(task_id, 'annotations_results')], result)
+        _append_unique(row['annotators'], seen[(task_id, 'annotators')], completed_by_id)
+
+    predictions = (
+        Prediction.objects.filter(task_id__in=task_ids)
+        .order_by('id')
+        .values_list('task_id', 'result', 'model_version')
+    )
+    for task_id, result, model_version in predictions:
+        row = columns[task_id]
+        row['predictions_model_versions'].append(model_version)
+        _append_unique(row['predictions_results'], seen[(task_id, 'predictions_results')], result)
+
+    return columns
+
+
+def refresh_materialized_columns(task_ids, create=True):
+    """Recalculate materialized Data Manager columns for the given tasks
+
+    :param task_ids: iterable with task ids
+    :param create: insert missing rows; use False from delete signals,
+                   otherwise a row can be inserted for a task that is being deleted in cascade
+    """
+    task_ids = list(set(task_ids))
+    for start in range(0, len(task_ids), settings.BATCH_SIZE):
+        chunk = task_ids[start : start + settings.BATCH_SIZE]
+        columns = calculate_materialized_columns(chunk)
+
+        if not create:
+            for task_id, row in columns.items():
+                MaterializedTaskColumns.objects.filter(task_id=task_id).update(**row, updated_at=now())
+            continue
+
+        rows = [
+            MaterializedTaskColumns(task_id=task_id, project_id=project_id, **columns[task_id])
+            for task_id, project_id in Task.objects.filter(id__in=chunk).values_list('id', 'project_id')
+        ]
+        MaterializedTaskColumns.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['task'],
+            update_fields=list(MATERIALIZED_COLUMNS) + ['updated_at'],
+        )
+
+
+def rebuild_materialized_columns(project):
+    """Build materialized Data Manager columns for all project tasks and mark them as fresh"""
+    MaterializedColumnsState.objects.update_or_create(project=project, defaults={'is_fresh': False})
+
+    task_ids = list(Task.objects.filter(project=project).values_list('id', flat=True))
+    refresh_materialized_columns(task_ids)
+    MaterializedTaskColumns.objects.filter(project=project).exclude(task_id__in=task_ids).delete()
+
+    MaterializedColumnsState.objects.filter(project=project).update(is_fresh=True, built_at=now())
+    logger.info(f'Materialized columns rebuilt for project {project.id}: {len(task_ids)} tasks')
+
+
+def materialized_columns_maintained(project_id):
+    """Materialized columns are updated from signals only when they were built for the project"""
+    if not settings.DATA_MANAGER_MATERIALIZED_COLUMNS or project_id is None:
+        return False
+    return MaterializedColumnsState.objects.filter(project_id=project_id).exists()
+
+
+def maintain_materialized_columns(project_id, task_ids, create=True):
+    """Incremental update of materialized columns after annotations or predictions were changed"""
+    if materialized_columns_maintained(project_id):
+        refresh_materialized_columns(task_ids, create=create)
+
+
+def materialized_columns_are_fresh(project):
+    """Data Manager may read materialized columns instead of aggregating annotations and predictions"""
+    if not settings.DATA_MANAGER_MATERIALIZED_COLUMNS or project is None:
+        return False
+    return MaterializedColumnsState.objects.filter(project=project, is_fresh=True).exists()
@@ -0,0 +1,37 @@
+import logging
+
+from core.redis import start_job_async_or_sync
+from django.core.management.base import BaseCommand
+from projects.models import Project
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized Data Manager columns (annotations_results, annotators, etc) in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-p', '--project', type=int, help='project id', default=None)
+        parser.add_argument('-o', '--organization', type=int, help='organization id', default=None)
+        parser.add_argument(
+            '--redis',
+            dest='redis',
+            action='store_true',
+            default=False,
+            help='Use rq workers with redis (async background processing)',
+        )
+
+    def handle(self, *args, **options):
+        from data_manager.functions import rebuild_materialized_columns
+
+        projects = Project.objects.all()
+        if options['project'] is not None:
+            projects = projects.filter(id=options['project'])
+        if options['organization'] is not None:
+            projects = projects.filter(organization_id=options['organization'])
+
+        for project in projects.order_by('id'):
+            logger.debug(f'Start rebuilding materialized columns for project {project.id}.')
+            start_job_async_or_sync(rebuild_materialized_columns, project, redis=options['redis'], queue_name='low')
+
+        logger.debug('Materialized columns rebuild started for all selected projects.')
@@ -135,7 +135,7 @@ def get_fields_for_evaluation(prepare_params, user, skip_regular=True):
     return result
 
 
-def apply_ordering(queryset, ordering, project, request, view_data=None):
+def apply_ordering(queryset, ordering, project, request, view_data=None, preprocessed=None):
     if ordering:
 
         preprocess_field_name = load_func(settings.PREPROCESS_FIELD_NAME)
@@ -149,7 +149,10 @@ def apply_ordering(queryset, ordering, project, request, view_data=None):
             and view_data['columnsDisplayType'][unsigned_field_name] == 'Number'
         ):
             numeric_ordering = True
-        field_name, ascending = preprocess_field_name(raw_field_name, project=project)
+        if preprocessed is not None:
+            field_name, ascending = preprocessed
+        else:
+            field_name, ascending = preprocess_field_name(raw_field_name, project=project)
 
         if field_name.startswith('data__'):
             # annotate task with data field for float/int/bool ordering support
@@ -257,26 +260,33 @@ def add_user_filter(enabled, key, _filter, filter_expressions):
         return 'continue'
 
 
-def apply_filters(queryset, filters, project, request):
+def apply_filters(queryset, filters, project, request, field_names=None):
+    """Convert filters to ORM expressions
+
+    :param field_names: field names already preprocessed for each filter item (from QueryPlan)
+    """
     if not filters:
         return queryset
 
     # convert conjunction to orm statement
     filter_expressions = []
     custom_filter_expressions = load_func(settings.DATA_MANAGER_CUSTOM_FILTER_EXPRESSIONS)
+    preprocess_field_name = load_func(settings.PREPROCESS_FIELD_NAME)
+    preprocess_filter = load_func(settings.DATA_MANAGER_PREPROCESS_FILTER)
 
-    for _filter in filters.items:
+    for index, _filter in enumerate(filters.items):
 
         # we can also have annotations filters
         if not _filter.filter.startswith('filter:tasks:') or _filter.value is None:
             continue
 
         # django orm loop expression attached to column name
-        preprocess_field_name = load_func(settings.PREPROCESS_FIELD_NAME)
-        field_name, _ = preprocess_field_name(_filter.filter, project)
+        if field_names is not None:
+            field_name = field_names[index]
+        else:
+            field_name, _ = preprocess_field_name(_filter.filter, project)
 
         # filter pre-processing, value type conversion, etc..
-        preprocess_filter = load_func(settings.DATA_MANAGER_PREPROCESS_FILTER)
         _filter = preprocess_filter(_filter, field_name)
 
         # custom expressions for enterprise
@@ -483,8 +493,22 @@ class TaskQuerySet(models.QuerySet):
 
         project = Project.objects.get(pk=prepare_params.project)
         request = prepare_params.request
-        queryset = apply_filters(queryset, prepare_params.filters, project, request)
-        queryset = apply_ordering(queryset, prepare_params.ordering, project, request, view_data=prepare_params.data)
+        plan = prepare_params.plan
+        queryset = apply_filters(
+            queryset,
+            prepare_params.filters,
+            project,
+            request,
+            field_names=plan.filter_field_names if plan else None,
+        )
+        queryset = apply_ordering(
+            queryset,
+            prepare_params.ordering,
+            project,
+            request,
+            view_data=prepare_params.data,
+            preprocessed=plan.ordering if plan else None,
+        )
 
         if not prepare_params.selectedItems:
             return queryset
@@ -591,7 +615,16 @@ def annotate_storage_filename(queryset: TaskQuerySet) -> TaskQuerySet:
     )
 
 
+def annotate_materialized_column(queryset, column):
+    """Read an aggregated column from data_manager.MaterializedTaskColumns,
+    tasks without annotations and predictions may have no row, so the value is None for them
+    """
+    return queryset.annotate(**{column: F(f'materialized_columns__{column}')})
+
+
 def annotate_annotations_results(queryset):
+    if getattr(queryset, 'materialized_columns', False):
+        return annotate_materialized_column(queryset, 'annotations_results')
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         return queryset.annotate(
             annotations_results=Coalesce(
@@ -603,6 +636,8 @@ def annotate_annotations_results(queryset):
 
 
 def annotate_predictions_results(queryset):
+    if getattr(queryset, 'materialized_columns', False):
+        return annotate_materialized_column(queryset, 'predictions_results')
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         return queryset.annotate(
             predictions_results=Coalesce(
@@ -614,6 +649,8 @@ def annotate_predictions_results(queryset):
 
 
 def annotate_annotators(queryset):
+    if getattr(queryset, 'materialized_columns', False):
+        return annotate_materialized_column(queryset, 'annotators')
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         return queryset.annotate(
             annotators=Coalesce(GroupConcat('annotations__completed_by'), Value(''), output_field=models.CharField())
@@ -650,6 +687,8 @@ def annotate_predictions_score(queryset):
 
 
 def annotate_annotations_ids(queryset):
+    if getattr(queryset, 'materialized_columns', False):
+        return annotate_materialized_column(queryset, 'annotations_ids')
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         return queryset.annotate(annotations_ids=GroupConcat('annotations__id', output_field=models.CharField()))
     else:
@@ -657,6 +696,8 @@ def annotate_annotations_ids(queryset):
 
 
 def annotate_predictions_model_versions(queryset):
+    if getattr(queryset, 'materialized_columns', False):
+        return annotate_materialized_column(queryset, 'predictions_model_versions')
     if settings.DJANGO_DB == settings.DJANGO_DB_SQLITE:
         return queryset.annotate(
             predictions_model_versions=GroupConcat('predictions__model_version', output_field=models.CharField())
@@ -709,6 +750,8 @@ def update_annotation_map(obj):
 class PreparedTaskManager(models.Manager):
     @staticmethod
     def annotate_queryset(queryset, fields_for_evaluation=None, all_fields=False, request=None):
+        from data_manager.functions import MATERIALIZED_COLUMNS, materialized_columns_are_fresh
+
         annotations_map = get_annotations_map()
 
         if fields_for_evaluation is None:
@@ -716,12 +759,16 @@ class PreparedTaskManager(models.Manager):
 
         first_task = queryset.first()
         project = None if first_task is None else first_task.project
+        materialized_columns = False
+        if project is not None and (all_fields or set(fields_for_evaluation) & set(MATERIALIZED_COLUMNS)):
+            materialized_columns = materialized_columns_are_fresh(project)
 
         # db annotations applied only if we need them in ordering or filters
         for field in annotations_map.keys():
             if field in fields_for_evaluation or all_fields:
                 queryset.project = project
                 queryset.request = request
+                queryset.materialized_columns = materialized_columns
                 function = annotations_map[field]
                 queryset = function(queryset)
 
@@ -746,7 +793,10 @@ class PreparedTaskManager(models.Manager):
     def only_filtered(self, prepare_params=None):
         request = prepare_params.request
         queryset = TaskQuerySet(self.model).filter(project=prepare_params.project)
-        fields_for_filter_ordering = get_fields_for_filter_ordering(prepare_params)
+        if prepare_params.plan is not None:
+            fields_for_filter_ordering = prepare_params.plan.fields_for_filter_ordering
+        else:
+            fields_for_filter_ordering = get_fields_for_filter_ordering(prepare_params)
         queryset = self.annotate_queryset(queryset, fields_for_evaluation=fields_for_filter_ordering, request=request)
         return queryset.prepared(prepare_params=prepare_params)
 
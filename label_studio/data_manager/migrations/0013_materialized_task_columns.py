@@ -0,0 +1,130 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_manager", "0012_alter_view_user"),
+        ("projects", "0028_auto_20241107_1031"),
+        ("tasks", "0054_add_brin_index_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaterializedColumnsState",
+            fields=[
+                (
+                    "project",
+                    models.OneToOneField(
+                        help_text="Project ID",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="materialized_columns_state",
+                        serialize=False,
+                        to="projects.project",
+                    ),
+                ),
+                (
+                    "is_fresh",
+                    models.BooleanField(
+                        default=False,
+                        help_text="All task rows are built and maintained incrementally",
+                        verbose_name="is fresh",
+                    ),
+                ),
+                (
+                    "built_at",
+                    models.DateTimeField(
+                        default=None,
+                        help_text="Last full rebuild time",
+                        null=True,
+                        verbose_name="built at",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="MaterializedTaskColumns",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        help_text="Task ID",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="materialized_columns",
+                        serialize=False,
+                        to="tasks.task",
+                    ),
+                ),
+                (
+                    "annotations_results",
+                    models.JSONField(
+                        default=list,
+                        help_text="Distinct results of all task annotations",
+                        verbose_name="annotations results",
+                    ),
+                ),
+                (
+                    "predictions_results",
+                    models.JSONField(
+                        default=list,
+                        help_text="Distinct results of all task predictions",
+                        verbose_name="predictions results",
+                    ),
+                ),
+                (
+                    "annotators",
+                    models.JSONField(
+                        default=list,
+                        help_text="Distinct user IDs of task annotators",
+                        verbose_name="annotators",
+                    ),
+                ),
+                (
+                    "annotations_ids",
+                    models.JSONField(
+                        default=list,
+                        help_text="IDs of task annotations",
+                        verbose_name="annotations ids",
+                    ),
+                ),
+                (
+                    "predictions_model_versions",
+                    models.JSONField(
+                        default=list,
+                        help_text="Model versions of task predictions",
+                        verbose_name="predictions model versions",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Last time the row was recalculated",
+                        verbose_name="updated at",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        help_text="Project ID",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="materialized_task_columns",
+                        to="projects.project",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["project", "task"],
+                        name="data_manage_project_b12315_idx",
+                    )
+                ],
+            },
+        ),
+    ]
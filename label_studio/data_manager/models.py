@@ -50,6 +50,21 @@ class ProjectViewMixin(models.Model):
 
 class View(ViewBaseModel, ProjectViewMixin):
     def get_prepare_tasks_params(self, add_selected_items=False):
+        if not settings.DATA_MANAGER_QUERY_PLAN_CACHE_SIZE:
+            return PrepareParams(**self._get_prepare_tasks_data(add_selected_items))
+        plan, _ = self.get_query_plan(add_selected_items)
+        return plan.get_prepare_params()
+
+    def get_query_plan(self, add_selected_items=False):
+        """Get compiled query plan of the view
+
+        :return: (plan, True if the plan was taken from the cache)
+        """
+        from data_manager.query_plan import get_query_plan
+
+        return get_query_plan(self, self._get_prepare_tasks_data(add_selected_items))
+
+    def _get_prepare_tasks_data(self, add_selected_items=False):
         # convert filters to PrepareParams structure
         filters = None
         if self.filter_group:
@@ -73,7 +88,7 @@ class View(ViewBaseModel, ProjectViewMixin):
         if add_selected_items and self.selected_items:
             selected_items = self.selected_items
 
-        return PrepareParams(
+        return dict(
             project=self.project_id, ordering=ordering, filters=filters, data=self.data, selectedItems=selected_items
         )
 
@@ -91,3 +106,52 @@ class Filter(models.Model):
     type = models.CharField(_('type'), max_length=1024, help_text='Field type')
     operator = models.CharField(_('operator'), max_length=1024, help_text='Filter operator')
     value = models.JSONField(_('value'), default=dict, null=True, help_text='Filter value')
+
+
+class MaterializedTaskColumns(models.Model):
+    """Precomputed Data Manager columns that otherwise need ArrayAgg/GroupConcat over annotations and predictions"""
+
+    task = models.OneToOneField(
+        'tasks.Task',
+        primary_key=True,
+        related_name='materialized_columns',
+        on_delete=models.CASCADE,
+        help_text='Task ID',
+    )
+    project = models.ForeignKey(
+        'projects.Project',
+        related_name='materialized_task_columns',
+        on_delete=models.CASCADE,
+        help_text='Project ID',
+    )
+    annotations_results = models.JSONField(
+        _('annotations results'), default=list, help_text='Distinct results of all task annotations'
+    )
+    predictions_results = models.JSONField(
+        _('predictions results'), default=list, help_text='Distinct results of all task predictions'
+    )
+    annotators = models.JSONField(_('annotators'), default=list, help_text='Distinct user IDs of task annotators')
+    annotations_ids = models.JSONField(_('annotations ids'), default=list, help_text='IDs of task annotations')
+    predictions_model_versions = models.JSONField(
+        _('predictions model versions'), default=list, help_text='Model versions of task predictions'
+    )
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True, help_text='Last time the row was recalculated')
+
+    class Meta:
+        indexes = [models.Index(fields=['project', 'task'])]
+
+
+class MaterializedColumnsState(models.Model):
+    """Tracks whether MaterializedTaskColumns rows are complete for a project and can be used by the Data Manager"""
+
+    project = models.OneToOneField(
+        'projects.Project',
+        primary_key=True,
+        related_name='materialized_columns_state',
+        on_delete=models.CASCADE,
+        help_text='Project ID',
+    )
+    is_fresh = models.BooleanField(
+        _('is fresh'), default=False, help_text='All task rows are built and maintained incrementally'
+    )
+    built_at = models.DateTimeField(_('built at'), null=True, default=None, help_text='Last full rebuild time')
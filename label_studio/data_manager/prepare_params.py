@@ -4,7 +4,7 @@ from enum import Enum
 from typing import Any, List, Optional, Union
 
 from drf_yasg import openapi
-from pydantic import BaseModel, StrictBool, StrictFloat, StrictInt, StrictStr
+from pydantic import BaseModel, Field, StrictBool, StrictFloat, StrictInt, StrictStr
 
 
 class FilterIn(BaseModel):
@@ -42,6 +42,7 @@ class PrepareParams(BaseModel):
     filters: Optional[Filters] = None
     data: Optional[dict] = None
     request: Optional[Any] = None
+    plan: Optional[Any] = Field(default=None, exclude=True)
 
 
 class CustomEnum(Enum):
@@ -0,0 +1,112 @@
+"""This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import ujson as json
+from core.utils.common import load_func
+from data_manager.prepare_params import PrepareParams
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_plans = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+class QueryPlan:
+    """Filters, ordering and required annotations of a data manager view compiled once
+
+    PrepareParams parsing, filter & ordering field name preprocessing and the list of fields
+    to annotate are calculated when the plan is built. The task list, only_filtered() and actions
+    reuse the plan until the view, the project label config or the project data columns are changed.
+    """
+
+    def __init__(self, project, prepare_params: PrepareParams, key=None):
+        from data_manager.managers import get_fields_for_filter_ordering
+
+        preprocess_field_name = load_func(settings.PREPROCESS_FIELD_NAME)
+
+        self.key = key
+        self.project_id = project.id
+        self.prepare_params = prepare_params
+        self.fields_for_filter_ordering = get_fields_for_filter_ordering(prepare_params)
+
+        self.filter_field_names = []
+        if prepare_params.filters:
+            for _filter in prepare_params.filters.items:
+                field_name = None
+                if _filter.filter.startswith('filter:tasks:'):
+                    field_name, _ = preprocess_field_name(_filter.filter, project)
+                self.filter_field_names.append(field_name)
+
+        self.ordering = None
+        if prepare_params.ordering:
+            self.ordering = preprocess_field_name(prepare_params.ordering[0], project=project)
+
+    def get_prepare_params(self, request=None):
+        """Get a copy of prepare params bound to this plan, filters are mutated while applying,
+        so they can't be shared between requests
+        """
+        return self.prepare_params.model_copy(update={'request': request, 'plan': self}, deep=True)
+
+    def describe(self):
+        return {
+            'key': self.key,
+            'project': self.project_id,
+            'filters': (self.prepare_params.filters.model_dump(mode='json') if self.prepare_params.filters else None),
+            'filter_field_names': self.filter_field_names,
+            'ordering': self.prepare_params.ordering,
+            'ordering_field_name': self.ordering,
+            'fields_for_filter_ordering': self.fields_for_filter_ordering,
+            'selected_items': (
+                self.prepare_params.selectedItems.model_dump(mode='json')
+                if self.prepare_params.selectedItems
+                else None
+            ),
+        }
+
+
+def get_plan_key(view, project, params):
+    """Plan key depends on the view content and on everything preprocess_field_name() uses"""
+    key = {'params': params, 'label_config': project.label_config}
+    if 'data.' in json.dumps([params.get('filters'), params.get('ordering')]):
+        key['common_data_columns'] = project.summary.common_data_columns
+    digest = hashlib.md5(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    return f'{view.id}:{digest}'
+
+
+def get_query_plan(view, params):
+    """Get compiled query plan for the view from the in-process LRU cache or build a new one
+
+    :param view: data manager View
+    :param params: dict with raw PrepareParams fields collected from the view
+    :return: (plan, True if the plan was taken from the cache)
+    """
+    project = view.project
+    key = get_plan_key(view, project, params)
+
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+            return plan, True
+
+    plan = QueryPlan(project, PrepareParams(**params), key=key)
+    with _plans_lock:
+        _plans[key] = plan
+        while len(_plans) > settings.DATA_MANAGER_QUERY_PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan, False
+
+
+def invalidate_query_plans(view_id=None):
+    """Drop cached plans of the view or all plans"""
+    with _plans_lock:
+        if view_id is None:
+            _plans.clear()
+            return
+        for key in [k for k in _plans if k.startswith(f'{view_id}:')]:
+            del _plans[key]
@@ -8,8 +8,8 @@ from datetime import timedelta
 from typing import Union
 from urllib.parse import urlparse
 
-from azure.core.exceptions import ResourceNotFoundError
-from azure.storage.blob import BlobSasPermissions, BlobServiceClient, generate_blob_sas
+from azure.core.exceptions import ClientAuthenticationError, ResourceNotFoundError
+from azure.storage.blob import BlobSasPermissions, generate_blob_sas
 from core.redis import start_job_async_or_sync
 from core.utils.params import get_env
 from django.conf import settings
@@ -66,14 +66,7 @@ class AzureBlobStorageMixin(models.Model):
                 'environment variables AZURE_BLOB_ACCOUNT_NAME and AZURE_BLOB_ACCOUNT_KEY '
                 'or account_name and account_key fields.'
             )
-        connection_string = (
-            'DefaultEndpointsProtocol=https;AccountName='
-            + account_name
-            + ';AccountKey='
-            + account_key
-            + ';EndpointSuffix=core.windows.net'
-        )
-        client = BlobServiceClient.from_connection_string(conn_str=connection_string)
+        client = AZURE.get_client(account_name, account_key)
         container = client.get_container_client(str(self.container))
         return client, container
 
@@ -81,6 +74,9 @@ class AzureBlobStorageMixin(models.Model):
         _, container = self.get_client_and_container()
         return container
 
+    def evict_client(self, reason=''):
+        AZURE.evict_client(self.get_account_name(), self.get_account_key(), reason=reason)
+
     def validate_connection(self, **kwargs):
         logger.debug('Validating Azure Blob Storage connection')
         client, container = self.get_client_and_container()
@@ -90,6 +86,9 @@ class AzureBlobStorageMixin(models.Model):
             logger.debug(f'Container exists: {container_properties.name}')
         except ResourceNotFoundError:
             raise KeyError(f'Container not found: {self.container}')
+        except ClientAuthenticationError as e:
+            self.evict_client(reason=str(e))
+            raise
 
         # Check path existence for Import storages only
         if self.prefix and 'Export' not in self.__class__.__name__:
@@ -186,6 +185,8 @@ class AzureBlobStorageMixin(models.Model):
             return downloader, content_type, metadata
 
         except Exception as e:
+            if isinstance(e, ClientAuthenticationError):
+                self.evict_client(reason=str(e))
             logger.error(f'Error getting bytes stream from Azure for uri {uri}: {e}', exc_info=True)
             return None, None, {}
 
@@ -247,6 +248,10 @@ class AzureBlobImportStorageBase(AzureBlobStorageMixin, ImportStorage):
             'https://' + self.get_account_name() + '.blob.core.windows.net/' + container + '/' + blob + '?' + sas_token
         )
 
+    def get_stream_url(self, url):
+        """SAS url for the async storage proxy, Azure urls are always signed"""
+        return self.generate_http_url(url)
+
     def can_resolve_url(self, url: Union[str, None]) -> bool:
         return storage_can_resolve_bucket_url(self, url)
 
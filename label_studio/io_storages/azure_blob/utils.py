@@ -2,9 +2,12 @@ import fnmatch
 import logging
 import re
 
+import requests
+from azure.core.pipeline.transport import RequestsTransport
 from azure.storage.blob import BlobServiceClient
 from core.utils.params import get_env
 from django.conf import settings
+from io_storages.client_pool import client_pool, mount_http_adapter
 
 logger = logging.getLogger(__name__)
 
@@ -21,17 +24,36 @@ class AZURE(object):
                 'Azure account name and key must be set using '
                 'environment variables AZURE_BLOB_ACCOUNT_NAME and AZURE_BLOB_ACCOUNT_KEY'
             )
-        connection_string = (
-            'DefaultEndpointsProtocol=https;AccountName='
-            + account_name
-            + ';AccountKey='
-            + account_key
-            + ';EndpointSuffix=core.windows.net'
-        )
-        client = BlobServiceClient.from_connection_string(conn_str=connection_string)
+        client = cls.get_client(account_name, account_key)
         container = client.get_container_client(str(container))
         return client, container
 
+    @classmethod
+    def get_client(cls, account_name: str, account_key: str) -> BlobServiceClient:
+        """Pooled blob service client of the account, its requests session is shared by sync threads"""
+
+        def create_client():
+            connection_string = (
+                'DefaultEndpointsProtocol=https;AccountName='
+                + account_name
+                + ';AccountKey='
+                + account_key
+                + ';EndpointSuffix=core.windows.net'
+            )
+            session = mount_http_adapter(requests.Session())
+            transport = RequestsTransport(session=session, session_owner=False)
+            return BlobServiceClient.from_connection_string(conn_str=connection_string, transport=transport)
+
+        return client_pool.get(cls.get_client_pool_key(account_name, account_key), create_client)
+
+    @classmethod
+    def get_client_pool_key(cls, account_name: str, account_key: str) -> str:
+        return client_pool.make_key('azure', account_name, account_key)
+
+    @classmethod
+    def evict_client(cls, account_name: str, account_key: str, reason: str = ''):
+        client_pool.evict(cls.get_client_pool_key(account_name, account_key), reason=reason)
+
     @classmethod
     def get_blob_metadata(cls, url: str, container: str, account_name: str = None, account_key: str = None) -> dict:
         """
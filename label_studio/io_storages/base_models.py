@@ -6,7 +6,9 @@ import itertools
 import json
 import logging
 import os
+import time
 import traceback as tb
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict
 from datetime import datetime
@@ -20,17 +22,20 @@ from core.feature_flags import flag_set
 from core.redis import is_job_in_queue, is_job_on_worker, redis_connected
 from core.utils.common import load_func
 from data_export.serializers import ExportDataSerializer
+from data_manager.functions import maintain_materialized_columns
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.db import models, transaction
-from django.db.models import JSONField
+from django.db.models import Count, JSONField, Prefetch
 from django.shortcuts import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_rq import job
-from io_storages.utils import StorageObject, get_uri_via_regex, parse_bucket_uri
+from io_storages.client_pool import client_pool
+from io_storages.presign_cache import get_presigned_url
+from io_storages.utils import StorageObject, get_uri_via_regex, parse_bucket_uri, pop_loaded_blob_size
 from rq.job import Job
-from tasks.models import Annotation, Task
+from tasks.models import Annotation, Prediction, Task
 from tasks.serializers import AnnotationSerializer, PredictionSerializer
 from webhooks.models import WebhookAction
 from webhooks.utils import emit_webhooks_for_instance
@@ -112,6 +117,7 @@ class StorageInfo(models.Model):
         self.meta['duration'] = (time_completed - self.time_in_progress).total_seconds()
         self.meta.update(kwargs)
         self.save(update_fields=['status', 'meta', 'last_sync', 'last_sync_count'])
+        logger.info(f'Storage {self} sync completed, storage client pool: {client_pool.get_stats()}')
 
     def info_set_failed(self):
         self.status = self.Status.FAILED
@@ -123,13 +129,13 @@ class StorageInfo(models.Model):
         self.meta['duration'] = (time_failure - self.time_in_progress).total_seconds()
         self.save(update_fields=['status', 'traceback', 'meta'])
 
-    def info_update_progress(self, last_sync_count, **kwargs):
+    def info_update_progress(self, last_sync_count, force=False, **kwargs):
         # update db counter once per 5 seconds to avid db overloads
         now = timezone.now()
         last_ping = datetime.fromisoformat(self.meta['time_last_ping'])
         delta = (now - last_ping).total_seconds()
 
-        if delta > settings.STORAGE_IN_PROGRESS_TIMER:
+        if force or delta > settings.STORAGE_IN_PROGRESS_TIMER:
             self.last_sync_count = last_sync_count
             self.meta['time_last_ping'] = str(now)
             self.meta['duration'] = (now - self.time_in_progress).total_seconds()
@@ -211,6 +217,64 @@ class StorageInfo(models.Model):
             )
 
 
+class StorageProgress:
+    """In-memory progress of a storage sync or export job
+
+    Counters are aggregated in memory and flushed to the storage with info_update_progress() at most once per
+    STORAGE_PROGRESS_FLUSH_SECONDS or every STORAGE_PROGRESS_FLUSH_ITEMS processed items.
+    Throughput (items/sec) and ETA (seconds, only when total is known) are stored in meta on every flush.
+    """
+
+    def __init__(self, storage, total=None):
+        self.storage = storage
+        self.total = total
+        self.processed = 0
+        self.last_sync_count = 0
+        self.counters = {}
+        self.started = self.last_flush = time.monotonic()
+        self.last_flush_processed = 0
+
+    def update(self, processed=1, last_sync_count=None, **counters):
+        self.processed += processed
+        if last_sync_count is not None:
+            self.last_sync_count = last_sync_count
+        self.counters.update(counters)
+
+        if (
+            self.processed - self.last_flush_processed >= settings.STORAGE_PROGRESS_FLUSH_ITEMS
+            or time.monotonic() - self.last_flush >= settings.STORAGE_PROGRESS_FLUSH_SECONDS
+        ):
+            self.flush()
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        throughput = self.processed / elapsed if elapsed > 0 else None
+        eta = None
+        if self.total is not None and throughput:
+            eta = round(max(self.total - self.processed, 0) / throughput, 1)
+        return {
+            'items_processed': self.processed,
+            'throughput': round(throughput, 2) if throughput is not None else None,
+            'eta': eta,
+        }
+
+    def flush(self):
+        self.storage.info_update_progress(
+            last_sync_count=self.last_sync_count, force=True, **self.counters, **self.stats()
+        )
+        self.last_flush = time.monotonic()
+        self.last_flush_processed = self.processed
+
+    def complete(self, last_sync_count=None, **counters):
+        """Set storage completed with the final counters"""
+        if last_sync_count is not None:
+            self.last_sync_count = last_sync_count
+        self.counters.update(counters)
+        stats = self.stats()
+        stats['eta'] = 0
+        self.storage.info_set_completed(last_sync_count=self.last_sync_count, **self.counters, **stats)
+
+
 class Storage(StorageInfo):
     url_scheme = ''
 
@@ -228,6 +292,11 @@ class Storage(StorageInfo):
 
 
 class ImportStorage(Storage):
+    # number of threads downloading objects ahead of task creation and the maximum size of downloaded
+    # but not yet processed data, None means settings.STORAGE_IMPORT_PREFETCH_WORKERS/MAX_BYTES is used
+    prefetch_workers = None
+    prefetch_max_bytes = None
+
     def iterkeys(self):
         return iter(())
 
@@ -323,7 +392,7 @@ class ImportStorage(Storage):
                         # this branch is our old approach:
                         # it generates presigned URLs if storage.presign=True;
                         # or it inserts base64 media into task data if storage.presign=False
-                        http_url = self.generate_http_url(extracted_uri)
+                        http_url = get_presigned_url(self, extracted_uri)
 
                 return uri.replace(extracted_uri, http_url)
             except Exception:
@@ -341,8 +410,9 @@ class ImportStorage(Storage):
 
         raise NotImplementedError
 
-    @classmethod
-    def add_task(cls, project, maximum_annotations, max_inner_id, storage, link_object: StorageObject, link_class):
+    @staticmethod
+    def _prepare_task_data(link_object: StorageObject):
+        """Split storage object into task data, predictions, annotations and storage link kwargs"""
         link_kwargs = asdict(link_object)
         data = link_kwargs.pop('task_data', None)
 
@@ -356,13 +426,11 @@ class ImportStorage(Storage):
 
         # annotations
         annotations = data.get('annotations') or []
-        cancelled_annotations = 0
         if annotations:
             if 'data' not in data:
                 raise ValueError(
                     'If you use "annotations" field in the task, ' 'you must put "data" field in the task too'
                 )
-            cancelled_annotations = len([a for a in annotations if a.get('was_cancelled', False)])
 
         if 'data' in data and isinstance(data['data'], dict):
             if data['data'] is not None:
@@ -370,45 +438,191 @@ class ImportStorage(Storage):
             else:
                 data.pop('data')
 
-        with transaction.atomic():
-            task = Task.objects.create(
-                data=data,
-                project=project,
-                overlap=maximum_annotations,
-                is_labeled=len(annotations) >= maximum_annotations,
-                total_predictions=len(predictions),
-                total_annotations=len(annotations) - cancelled_annotations,
-                cancelled_annotations=cancelled_annotations,
-                inner_id=max_inner_id,
-            )
+        return data, predictions, annotations, link_kwargs
 
-            link_class.create(task, storage=storage, **link_kwargs)
-            logger.debug(f'Create {storage.__class__.__name__} link with {link_kwargs} for {task=}')
+    @classmethod
+    def add_task(cls, project, maximum_annotations, max_inner_id, storage, link_object: StorageObject, link_class):
+        return cls.add_tasks(project, maximum_annotations, max_inner_id, storage, [link_object], link_class)[0]
 
-            raise_exception = not flag_set(
-                'ff_fix_back_dev_3342_storage_scan_with_invalid_annotations', user=AnonymousUser()
-            )
+    @classmethod
+    def add_tasks(
+        cls, project, maximum_annotations, max_inner_id, storage, link_objects: list[StorageObject], link_class
+    ) -> list[Task]:
+        """Create tasks, storage links, predictions and annotations for a batch of storage objects in bulk
 
-            # add predictions
-            logger.debug(f'Create {len(predictions)} predictions for task={task}')
-            for prediction in predictions:
-                prediction['task'] = task.id
-                prediction['project'] = project.id
-            prediction_ser = PredictionSerializer(data=predictions, many=True)
-            if prediction_ser.is_valid(raise_exception=raise_exception):
-                prediction_ser.save()
+        Tasks get sequential inner ids starting from max_inner_id.
+        """
+        raise_exception = not flag_set(
+            'ff_fix_back_dev_3342_storage_scan_with_invalid_annotations', user=AnonymousUser()
+        )
+
+        items = [cls._prepare_task_data(link_object) for link_object in link_objects]
+
+        with transaction.atomic():
+            tasks = [
+                Task(data=data, project=project, overlap=maximum_annotations, inner_id=max_inner_id + i)
+                for i, (data, _, _, _) in enumerate(items)
+            ]
+            tasks = Task.objects.bulk_create(tasks, batch_size=settings.BATCH_SIZE)
+
+            links = [
+                link_class(task=task, storage=storage, object_exists=True, **link_kwargs)
+                for task, (_, _, _, link_kwargs) in zip(tasks, items)
+            ]
+            link_class.objects.bulk_create(links, batch_size=settings.BATCH_SIZE)
+            logger.debug(f'Create {len(links)} {storage.__class__.__name__} links for {len(tasks)} tasks')
+
+            # add predictions, validation errors of one task don't affect other tasks
+            db_predictions = []
+            for task, (_, predictions, _, _) in zip(tasks, items):
+                if not predictions:
+                    continue
+                for prediction in predictions:
+                    prediction['task'] = task.id
+                    prediction['project'] = project.id
+                prediction_ser = PredictionSerializer(data=predictions, many=True)
+                if prediction_ser.is_valid(raise_exception=raise_exception):
+                    for validated in prediction_ser.validated_data:
+                        # bulk_create doesn't call save(), so the result has to be normalized here
+                        validated['result'] = Prediction.prepare_prediction_result(validated['result'], project)
+                        db_predictions.append(Prediction(**validated))
+            db_predictions = Prediction.objects.bulk_create(db_predictions, batch_size=settings.BATCH_SIZE)
+            logger.debug(f'Create {len(db_predictions)} predictions for {len(tasks)} tasks')
 
             # add annotations
-            logger.debug(f'Create {len(annotations)} annotations for task={task}')
-            for annotation in annotations:
-                annotation['task'] = task.id
-                annotation['project'] = project.id
-            annotation_ser = AnnotationSerializer(data=annotations, many=True)
-            if annotation_ser.is_valid(raise_exception=raise_exception):
-                annotation_ser.save()
-        return task
+            db_annotations = []
+            for task, (_, _, annotations, _) in zip(tasks, items):
+                if not annotations:
+                    continue
+                for annotation in annotations:
+                    annotation['task'] = task.id
+                    annotation['project'] = project.id
+                annotation_ser = AnnotationSerializer(data=annotations, many=True)
+                if annotation_ser.is_valid(raise_exception=raise_exception):
+                    for validated in annotation_ser.validated_data:
+                        annotation = Annotation(**validated)
+                        annotation.result_count = len({r.get('id') for r in (annotation.result or [])})
+                        db_annotations.append(annotation)
+            db_annotations = Annotation.objects.bulk_create(db_annotations, batch_size=settings.BATCH_SIZE)
+            logger.debug(f'Create {len(db_annotations)} annotations for {len(tasks)} tasks')
+
+            # bulk_create doesn't send post_save, so counters, is_labeled and materialized columns
+            # of the tasks are updated here for the whole batch
+            task_ids = {obj.task_id for obj in itertools.chain(db_predictions, db_annotations)}
+            if task_ids:
+                project._update_tasks_counters_and_is_labeled(list(task_ids))
+                cls._refresh_task_counters(tasks, task_ids)
+                maintain_materialized_columns(project.id, list(task_ids))
+            if hasattr(project, 'summary'):
+                project.summary.update_data_columns(tasks)
+                if db_annotations:
+                    project.summary.update_created_annotations_and_labels(db_annotations)
+
+        cls._start_training(project, db_annotations)
+        return tasks
         # FIXME: add_annotation_history / post_process_annotations should be here
 
+    @staticmethod
+    def _refresh_task_counters(tasks, task_ids):
+        """Load the updated counters into the task objects returned by add_tasks"""
+        fields = ('is_labeled', 'total_annotations', 'cancelled_annotations', 'total_predictions')
+        counters = {row['id']: row for row in Task.objects.filter(id__in=task_ids).values('id', *fields)}
+        for task in tasks:
+            if task.id in counters:
+                for field in fields:
+                    setattr(task, field, counters[task.id][field])
+
+    @staticmethod
+    def _start_training(project, annotations):
+        """Start training every N annotations like the update_ml_backend signal does for saved annotations"""
+        n = project.min_annotations_to_start_training
+        if not n or not any(not annotation.ground_truth for annotation in annotations):
+            return
+        annotation_count = Annotation.objects.filter(project=project).count()
+        # the batch may step over a multiple of N, so check if one was crossed
+        if annotation_count // n > (annotation_count - len(annotations)) // n:
+            for ml_backend in project.ml_backends.all():
+                ml_backend.train()
+
+    def _iterkeys_with_links(self, link_class):
+        """Iterate over storage keys together with the number of tasks already linked to them.
+        Keys are read in pages and checked against existing storage links with one query per page.
+        """
+        for keys in _batched(self.iterkeys(), settings.STORAGE_IMPORT_KEYS_PAGE_SIZE):
+            linked = link_class.n_tasks_linked_bulk(keys, self)
+            for key in keys:
+                yield key, linked.get(key, 0)
+
+    def get_prefetch_workers(self):
+        if getattr(self, 'use_blob_urls', False):
+            # get_data() doesn't download anything, there is nothing to parallelize
+            return 1
+        workers = self.prefetch_workers
+        return settings.STORAGE_IMPORT_PREFETCH_WORKERS if workers is None else workers
+
+    def get_prefetch_max_bytes(self):
+        max_bytes = self.prefetch_max_bytes
+        return settings.STORAGE_IMPORT_PREFETCH_MAX_BYTES if max_bytes is None else max_bytes
+
+    def _load_data(self, key):
+        try:
+            return self.get_data(key)
+        except (UnicodeDecodeError, json.decoder.JSONDecodeError) as exc:
+            logger.debug(exc, exc_info=True)
+            raise ValueError(
+                f'Error loading JSON from file "{key}".\nIf you\'re trying to import non-JSON data '
+                f'(images, audio, text, etc.), edit storage settings and enable '
+                f'"Treat every bucket object as a source file"'
+            )
+
+    def _get_data_with_size(self, key):
+        """Load data of the key in a prefetch thread together with the byte length of the downloaded object"""
+        pop_loaded_blob_size()
+        link_objects = self._load_data(key)
+        # objects that aren't downloaded, e.g. blob urls, hold only a few bytes of task data
+        size = pop_loaded_blob_size() or 0
+        return link_objects, size
+
+    def _prefetch_data(self, keys_with_links):
+        """Download and parse new keys in a thread pool ahead of task creation.
+
+        Yields (key, n_tasks_linked, link_objects) in the same order as keys_with_links, so inner ids stay
+        deterministic. link_objects is None for already linked keys. New downloads are not started while
+        downloaded but not yet consumed data exceeds the in-flight byte budget.
+        """
+        workers = self.get_prefetch_workers()
+        if workers <= 1:
+            for key, n_tasks_linked in keys_with_links:
+                yield key, n_tasks_linked, (None if n_tasks_linked else self._load_data(key))
+            return
+
+        max_bytes = self.get_prefetch_max_bytes()
+        max_pending = workers * 2
+        keys_with_links = iter(keys_with_links)
+        pending = deque()
+        exhausted = False
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{self.__class__.__name__}-prefetch')
+        try:
+            while True:
+                while not exhausted and len(pending) < max_pending:
+                    in_flight_bytes = sum(_prefetched_size(future) for _, _, future in pending)
+                    if pending and max_bytes and in_flight_bytes >= max_bytes:
+                        break
+                    item = next(keys_with_links, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    key, n_tasks_linked = item
+                    future = None if n_tasks_linked else executor.submit(self._get_data_with_size, key)
+                    pending.append((key, n_tasks_linked, future))
+
+                if not pending:
+                    return
+                key, n_tasks_linked, future = pending.popleft()
+                yield key, n_tasks_linked, (future.result()[0] if future is not None else None)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
     def _scan_and_create_links(self, link_class):
         """
         TODO: deprecate this function and transform it to "pipeline" version  _scan_and_create_links_v2,
@@ -417,69 +631,70 @@ class ImportStorage(Storage):
         # set in progress status for storage info
         self.info_set_in_progress()
 
+        progress = StorageProgress(self)
         tasks_existed = tasks_created = 0
         maximum_annotations = self.project.maximum_annotations
         task = self.project.tasks.order_by('-inner_id').first()
         max_inner_id = (task.inner_id + 1) if task else 1
 
         tasks_for_webhook = []
-        for key in self.iterkeys():
+        link_objects_batch = []
+
+        def add_tasks_batch():
+            nonlocal max_inner_id, tasks_created, tasks_for_webhook
+            tasks = self.add_tasks(
+                self.project, maximum_annotations, max_inner_id, self, link_objects_batch, link_class=link_class
+            )
+            link_objects_batch.clear()
+            max_inner_id += len(tasks)
+
+            # update progress counters for storage info
+            tasks_created += len(tasks)
+
+            # add tasks to webhook list
+            tasks_for_webhook += tasks
+
+            # settings.WEBHOOK_BATCH_SIZE
+            # `WEBHOOK_BATCH_SIZE` sets the maximum number of tasks sent in a single webhook call, ensuring manageable payload sizes.
+            # When `tasks_for_webhook` accumulates tasks equal to/exceeding `WEBHOOK_BATCH_SIZE`, they're sent in a webhook via
+            # `emit_webhooks_for_instance`, and `tasks_for_webhook` is cleared for new tasks.
+            # If tasks remain in `tasks_for_webhook` at process end (less than `WEBHOOK_BATCH_SIZE`), they're sent in a final webhook
+            # call to ensure all tasks are processed and no task is left unreported in the webhook.
+            while len(tasks_for_webhook) >= settings.WEBHOOK_BATCH_SIZE:
+                emit_webhooks_for_instance(
+                    self.project.organization,
+                    self.project,
+                    WebhookAction.TASKS_CREATED,
+                    tasks_for_webhook[: settings.WEBHOOK_BATCH_SIZE],
+                )
+                tasks_for_webhook = tasks_for_webhook[settings.WEBHOOK_BATCH_SIZE :]
+
+        # objects are downloaded and parsed concurrently, but come here in the order of keys
+        for key, n_tasks_linked, link_objects in self._prefetch_data(self._iterkeys_with_links(link_class)):
             # w/o Dataflow
             # pubsub.push(topic, key)
             # -> GF.pull(topic, key) + env -> add_task()
             logger.debug(f'Scanning key {key}')
-            self.info_update_progress(last_sync_count=tasks_created, tasks_existed=tasks_existed)
+            progress.update(last_sync_count=tasks_created, tasks_existed=tasks_existed)
 
             # skip if key has already been synced
-            if n_tasks_linked := link_class.n_tasks_linked(key, self):
+            if n_tasks_linked:
                 logger.debug(f'{self.__class__.__name__} already has {n_tasks_linked} tasks linked to {key=}')
                 tasks_existed += n_tasks_linked  # update progress counter
                 continue
 
             logger.debug(f'{self}: found new key {key}')
-            try:
-                link_objects = self.get_data(key)
-            except (UnicodeDecodeError, json.decoder.JSONDecodeError) as exc:
-                logger.debug(exc, exc_info=True)
-                raise ValueError(
-                    f'Error loading JSON from file "{key}".\nIf you\'re trying to import non-JSON data '
-                    f'(images, audio, text, etc.), edit storage settings and enable '
-                    f'"Treat every bucket object as a source file"'
-                )
 
             if not flag_set('fflag_feat_dia_2092_multitasks_per_storage_link'):
                 link_objects = link_objects[:1]
 
-            for link_object in link_objects:
-                # TODO: batch this loop body with add_task -> add_tasks in a single bulk write.
-                # See DIA-2062 for prerequisites
-                task = self.add_task(
-                    self.project,
-                    maximum_annotations,
-                    max_inner_id,
-                    self,
-                    link_object,
-                    link_class=link_class,
-                )
-                max_inner_id += 1
-
-                # update progress counters for storage info
-                tasks_created += 1
-
-                # add task to webhook list
-                tasks_for_webhook.append(task)
-
-                # settings.WEBHOOK_BATCH_SIZE
-                # `WEBHOOK_BATCH_SIZE` sets the maximum number of tasks sent in a single webhook call, ensuring manageable payload sizes.
-                # When `tasks_for_webhook` accumulates tasks equal to/exceeding `WEBHOOK_BATCH_SIZE`, they're sent in a webhook via
-                # `emit_webhooks_for_instance`, and `tasks_for_webhook` is cleared for new tasks.
-                # If tasks remain in `tasks_for_webhook` at process end (less than `WEBHOOK_BATCH_SIZE`), they're sent in a final webhook
-                # call to ensure all tasks are processed and no task is left unreported in the webhook.
-                if len(tasks_for_webhook) >= settings.WEBHOOK_BATCH_SIZE:
-                    emit_webhooks_for_instance(
-                        self.project.organization, self.project, WebhookAction.TASKS_CREATED, tasks_for_webhook
-                    )
-                    tasks_for_webhook = []
+            # tasks, links, predictions and annotations are written in bulk per batch of objects
+            link_objects_batch.extend(link_objects)
+            if len(link_objects_batch) >= settings.STORAGE_IMPORT_BATCH_SIZE:
+                add_tasks_batch()
+
+        if link_objects_batch:
+            add_tasks_batch()
         if tasks_for_webhook:
             emit_webhooks_for_instance(
                 self.project.organization, self.project, WebhookAction.TASKS_CREATED, tasks_for_webhook
@@ -490,7 +705,7 @@ class ImportStorage(Storage):
         )
 
         # sync is finished, set completed status for storage info
-        self.info_set_completed(last_sync_count=tasks_created, tasks_existed=tasks_existed)
+        progress.complete(last_sync_count=tasks_created, tasks_existed=tasks_existed)
 
     def scan_and_create_links(self):
         """This is proto method - you can override it, or just replace ImportStorageLink by your own model"""
@@ -590,6 +805,13 @@ def storage_background_failure(*args, **kwargs):
     storage.info_set_failed()
 
 
+def _prefetched_size(future):
+    """Size of data downloaded by a finished prefetch future, errors are raised when the future is consumed"""
+    if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+        return 0
+    return future.result()[1]
+
+
 # note: this is available in python 3.12 , #TODO to switch to builtin function when we move to it.
 def _batched(iterable, n):
     # batched('ABCDEFG', 3) --> ABC DEF G
@@ -608,15 +830,20 @@ class ExportStorage(Storage, ProjectStorageMixin):
     # TODO from testing, more than 8 seems to cause problems. revisit to add more parallelism.
     max_workers = min(8, (os.cpu_count() or 2) * 4)
 
-    def _get_serialized_data(self, annotation):
+    def is_task_format(self):
+        """Storage object is a task with all its annotations, otherwise it's a single annotation"""
         user = self.project.organization.created_by
         flag = flag_set(
             'fflag_feat_optic_650_target_storage_task_format_long', user=user, override_system_default=False
         )
-        if settings.FUTURE_SAVE_TASK_TO_STORAGE or flag:
-            # export task with annotations
-            # TODO: we have to rewrite save_all_annotations, because this func will be called for each annotation
-            # TODO: instead of each task, however, we have to call it only once per task
+        return settings.FUTURE_SAVE_TASK_TO_STORAGE or flag
+
+    def _get_serialized_data(self, annotation):
+        if self.is_task_format():
+            # export task with annotations, save_annotations() serializes each task only once
+            serialized_task = getattr(annotation, 'serialized_task', None)
+            if serialized_task is not None:
+                return serialized_task
             expand = ['annotations.reviews', 'annotations.completed_by']
             context = {'project': self.project}
             return ExportDataSerializer(annotation.task, context=context, expand=expand).data
@@ -628,32 +855,99 @@ class ExportStorage(Storage, ProjectStorageMixin):
     def save_annotation(self, annotation):
         raise NotImplementedError
 
+    def _serialize_tasks(self, task_ids):
+        """Serialize tasks for task format export with annotations, reviews and users prefetched"""
+        annotations = Annotation.objects.select_related('completed_by')
+        if hasattr(Annotation, 'reviews'):
+            from reviews.models import AnnotationReview
+
+            annotations = annotations.prefetch_related(
+                Prefetch('reviews', queryset=AnnotationReview.objects.select_related('created_by'))
+            )
+        tasks = (
+            Task.objects.filter(id__in=task_ids)
+            .select_related('file_upload')
+            .prefetch_related(Prefetch('annotations', queryset=annotations))
+        )
+        expand = ['annotations.reviews', 'annotations.completed_by']
+        context = {'project': self.project}
+        serialized = ExportDataSerializer(tasks, many=True, context=context, expand=expand).data
+        return {task['id']: task for task in serialized}
+
+    def _save_task_annotations(self, annotations):
+        """Upload one storage object for the task of the annotations and link all of them to it"""
+        self.save_annotation(annotations[0])
+        link_class = self.links.model
+        for annotation in annotations[1:]:
+            link_class.create(annotation, self)
+
+    def _iter_task_batches(self, annotations):
+        """Iterate over annotations grouped by task in batches of about STORAGE_EXPORT_CHUNK_SIZE annotations,
+        annotations of one task are never split between batches
+        """
+        batch, batch_size = [], 0
+        for _task_id, group in itertools.groupby(annotations, key=lambda a: a.task_id):
+            group = list(group)
+            batch.append(group)
+            batch_size += len(group)
+            if batch_size >= settings.STORAGE_EXPORT_CHUNK_SIZE:
+                yield batch
+                batch, batch_size = [], 0
+        if batch:
+            yield batch
+
     def save_annotations(self, annotations: models.QuerySet[Annotation]):
+        """Export the given annotations of the project to the storage
+
+        In task format every task is serialized and uploaded once for all its annotations from the queryset.
+        """
         annotation_exported = 0
+        annotations = annotations.filter(project=self.project)
         total_annotations = annotations.count()
         self.info_set_in_progress()
+        progress = StorageProgress(self, total=total_annotations)
         self.cached_user = self.project.organization.created_by
+        task_format = self.is_task_format()
+
+        if task_format:
+            annotations = annotations.order_by('task_id', 'id')
+        else:
+            annotations = annotations.select_related('task', 'completed_by').order_by('id')
 
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             # Batch annotations so that we update progress before having to submit every future.
             # Updating progress in thread requires coordinating on count and db writes, so just
             # batching to keep it simpler.
-            for annotation_batch in _batched(
-                Annotation.objects.filter(project=self.project).iterator(
-                    chunk_size=settings.STORAGE_EXPORT_CHUNK_SIZE
-                ),
-                settings.STORAGE_EXPORT_CHUNK_SIZE,
+            for task_batch in self._iter_task_batches(
+                annotations.iterator(chunk_size=settings.STORAGE_EXPORT_CHUNK_SIZE)
             ):
-                futures = []
-                for annotation in annotation_batch:
-                    annotation.cached_user = self.cached_user
-                    futures.append(executor.submit(self.save_annotation, annotation))
+                futures = {}
+                if task_format:
+                    serialized_tasks = self._serialize_tasks([group[0].task_id for group in task_batch])
+                    for group in task_batch:
+                        for annotation in group:
+                            annotation.cached_user = self.cached_user
+                        group[0].serialized_task = serialized_tasks.get(group[0].task_id)
+                        futures[executor.submit(self._save_task_annotations, group)] = len(group)
+                else:
+                    for annotation in itertools.chain.from_iterable(task_batch):
+                        annotation.cached_user = self.cached_user
+                        futures[executor.submit(self.save_annotation, annotation)] = 1
 
                 for future in concurrent.futures.as_completed(futures):
-                    annotation_exported += 1
-                    self.info_update_progress(last_sync_count=annotation_exported, total_annotations=total_annotations)
+                    if future.exception() is not None:
+                        logger.error(
+                            f'Export to storage {self} failed: {future.exception()}', exc_info=future.exception()
+                        )
+                    else:
+                        annotation_exported += futures[future]
+                    progress.update(
+                        processed=futures[future],
+                        last_sync_count=annotation_exported,
+                        total_annotations=total_annotations,
+                    )
 
-        self.info_set_completed(last_sync_count=annotation_exported, total_annotations=total_annotations)
+        progress.complete(last_sync_count=annotation_exported, total_annotations=total_annotations)
 
     def save_all_annotations(self):
         self.save_annotations(Annotation.objects.filter(project=self.project))
@@ -720,6 +1014,17 @@ class ImportStorageLink(models.Model):
     def n_tasks_linked(cls, key, storage):
         return cls.objects.filter(key=key, storage=storage.id).count()
 
+    @classmethod
+    def n_tasks_linked_bulk(cls, keys, storage):
+        """Count linked tasks for many keys at once, keys without links are not in the result"""
+        return dict(
+            cls.objects.filter(key__in=keys, storage=storage.id)
+            .order_by()
+            .values('key')
+            .annotate(count=Count('id'))
+            .values_list('key', 'count')
+        )
+
     @classmethod
     def create(cls, task, key, storage, row_index=None, row_group=None):
         link, created = cls.objects.get_or_create(
@@ -753,7 +1058,7 @@ class ExportStorageLink(models.Model):
 
         if settings.FUTURE_SAVE_TASK_TO_STORAGE or flag:
             ext = '.json' if settings.FUTURE_SAVE_TASK_TO_STORAGE_JSON_EXT or flag else ''
-            return str(annotation.task.id) + ext
+            return str(annotation.task_id) + ext
         else:
             return str(annotation.id)
 
@@ -0,0 +1,120 @@
+"""This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class StorageClientPool:
+    """Process-wide LRU of cloud storage clients shared by all storages and threads.
+
+    Clients are keyed by a hash of their credentials, so raw secrets are not kept as keys
+    and rotated credentials get a new client while the old one ages out of the pool.
+    Only one client is created for a key even if several threads ask for it at the same time.
+    """
+
+    def __init__(self, max_size=None, max_age=None):
+        self._max_size = max_size
+        self._max_age = max_age
+        # pool key => (client, monotonic creation time)
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._create_locks = defaultdict(threading.Lock)
+        self._stats = defaultdict(int)
+
+    @property
+    def max_size(self):
+        return settings.STORAGE_CLIENT_POOL_SIZE if self._max_size is None else self._max_size
+
+    @property
+    def max_age(self):
+        return settings.STORAGE_CLIENT_POOL_MAX_AGE if self._max_age is None else self._max_age
+
+    @staticmethod
+    def make_key(kind, *credentials):
+        digest = hashlib.sha256(repr(credentials).encode()).hexdigest()
+        return f'{kind}:{digest}'
+
+    def _get_alive(self, key):
+        item = self._clients.get(key)
+        if item is None:
+            return None
+        client, created_at = item
+        if self.max_age and time.monotonic() - created_at > self.max_age:
+            del self._clients[key]
+            self._stats['expired'] += 1
+            return None
+        self._clients.move_to_end(key)
+        return item
+
+    def get(self, key, factory):
+        """Return the pooled client for the key, factory() is called to create a missing one"""
+        kind = key.split(':', 1)[0]
+        with self._lock:
+            item = self._get_alive(key)
+            if item is not None:
+                self._stats[f'{kind}.reused'] += 1
+                return item[0]
+            create_lock = self._create_locks[key]
+
+        with create_lock:
+            with self._lock:
+                item = self._get_alive(key)
+                if item is not None:
+                    self._stats[f'{kind}.reused'] += 1
+                    return item[0]
+            client = factory()
+            with self._lock:
+                self._clients[key] = (client, time.monotonic())
+                self._clients.move_to_end(key)
+                self._stats[f'{kind}.created'] += 1
+                while len(self._clients) > self.max_size:
+                    self._clients.popitem(last=False)
+                    self._stats['evicted'] += 1
+                self._create_locks.pop(key, None)
+        logger.debug(f'Storage client {kind} created, {len(self._clients)} clients in pool')
+        return client
+
+    def evict(self, key, reason=''):
+        """Drop an unhealthy client, e.g. after an authentication error, the next get() creates a new one"""
+        with self._lock:
+            if self._clients.pop(key, None) is not None:
+                self._stats['unhealthy'] += 1
+                logger.info(f'Storage client {key.split(":", 1)[0]} evicted from pool: {reason}')
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._stats.clear()
+
+    def get_stats(self):
+        """Counters of created, reused and evicted clients since the process start"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._clients)
+        return stats
+
+
+client_pool = StorageClientPool()
+
+
+def get_max_pool_connections():
+    """HTTP connections per client, enough for all threads of an export or import sync to share one client"""
+    return settings.STORAGE_CLIENT_MAX_POOL_CONNECTIONS or max(
+        settings.STORAGE_IMPORT_PREFETCH_WORKERS, settings.EXPORT_WORKERS, 10
+    )
+
+
+def mount_http_adapter(session, pool_maxsize=None):
+    """Size the connection pool of a requests session used by a storage client"""
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize or get_max_pool_connections())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
@@ -2,6 +2,7 @@ import logging
 from typing import Dict, Iterable, List, Union
 
 from io_storages.base_models import ImportStorage
+from io_storages.utils import get_uri_via_regex
 
 from .azure_blob.api import AzureBlobExportStorageListAPI, AzureBlobImportStorageListAPI
 from .gcs.api import GCSExportStorageListAPI, GCSImportStorageListAPI
@@ -56,3 +57,45 @@ def get_storage_by_url(url: Union[str, List, Dict], storage_objects: Iterable[Im
                 # note: only first found storage_object will be used for link resolving
                 # can_resolve_url now checks both the scheme and the bucket to ensure the correct storage is used
                 return storage_object
+
+
+class StorageIndex:
+    """Import storages of a project indexed by url scheme and bucket (or container).
+    get() parses an url once and checks only storages of its bucket, it returns the same storage
+    as get_storage_by_url() which checks every storage with regex parsing for each url.
+    """
+
+    def __init__(self, storage_objects: Iterable[ImportStorage]):
+        self.storage_objects = list(storage_objects)
+        self.schemes = tuple(
+            dict.fromkeys(s.url_scheme for s in self.storage_objects if getattr(s, 'url_scheme', None))
+        )
+        self.buckets = {}
+        self.other = []
+        for storage in self.storage_objects:
+            bucket = getattr(storage, 'bucket', None) or getattr(storage, 'container', None)
+            if bucket and getattr(storage, 'url_scheme', None):
+                self.buckets.setdefault((storage.url_scheme, bucket), []).append(storage)
+            else:
+                self.other.append(storage)
+        self._found = {}
+
+    def get(self, url: Union[str, List, Dict]) -> Union[ImportStorage, None]:
+        if not isinstance(url, str):
+            return get_storage_by_url(url, self.storage_objects)
+        if url not in self._found:
+            self._found[url] = self._find(url)
+        return self._found[url]
+
+    def _find(self, url: str) -> Union[ImportStorage, None]:
+        if self.buckets and self.schemes:
+            uri, scheme = get_uri_via_regex(url, prefixes=self.schemes)
+            if uri and '://' in uri:
+                bucket = uri.split('://', 1)[1].split('/', 1)[0]
+                for storage in self.buckets.get((scheme, bucket), ()):
+                    if storage.can_resolve_url(url):
+                        return storage
+        for storage in self.other:
+            if storage.can_resolve_url(url):
+                return storage
+        return None
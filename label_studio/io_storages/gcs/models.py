@@ -22,7 +22,7 @@ from io_storages.base_models import (
     ImportStorageLink,
     ProjectStorageMixin,
 )
-from io_storages.gcs.utils import GCS
+from io_storages.gcs.utils import GCS, GCS_AUTH_ERRORS
 from io_storages.utils import (
     StorageObject,
     load_tasks_json,
@@ -67,14 +67,21 @@ class GCSStorageMixin(models.Model):
             client = self.get_client()
         return client.get_bucket(bucket_name or self.bucket)
 
+    def evict_client(self, reason=''):
+        GCS.evict_client(self.google_application_credentials, reason=reason)
+
     def validate_connection(self):
-        GCS.validate_connection(
-            self.bucket,
-            self.google_project_id,
-            self.google_application_credentials,
-            # we don't need to validate path for export storage, it will be created automatically
-            None if 'Export' in self.__class__.__name__ else self.prefix,
-        )
+        try:
+            GCS.validate_connection(
+                self.bucket,
+                self.google_project_id,
+                self.google_application_credentials,
+                # we don't need to validate path for export storage, it will be created automatically
+                None if 'Export' in self.__class__.__name__ else self.prefix,
+            )
+        except GCS_AUTH_ERRORS as e:
+            self.evict_client(reason=str(e))
+            raise
 
     def get_bytes_stream(self, uri, range_header=None):
         """Get file bytes from GCS storage as a streaming object with metadata.
@@ -164,6 +171,8 @@ class GCSStorageMixin(models.Model):
             return stream, (blob.content_type or 'application/octet-stream'), metadata
 
         except Exception as e:
+            if isinstance(e, GCS_AUTH_ERRORS):
+                self.evict_client(reason=str(e))
             logger.error(f'Error getting direct stream from GCS for uri {uri}: {e}', exc_info=True)
             return None, None, {}
 
@@ -205,6 +214,16 @@ class GCSImportStorageBase(GCSStorageMixin, ImportStorage):
             presign_ttl=self.presign_ttl,
         )
 
+    def get_stream_url(self, url):
+        """Presigned url for the async storage proxy, it's signed even if presign is disabled for users"""
+        return GCS.generate_http_url(
+            url=url,
+            presign=True,
+            google_application_credentials=self.google_application_credentials,
+            google_project_id=self.google_project_id,
+            presign_ttl=self.presign_ttl,
+        )
+
     def can_resolve_url(self, url: Union[str, None]) -> bool:
         return storage_can_resolve_bucket_url(self, url)
 
@@ -14,16 +14,19 @@ import google.auth
 import google.cloud.storage as gcs
 from core.utils.common import get_ttl_hash
 from django.conf import settings
-from google.auth.exceptions import DefaultCredentialsError
+from google.api_core.exceptions import Unauthorized
+from google.auth.exceptions import DefaultCredentialsError, RefreshError
 from google.oauth2 import service_account
+from io_storages.client_pool import client_pool, mount_http_adapter
 
 logger = logging.getLogger(__name__)
 
 Base64 = bytes
+# errors after which a pooled client is recreated, e.g. revoked service account key
+GCS_AUTH_ERRORS = (RefreshError, Unauthorized)
 
 
 class GCS(object):
-    _client_cache = {}
     _credentials_cache = None
     DEFAULT_GOOGLE_PROJECT_ID = gcs.client._marker
 
@@ -59,26 +62,39 @@ class GCS(object):
         :return:
         """
         google_project_id = google_project_id or GCS.DEFAULT_GOOGLE_PROJECT_ID
-        cache_key = google_application_credentials
-
-        if cache_key not in GCS._client_cache:
 
+        def create_client():
+            credentials = google_application_credentials
             # use credentials from LS Cloud Storage settings
-            if google_application_credentials:
-                if isinstance(google_application_credentials, str):
+            if credentials:
+                if isinstance(credentials, str):
                     try:
-                        google_application_credentials = json.loads(google_application_credentials)
+                        credentials = json.loads(credentials)
                     except JSONDecodeError as e:
                         # change JSON error to human-readable format
                         raise ValueError(f'Google Application Credentials must be valid JSON string. {e}')
-                credentials = service_account.Credentials.from_service_account_info(google_application_credentials)
-                GCS._client_cache[cache_key] = gcs.Client(project=google_project_id, credentials=credentials)
+                credentials = service_account.Credentials.from_service_account_info(credentials)
+                client = gcs.Client(project=google_project_id, credentials=credentials)
 
             # use Google Application Default Credentials (ADC)
             else:
-                GCS._client_cache[cache_key] = gcs.Client(project=google_project_id)
+                client = gcs.Client(project=google_project_id)
+
+            # authorized session is shared by threads of export and import syncs
+            mount_http_adapter(client._http)
+            return client
+
+        return client_pool.get(cls.get_client_pool_key(google_application_credentials), create_client)
 
-        return GCS._client_cache[cache_key]
+    @classmethod
+    def get_client_pool_key(cls, google_application_credentials: Union[str, dict] = None) -> str:
+        if isinstance(google_application_credentials, dict):
+            google_application_credentials = json.dumps(google_application_credentials, sort_keys=True)
+        return client_pool.make_key('gcs', google_application_credentials)
+
+    @classmethod
+    def evict_client(cls, google_application_credentials: Union[str, dict] = None, reason: str = ''):
+        client_pool.evict(cls.get_client_pool_key(google_application_credentials), reason=reason)
 
     @classmethod
     def validate_connection(
@@ -0,0 +1,54 @@
+import concurrent.futures
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from tasks.models import Annotation
+
+logger = logging.getLogger(__name__)
+
+
+def save_annotations_per_annotation(storage):
+    """Previous export sync: every annotation of the project is serialized and uploaded separately,
+    in task format the whole task is serialized and uploaded once per annotation
+    """
+    storage.cached_user = storage.project.organization.created_by
+    with ThreadPoolExecutor(max_workers=storage.max_workers) as executor:
+        futures = []
+        for annotation in Annotation.objects.filter(project=storage.project).iterator():
+            annotation.cached_user = storage.cached_user
+            futures.append(executor.submit(storage.save_annotation, annotation))
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare objects/sec of the export storage sync with the previous per-annotation export. '
+        'Objects are really written to the storage, use a test bucket or a local files storage.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('storage_model', type=str, help='export storage model, e.g. S3ExportStorage')
+        parser.add_argument('storage_id', type=int, help='export storage id')
+        parser.add_argument('-r', '--repeat', type=int, help='number of runs of each path', default=1)
+
+    def handle(self, *args, **options):
+        storage_class = apps.get_model('io_storages', options['storage_model'])
+        storage = storage_class.objects.get(id=options['storage_id'])
+        total = Annotation.objects.filter(project=storage.project).count()
+        self.stdout.write(f'Storage {storage}, {total} annotations, task format: {storage.is_task_format()}')
+
+        for name, run in (
+            ('per annotation', lambda: save_annotations_per_annotation(storage)),
+            ('task batches', lambda: (storage.info_set_queued(), storage.save_all_annotations())),
+        ):
+            for i in range(options['repeat']):
+                start = time.perf_counter()
+                run()
+                duration = time.perf_counter() - start
+                self.stdout.write(
+                    f'{name} #{i + 1}: {duration:.2f} sec, {total / duration if duration else 0:.1f} annotations/sec'
+                )
@@ -0,0 +1,180 @@
+"""This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from core.redis import redis_mget, redis_set_many
+from django.conf import settings
+from io_storages.utils import get_uri_via_regex
+
+logger = logging.getLogger(__name__)
+
+# cache key => (presigned url, monotonic expiration time)
+_urls = OrderedDict()
+_urls_lock = threading.Lock()
+# storage fields that don't affect signed urls, changes of other fields (credentials, bucket, presign_ttl, etc)
+# make new cache keys, so urls signed with the old settings aren't served by any process
+_unsigned_fields = {
+    'id',
+    'project_id',
+    'title',
+    'description',
+    'created_at',
+    'synchronizable',
+    'last_sync',
+    'last_sync_count',
+    'last_sync_job',
+    'status',
+    'traceback',
+    'meta',
+}
+
+
+def get_cache_ttl(storage):
+    """Seconds while a presigned url of the storage is served from the cache, 0 if it can't be cached.
+    Storages without presign return base64 content from generate_http_url, it's never cached.
+    """
+    if not settings.PRESIGNED_URL_CACHE_SIZE or not getattr(storage, 'presign', False):
+        return 0
+    presign_ttl = getattr(storage, 'presign_ttl', None)
+    if not presign_ttl or storage.id is None:
+        return 0
+    return int(presign_ttl * 60 * settings.PRESIGNED_URL_CACHE_TTL_RATIO)
+
+
+def get_storage_prefix(storage):
+    return f'presigned_url:{storage._meta.label_lower}:{storage.id}:'
+
+
+def get_config_hash(storage):
+    """Hash of the storage fields used for signing"""
+    config = [
+        (field.attname, getattr(storage, field.attname))
+        for field in storage._meta.concrete_fields
+        if field.attname not in _unsigned_fields
+    ]
+    return hashlib.sha256(repr(config).encode()).hexdigest()[:16]
+
+
+def get_cache_key(storage, uri, config_hash=None):
+    return f'{get_storage_prefix(storage)}{config_hash or get_config_hash(storage)}:{uri}'
+
+
+def _get_local(keys):
+    now = time.monotonic()
+    found = {}
+    with _urls_lock:
+        for key in keys:
+            item = _urls.get(key)
+            if item is None:
+                continue
+            if item[1] <= now:
+                del _urls[key]
+                continue
+            _urls.move_to_end(key)
+            found[key] = item[0]
+    return found
+
+
+def _set_local(urls, ttl):
+    expires_at = time.monotonic() + ttl
+    with _urls_lock:
+        for key, url in urls.items():
+            _urls[key] = (url, expires_at)
+            _urls.move_to_end(key)
+        while len(_urls) > settings.PRESIGNED_URL_CACHE_SIZE:
+            _urls.popitem(last=False)
+
+
+def get_presigned_urls(storage, uris):
+    """Resolve storage uris to http urls with one pass over the in-process cache and one redis round trip,
+    only missing urls are signed with storage.generate_http_url()
+
+    :param storage: import storage
+    :param uris: iterable of storage uris, e.g. s3://bucket/key
+    :return: dict uri => http url
+    """
+    uris = list(dict.fromkeys(uris))
+    ttl = get_cache_ttl(storage)
+    if not ttl:
+        return {uri: storage.generate_http_url(uri) for uri in uris}
+
+    config_hash = get_config_hash(storage)
+    keys = {uri: get_cache_key(storage, uri, config_hash) for uri in uris}
+    cached = _get_local(keys.values())
+    result = {uri: cached[key] for uri, key in keys.items() if key in cached}
+
+    missing = [uri for uri in uris if uri not in result]
+    if missing and settings.PRESIGNED_URL_CACHE_REDIS:
+        shared = {}
+        for uri, url in zip(missing, redis_mget([keys[uri] for uri in missing])):
+            if url is not None:
+                shared[keys[uri]] = result[uri] = url.decode() if isinstance(url, bytes) else url
+        # redis keeps the remaining ttl, the local copy uses the whole ttl of the previous signing
+        # in the worst case, so only a half of it is left for the local cache
+        _set_local(shared, ttl // 2)
+        missing = [uri for uri in missing if uri not in result]
+
+    signed = {}
+    for uri in missing:
+        url = storage.generate_http_url(uri)
+        result[uri] = url
+        # on signing errors the original uri is returned, it's not cached
+        if url and url != uri:
+            signed[keys[uri]] = url
+    if signed:
+        _set_local(signed, ttl)
+        if settings.PRESIGNED_URL_CACHE_REDIS:
+            redis_set_many(signed, ttl)
+    return result
+
+
+def get_presigned_url(storage, uri):
+    """Cached storage.generate_http_url(uri)"""
+    return get_presigned_urls(storage, [uri])[uri]
+
+
+def prefetch_presigned_urls(tasks, project):
+    """Sign storage urls of a page of tasks in one pass per storage, so the following presign and proxy
+    requests of the page media take urls from the cache
+
+    :param tasks: list of tasks
+    :param project: project of the tasks
+    :return: number of urls resolved
+    """
+    if not any(get_cache_ttl(storage) for storage in project.get_all_import_storage_objects):
+        return 0
+
+    uris = defaultdict(list)
+    for task in tasks:
+        for value in task.data.values():
+            if not isinstance(value, str):
+                continue
+            storage = project.import_storage_index.get(value)
+            if storage is not None and get_cache_ttl(storage):
+                uri, _ = get_uri_via_regex(value, prefixes=(storage.url_scheme,))
+                uris[storage].append(uri)
+
+    count = 0
+    for storage, storage_uris in uris.items():
+        try:
+            count += len(get_presigned_urls(storage, storage_uris))
+        except Exception as exc:
+            logger.warning(f"Can't prefetch presigned urls for {storage}: {exc}", exc_info=True)
+    return count
+
+
+def clear_presigned_urls(storage=None):
+    """Drop in-process cached urls of the storage or all urls.
+    Changed storages get new cache keys, so it only frees memory, e.g. after the storage is deleted
+    """
+    with _urls_lock:
+        if storage is None:
+            _urls.clear()
+            return
+        prefix = get_storage_prefix(storage)
+        for key in [k for k in _urls if k.startswith(prefix)]:
+            del _urls[key]
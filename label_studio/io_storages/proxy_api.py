@@ -1,16 +1,34 @@
+import asyncio
 import base64
 import logging
+import os
 import time
-from typing import Union
-from urllib.parse import unquote
-
+import weakref
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional, Union
+from urllib.parse import unquote, urlparse
+
+import httpx
+from asgiref.sync import sync_to_async
 from core.feature_flags import flag_set
 from django.conf import settings
-from django.http import HttpRequest, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.views import View
+from io_storages import proxy_cache
 from projects.models import Project
-from rest_framework import status
+from rest_framework import exceptions, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from tasks.models import Task
 
@@ -19,6 +37,9 @@ from label_studio.io_storages.utils import parse_range
 
 logger = logging.getLogger(__name__)
 
+# async http clients of the async proxy, one per event loop to share connections between streams
+_async_http_clients = weakref.WeakKeyDictionary()
+
 
 class ResolveStorageUriAPIMixin:
     def resolve(self, request: HttpRequest, fileuri: str, instance: Union[Task, Project]) -> Response:
@@ -231,6 +252,11 @@ class ResolveStorageUriAPIMixin:
         but doesn't support backward seeking.
         """
         try:
+            if proxy_cache.is_enabled():
+                response = self.proxy_data_from_cache(request, uri, project, storage)
+                if response is not None:
+                    return response
+
             # Process and limit the range header for downloaded files
             range_header = self.override_range_header(request)
 
@@ -270,6 +296,56 @@ class ResolveStorageUriAPIMixin:
                 status=status.HTTP_424_FAILED_DEPENDENCY,
             )
 
+    def proxy_data_from_cache(self, request, uri, project, storage):
+        """
+        Serve the data from the local disk cache, the object is downloaded into the cache in the background
+        on the first request.
+
+        Range requests are served from the cached file, full files can be sent by the server with sendfile.
+        Returns None if the object isn't cached yet or can't be cached, then it's streamed from the storage.
+        """
+        info = proxy_cache.get_object_info(storage, uri)
+        if info is None:
+            return None
+        path = proxy_cache.get_cached_file(storage, uri, info)
+        if path is None:
+            return None
+
+        size = info['size']
+        start, end = 0, size - 1
+        range_header = self.override_range_header(request)
+        if range_header:
+            start, end = parse_range(range_header)
+            end = size - 1 if end == '' else min(end, size - 1)
+            if start >= size or end < start:
+                return None
+
+        file = open(path, 'rb')
+        file.seek(start)
+        length = end - start + 1
+        # the rest of the file is sent as is, so the server can use sendfile
+        body = file if end == size - 1 else proxy_cache.FileRange(file, length)
+        response = FileResponse(
+            body,
+            content_type=info['content_type'],
+            status=status.HTTP_206_PARTIAL_CONTENT if range_header else status.HTTP_200_OK,
+            filename=os.path.basename(urlparse(uri).path),
+        )
+        metadata = {
+            'ContentLength': length,
+            'ContentRange': f'bytes {start}-{end}/{size}' if range_header else None,
+            'LastModified': info['last_modified'],
+            'ETag': info['etag'],
+        }
+        response = self.prepare_headers(response, metadata, request, project)
+
+        if settings.RESOLVER_PROXY_ENABLE_ETAG_CACHE and 'Range' not in request.headers:
+            if request.headers.get('If-None-Match') == response.headers.get('ETag'):
+                response.close()
+                return HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+
+        return response
+
 
 class TaskResolveStorageUri(ResolveStorageUriAPIMixin, APIView):
     """A file proxy to presign storage urls at the task level.
@@ -325,3 +401,189 @@ class ProjectResolveStorageUri(ResolveStorageUriAPIMixin, APIView):
             return Response(status=status.HTTP_404_NOT_FOUND)
 
         return self.resolve(request, fileuri, project)
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=settings.RESOLVER_PROXY_ASYNC_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=settings.RESOLVER_PROXY_ASYNC_MAX_CONNECTIONS),
+        )
+        _async_http_clients[loop] = client
+    return client
+
+
+@dataclass
+class SignedStorageStream:
+    """Storage object resolved by the async proxy, it's streamed from the signed url in the event loop"""
+
+    request: Request
+    project: Project
+    url: str
+    range_header: Optional[str] = None
+
+
+class AsyncResolveStorageUriMixin(ResolveStorageUriAPIMixin):
+    """
+    Async variant of the storage proxy for ASGI deployments, enabled by RESOLVER_PROXY_ASYNC.
+
+    Authentication, permission checks and url signing run in a thread as in the sync views.
+    Then the object is streamed from its signed url by an async HTTP client in the event loop,
+    so slow media streams don't hold worker threads. The next chunk is read from the storage
+    only when the previous one is sent to the client.
+    """
+
+    http_method_names = ['get']
+    model = None
+    lookup_url_kwarg = None
+
+    async def get(self, request, *args, **kwargs):
+        result = await sync_to_async(self.resolve_sync)(request, kwargs.get(self.lookup_url_kwarg))
+        if isinstance(result, SignedStorageStream):
+            return await self.proxy_data_from_signed_url(result)
+        if getattr(result, 'streaming', False) and not result.is_async:
+            # ASGI handler would read a sync iterator into memory with one sync_to_async(list) call
+            if isinstance(result, FileResponse):
+                result.block_size = settings.RESOLVER_PROXY_BUFFER_SIZE
+            result.streaming_content = self.async_chunks(iter(result.streaming_content))
+        return result
+
+    @staticmethod
+    async def async_chunks(iterator):
+        """Async generator over the chunks of the sync proxy, every chunk is read in a thread"""
+        sentinel = object()
+        while True:
+            chunk = await sync_to_async(next, thread_sensitive=False)(iterator, sentinel)
+            if chunk is sentinel:
+                break
+            yield chunk
+
+    def resolve_sync(self, request, instance_id):
+        """Authenticate the request like DRF views do and resolve the file uri"""
+        request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            user = request.user
+        except exceptions.AuthenticationFailed:
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+        if not user or not user.is_authenticated:
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+        fileuri = request.GET.get('fileuri')
+        if fileuri is None or instance_id is None:
+            return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+        try:
+            instance = self.model.objects.get(pk=instance_id)
+        except self.model.DoesNotExist:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+
+        response = self.resolve(request, fileuri, instance)
+        # DRF responses can't be rendered outside of APIView
+        if isinstance(response, Response):
+            if response.data:
+                return JsonResponse(response.data, status=response.status_code)
+            return HttpResponse(status=response.status_code)
+        return response
+
+    def proxy_data_from_storage(self, request, uri, project, storage):
+        # the disk cache and storages without signed urls are served by the sync proxy
+        if proxy_cache.is_enabled() or not hasattr(storage, 'get_stream_url'):
+            return super().proxy_data_from_storage(request, uri, project, storage)
+        try:
+            url = storage.get_stream_url(uri)
+        except Exception as e:
+            logger.warning(f'Failed to sign {uri} for async proxy: {e}')
+            url = None
+        if not url or not url.startswith(('http://', 'https://')):
+            return super().proxy_data_from_storage(request, uri, project, storage)
+        return SignedStorageStream(
+            request=request, project=project, url=url, range_header=self.override_range_header(request)
+        )
+
+    async def async_time_limited_chunker(self, upstream):
+        """Async generator of the storage response chunks, it stops after RESOLVER_PROXY_ASYNC_TIMEOUT seconds"""
+        timeout = settings.RESOLVER_PROXY_ASYNC_TIMEOUT
+        start_time = time.monotonic()
+        deadline = start_time + timeout
+        total_bytes = 0
+
+        try:
+            # raw bytes match Content-Length and Content-Encoding of the storage response
+            async for chunk in upstream.aiter_raw(chunk_size=settings.RESOLVER_PROXY_BUFFER_SIZE):
+                if time.monotonic() >= deadline:
+                    logger.warning(f'Time limit ({timeout}s) reached after {total_bytes} bytes')
+                    break
+                total_bytes += len(chunk)
+                yield chunk
+        except httpx.HTTPError as e:
+            logger.error(f'Error during async streaming: {e}', exc_info=True)
+        finally:
+            await upstream.aclose()
+            logger.debug(
+                f'Async stream finished after {time.monotonic() - start_time:.2f}s, yielded {total_bytes} bytes'
+            )
+
+    async def proxy_data_from_signed_url(self, source: SignedStorageStream):
+        client = get_async_http_client()
+        # the response body is forwarded as is, so only encodings accepted by the client are allowed
+        headers = {'Accept-Encoding': source.request.headers.get('Accept-Encoding') or 'identity'}
+        if source.range_header:
+            headers['Range'] = source.range_header
+        try:
+            upstream = await client.send(client.build_request('GET', source.url, headers=headers), stream=True)
+        except httpx.HTTPError as e:
+            logger.error(f'Error in async proxy from storage: {e}', exc_info=True)
+            return JsonResponse(
+                {'error': 'Storage stream failed while proxying data', 'detail': str(e)},
+                status=status.HTTP_424_FAILED_DEPENDENCY,
+            )
+
+        if upstream.status_code >= 400:
+            await upstream.aclose()
+            logger.error(f'Storage responded with {upstream.status_code} to async proxy')
+            return JsonResponse(
+                {
+                    'error': 'Storage stream failed while proxying data',
+                    'detail': f'Storage responded with {upstream.status_code}',
+                },
+                status=status.HTTP_424_FAILED_DEPENDENCY,
+            )
+
+        last_modified = upstream.headers.get('Last-Modified')
+        metadata = {
+            'ContentLength': upstream.headers.get('Content-Length'),
+            'ContentRange': upstream.headers.get('Content-Range'),
+            'LastModified': parsedate_to_datetime(last_modified) if last_modified else None,
+            'ETag': upstream.headers.get('ETag'),
+        }
+        response = StreamingHttpResponse(
+            self.async_time_limited_chunker(upstream),
+            content_type=upstream.headers.get('Content-Type') or 'application/octet-stream',
+            status=upstream.status_code,
+        )
+        if upstream.headers.get('Content-Encoding'):
+            response.headers['Content-Encoding'] = upstream.headers['Content-Encoding']
+        request = source.request
+        response = await sync_to_async(self.prepare_headers)(response, metadata, request, source.project)
+
+        if settings.RESOLVER_PROXY_ENABLE_ETAG_CACHE and 'Range' not in request.headers:
+            if request.headers.get('If-None-Match') == response.headers.get('ETag'):
+                await upstream.aclose()
+                return HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+
+        return response
+
+
+class AsyncTaskResolveStorageUri(AsyncResolveStorageUriMixin, View):
+    """Async variant of TaskResolveStorageUri"""
+
+    model = Task
+    lookup_url_kwarg = 'task_id'
+
+
+class AsyncProjectResolveStorageUri(AsyncResolveStorageUriMixin, View):
+    """Async variant of ProjectResolveStorageUri"""
+
+    model = Project
+    lookup_url_kwarg = 'project_id'
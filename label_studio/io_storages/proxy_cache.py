@@ -0,0 +1,264 @@
+"""This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# object infos probed from storages: info key => (info, monotonic expiration time)
+_infos = OrderedDict()
+_infos_lock = threading.Lock()
+_infos_max_size = 10000
+# one download per cached file within the process, other processes are synchronized by the .part file
+_fills = set()
+_fills_lock = threading.Lock()
+_fill_executor = None
+# running size of the cache directories, so the directory is walked only when the cache is full
+_sizes = {}
+_sizes_lock = threading.Lock()
+
+
+class FileRange:
+    """Read-only file object limited to length bytes from the current position of the file"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def is_enabled():
+    return bool(settings.RESOLVER_PROXY_DISK_CACHE_MAX_SIZE)
+
+
+def parse_content_range_size(content_range):
+    """Total object size from the Content-Range header value 'bytes 0-0/12345'"""
+    try:
+        return int(str(content_range).rsplit('/', 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def get_object_info(storage, uri):
+    """ETag, size and content type of the storage object.
+    They are probed with a one byte range request and kept for RESOLVER_PROXY_DISK_CACHE_INFO_TTL seconds,
+    None is returned if the object can't be cached.
+    """
+    info_key = f'{storage._meta.label_lower}:{storage.id}:{uri}'
+    now = time.monotonic()
+    with _infos_lock:
+        item = _infos.get(info_key)
+        if item is not None and item[1] > now:
+            _infos.move_to_end(info_key)
+            return item[0]
+
+    stream, content_type, metadata = storage.get_bytes_stream(uri, range_header='bytes=0-0')
+    if stream is None:
+        return None
+    try:
+        stream.close()
+    except Exception as e:
+        logger.debug(f"Couldn't close stream: {e}")
+
+    etag = (metadata.get('ETag') or '').strip('"')
+    size = parse_content_range_size(metadata.get('ContentRange'))
+    if not etag or not size:
+        return None
+    info = {
+        'etag': etag,
+        'size': size,
+        'content_type': content_type or 'application/octet-stream',
+        'last_modified': metadata.get('LastModified'),
+    }
+    with _infos_lock:
+        _infos[info_key] = (info, now + settings.RESOLVER_PROXY_DISK_CACHE_INFO_TTL)
+        _infos.move_to_end(info_key)
+        while len(_infos) > _infos_max_size:
+            _infos.popitem(last=False)
+    return info
+
+
+def get_cache_path(storage, uri, etag):
+    digest = hashlib.sha256(f'{storage._meta.label_lower}:{storage.id}:{uri}:{etag}'.encode()).hexdigest()
+    return os.path.join(settings.RESOLVER_PROXY_DISK_CACHE_DIR, digest[:2], digest)
+
+
+def _touch(path):
+    """Mark the cached file as recently used, modification times order the LRU eviction"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def get_cached_file(storage, uri, info):
+    """Path of the cached object or None if it isn't cached yet.
+    Missed objects are downloaded into the cache in the background,
+    meanwhile the requests are streamed from the storage.
+    """
+    path = get_cache_path(storage, uri, info['etag'])
+    if _touch(path):
+        return path
+    if info['size'] > settings.RESOLVER_PROXY_DISK_CACHE_MAX_OBJECT_SIZE:
+        return None
+
+    with _fills_lock:
+        if path in _fills:
+            return None
+        _fills.add(path)
+    try:
+        _get_fill_executor().submit(_fill_in_background, storage, uri, info, path)
+    except RuntimeError:
+        # the executor is shut down on interpreter exit
+        with _fills_lock:
+            _fills.discard(path)
+    return None
+
+
+def _get_fill_executor():
+    global _fill_executor
+    with _fills_lock:
+        if _fill_executor is None:
+            _fill_executor = ThreadPoolExecutor(
+                max_workers=settings.RESOLVER_PROXY_DISK_CACHE_FILL_WORKERS, thread_name_prefix='proxy-cache-fill'
+            )
+        return _fill_executor
+
+
+def _fill_in_background(storage, uri, info, path):
+    try:
+        _fill(storage, uri, info, path)
+    finally:
+        with _fills_lock:
+            _fills.discard(path)
+
+
+def _fill(storage, uri, info, path):
+    part_path = path + '.part'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(part_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    except FileExistsError:
+        # another process downloads the object, its .part file is modified by every written chunk
+        # and it's removed if the process has died
+        try:
+            if time.time() - os.path.getmtime(part_path) > settings.RESOLVER_PROXY_TIMEOUT:
+                os.remove(part_path)
+                return _fill(storage, uri, info, path)
+        except FileNotFoundError:
+            pass
+        return None
+
+    stream = None
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            stream, _, metadata = storage.get_bytes_stream(uri)
+            if stream is None or (metadata.get('ETag') or '').strip('"') != info['etag']:
+                raise ValueError('object is changed or unavailable')
+            for chunk in stream.iter_chunks(chunk_size=settings.RESOLVER_PROXY_BUFFER_SIZE):
+                f.write(chunk)
+            if f.tell() != info['size']:
+                raise ValueError(f'{f.tell()} bytes downloaded instead of {info["size"]}')
+        os.replace(part_path, path)
+    except Exception as e:
+        logger.warning(f'Failed to cache {uri} of storage {storage}: {e}')
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
+        return None
+    finally:
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception as e:
+                logger.debug(f"Couldn't close stream: {e}")
+
+    logger.debug(f'Cached {uri} of storage {storage}: {info["size"]} bytes')
+    _add_size(info['size'])
+    return path
+
+
+def _add_size(size):
+    """Count the new file in the running cache size and evict files if the cache is full"""
+    cache_dir = settings.RESOLVER_PROXY_DISK_CACHE_DIR
+    max_size = settings.RESOLVER_PROXY_DISK_CACHE_MAX_SIZE
+    with _sizes_lock:
+        if cache_dir not in _sizes:
+            # the new file is already counted by the walk
+            _sizes[cache_dir] = _get_dir_size(cache_dir)
+        else:
+            _sizes[cache_dir] += size
+        is_full = _sizes[cache_dir] > max_size
+    if is_full:
+        # free some space at once, so the next fills don't walk the directory again
+        evict(max_size=int(max_size * 0.9))
+
+
+def _list_files(cache_dir):
+    """(modification time, size, path) of the cached files"""
+    files = []
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            if name.endswith('.part'):
+                continue
+            file_path = os.path.join(root, name)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file_path))
+    return files
+
+
+def _get_dir_size(cache_dir):
+    return sum(size for _, size, _ in _list_files(cache_dir))
+
+
+def evict(max_size=None):
+    """Remove the least recently used files until the cache fits into max_size bytes"""
+    cache_dir = settings.RESOLVER_PROXY_DISK_CACHE_DIR
+    max_size = settings.RESOLVER_PROXY_DISK_CACHE_MAX_SIZE if max_size is None else max_size
+    files = _list_files(cache_dir)
+
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, file_path in sorted(files):
+        if total <= max_size:
+            break
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    # the walk also counts files cached by other processes
+    with _sizes_lock:
+        _sizes[cache_dir] = total
+    if removed:
+        logger.debug(f'{removed} files evicted from proxy cache, {total} bytes left')
+    return removed
+
+
+def clear_object_infos():
+    with _infos_lock:
+        _infos.clear()
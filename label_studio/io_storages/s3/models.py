@@ -22,6 +22,7 @@ from io_storages.base_models import (
     ImportStorageLink,
     ProjectStorageMixin,
 )
+from io_storages.client_pool import client_pool, get_max_pool_connections
 from io_storages.s3.utils import (
     catch_and_reraise_from_none,
     get_client_and_resource,
@@ -36,8 +37,6 @@ logger = logging.getLogger(__name__)
 logging.getLogger('botocore').setLevel(logging.CRITICAL)
 boto3.set_stream_logger(level=logging.INFO)
 
-clients_cache = {}
-
 
 class S3StorageMixin(models.Model):
     bucket = models.TextField(_('bucket'), null=True, blank=True, help_text='S3 bucket name')
@@ -67,22 +66,33 @@ class S3StorageMixin(models.Model):
     region_name = models.TextField(_('region_name'), null=True, blank=True, help_text='AWS Region')
     s3_endpoint = models.TextField(_('s3_endpoint'), null=True, blank=True, help_text='S3 Endpoint')
 
-    @catch_and_reraise_from_none
-    def get_client_and_resource(self):
-        # s3 client initialization ~ 100 ms, for 30 tasks it's a 3 seconds, so we need to cache it
-        cache_key = f'{self.aws_access_key_id}:{self.aws_secret_access_key}:{self.aws_session_token}:{self.region_name}:{self.s3_endpoint}'
-        if cache_key in clients_cache:
-            return clients_cache[cache_key]
-
-        result = get_client_and_resource(
+    def get_client_pool_key(self):
+        return client_pool.make_key(
+            's3',
             self.aws_access_key_id,
             self.aws_secret_access_key,
             self.aws_session_token,
             self.region_name,
             self.s3_endpoint,
         )
-        clients_cache[cache_key] = result
-        return result
+
+    def evict_client(self, reason=''):
+        client_pool.evict(self.get_client_pool_key(), reason=reason)
+
+    @catch_and_reraise_from_none
+    def get_client_and_resource(self):
+        # s3 client initialization ~ 100 ms, for 30 tasks it's a 3 seconds, so we need to cache it
+        return client_pool.get(
+            self.get_client_pool_key(),
+            lambda: get_client_and_resource(
+                self.aws_access_key_id,
+                self.aws_secret_access_key,
+                self.aws_session_token,
+                self.region_name,
+                self.s3_endpoint,
+                max_pool_connections=get_max_pool_connections(),
+            ),
+        )
 
     def get_client(self):
         client, _ = self.get_client_and_resource()
@@ -234,6 +244,11 @@ class S3ImportStorageBase(S3StorageMixin, ImportStorage):
     def generate_http_url(self, url):
         return resolve_s3_url(url, self.get_client(), self.presign, expires_in=self.presign_ttl * 60)
 
+    @catch_and_reraise_from_none
+    def get_stream_url(self, url):
+        """Presigned url for the async storage proxy, it's signed even if presign is disabled for users"""
+        return resolve_s3_url(url, self.get_client(), presign=True, expires_in=self.presign_ttl * 60)
+
     @catch_and_reraise_from_none
     def can_resolve_url(self, url: Union[str, None]) -> bool:
         return storage_can_resolve_bucket_url(self, url)
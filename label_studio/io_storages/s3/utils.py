@@ -15,8 +15,23 @@ from tldextract import TLDExtract
 logger = logging.getLogger(__name__)
 
 
+# errors after which a pooled client is recreated, e.g. expired session token or rotated keys
+S3_AUTH_ERROR_CODES = {
+    'ExpiredToken',
+    'ExpiredTokenException',
+    'InvalidAccessKeyId',
+    'InvalidToken',
+    'SignatureDoesNotMatch',
+}
+
+
 def get_client_and_resource(
-    aws_access_key_id=None, aws_secret_access_key=None, aws_session_token=None, region_name=None, s3_endpoint=None
+    aws_access_key_id=None,
+    aws_secret_access_key=None,
+    aws_session_token=None,
+    region_name=None,
+    s3_endpoint=None,
+    max_pool_connections=None,
 ):
     aws_access_key_id = aws_access_key_id or get_env('AWS_ACCESS_KEY_ID')
     aws_secret_access_key = aws_secret_access_key or get_env('AWS_SECRET_ACCESS_KEY')
@@ -36,8 +51,11 @@ def get_client_and_resource(
     s3_endpoint = s3_endpoint or get_env('S3_ENDPOINT')
     if s3_endpoint:
         settings['endpoint_url'] = s3_endpoint
-    client = session.client('s3', config=boto3.session.Config(signature_version='s3v4'), **settings)
-    resource = session.resource('s3', config=boto3.session.Config(signature_version='s3v4'), **settings)
+    config = {'signature_version': 's3v4'}
+    if max_pool_connections:
+        config['max_pool_connections'] = max_pool_connections
+    client = session.client('s3', config=boto3.session.Config(**config), **settings)
+    resource = session.resource('s3', config=boto3.session.Config(**config), **settings)
     return client, resource
 
 
@@ -157,6 +175,8 @@ def catch_and_reraise_from_none(func):
         try:
             return func(self, *args, **kwargs)
         except Exception as e:
+            if isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') in S3_AUTH_ERROR_CODES:
+                self.evict_client(reason=e.response['Error']['Code'])
             if self.s3_endpoint and (
                 domain := extractor.extract_urllib(urlparse(self.s3_endpoint)).registered_domain.lower()
             ) not in [trusted_domain.lower() for trusted_domain in settings.S3_TRUSTED_STORAGE_DOMAINS]:
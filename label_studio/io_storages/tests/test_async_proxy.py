@@ -0,0 +1,140 @@
+import base64
+import gzip
+
+import httpx
+import mock
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory
+from io_storages import proxy_api
+from io_storages.proxy_api import AsyncProjectResolveStorageUri
+from io_storages.s3.models import S3ImportStorage
+from io_storages.tests.factories import S3ImportStorageFactory
+
+CONTENT = bytes(range(256)) * 40
+
+
+class RawStream(httpx.AsyncByteStream):
+    """Response body that isn't read in advance, so it can be streamed raw"""
+
+    def __init__(self, content):
+        self.content = content
+
+    async def __aiter__(self):
+        yield self.content
+
+
+def raw_response(status_code, headers, content):
+    headers['Content-Length'] = str(len(content))
+    return httpx.Response(status_code, headers=headers, stream=RawStream(content))
+
+
+def storage_handler(request):
+    """Signed url endpoint of the storage"""
+    assert request.url.params['signature'] == 'test'
+    headers = {'Content-Type': 'video/mp4', 'ETag': '"etag"', 'Last-Modified': 'Wed, 21 Oct 2026 07:28:00 GMT'}
+    if request.url.path.endswith('.json'):
+        assert request.headers['Accept-Encoding'] == 'gzip'
+        content = gzip.compress(CONTENT)
+        headers.update({'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        return raw_response(200, headers, content)
+    if 'Range' in request.headers:
+        start, end = request.headers['Range'].split('=')[1].split('-')
+        start, end = int(start), int(end or len(CONTENT) - 1)
+        headers['Content-Range'] = f'bytes {start}-{end}/{len(CONTENT)}'
+        return raw_response(206, headers, CONTENT[start : end + 1])
+    return raw_response(200, headers, CONTENT)
+
+
+def get(project, user, fileuri, **headers):
+    async def run():
+        request = AsyncRequestFactory().get(
+            f'/api/projects/{project.id}/resolve/',
+            {'fileuri': base64.urlsafe_b64encode(fileuri.encode()).decode()},
+            headers=headers,
+        )
+        request.user = user
+        client = httpx.AsyncClient(transport=httpx.MockTransport(storage_handler))
+        with mock.patch.object(proxy_api, 'get_async_http_client', return_value=client):
+            response = await AsyncProjectResolveStorageUri.as_view()(request, project_id=project.id)
+            body = b''
+            if response.streaming:
+                body = b''.join([chunk async for chunk in response.streaming_content])
+        await client.aclose()
+        return response, body
+
+    return async_to_sync(run)()
+
+
+@pytest.fixture
+def storage():
+    storage = S3ImportStorageFactory(bucket='bucket', presign=False)
+    with mock.patch.object(
+        S3ImportStorage,
+        'get_stream_url',
+        autospec=True,
+        side_effect=lambda self, url: f'https://s3/{url.rsplit("/", 1)[1]}?signature=test',
+    ), mock.patch.object(proxy_api, 'flag_set', return_value=True):
+        yield storage
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_proxy_streams_object_from_signed_url(storage):
+    project = storage.project
+    user = project.created_by
+
+    response, body = get(project, user, 's3://bucket/video.mp4', Range='bytes=100-199')
+    assert response.status_code == 206
+    assert body == CONTENT[100:200]
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(CONTENT)}'
+    assert response.headers['Content-Type'] == 'video/mp4'
+    assert response.headers['ETag'] == f'"{user.id}1etag"'
+
+    response, body = get(project, user, 's3://bucket/video.mp4')
+    assert response.status_code == 200
+    assert body == CONTENT
+
+    # the storage isn't found for other buckets
+    response, _ = get(project, user, 's3://other/video.mp4')
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_proxy_requires_authentication(storage):
+    response, _ = get(storage.project, AnonymousUser(), 's3://bucket/video.mp4')
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_proxy_forwards_encoded_body(storage):
+    project = storage.project
+    response, body = get(project, project.created_by, 's3://bucket/data.json', **{'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert int(response.headers['Content-Length']) == len(body)
+    assert gzip.decompress(body) == CONTENT
+
+
+class FakeStream:
+    def __init__(self, data):
+        self.chunks = [data[i : i + 1024] for i in range(0, len(data), 1024)]
+
+    def iter_chunks(self, chunk_size):
+        yield from self.chunks
+
+    def close(self):
+        pass
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_proxy_streams_sync_fallback_asynchronously(storage):
+    project = storage.project
+    metadata = {'StatusCode': 200, 'ContentLength': len(CONTENT)}
+    with mock.patch.object(S3ImportStorage, 'get_stream_url', return_value=None), mock.patch.object(
+        S3ImportStorage, 'get_bytes_stream', return_value=(FakeStream(CONTENT), 'video/mp4', metadata)
+    ):
+        response, body = get(project, project.created_by, 's3://bucket/video.mp4')
+    assert response.status_code == 200
+    assert response.is_async
+    assert body == CONTENT
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import mock
+import pytest
+from botocore.exceptions import ClientError
+from io_storages.client_pool import StorageClientPool, client_pool
+from io_storages.s3 import models as s3_models
+from io_storages.tests.factories import S3ImportStorageFactory
+
+
+def test_client_pool_is_bounded_lru():
+    pool = StorageClientPool(max_size=2, max_age=0)
+    factory = mock.Mock(side_effect=lambda: object())
+    keys = [pool.make_key('s3', f'key {i}', 'secret') for i in range(3)]
+
+    first = pool.get(keys[0], factory)
+    assert pool.get(keys[0], factory) is first
+    pool.get(keys[1], factory)
+    pool.get(keys[0], factory)
+    # keys[1] is the least recently used client
+    pool.get(keys[2], factory)
+    assert pool.get(keys[0], factory) is first
+    assert factory.call_count == 3
+    pool.get(keys[1], factory)
+
+    assert factory.call_count == 4
+    assert pool.get_stats() == {'s3.created': 4, 's3.reused': 3, 'evicted': 2, 'size': 2}
+    assert 'secret' not in keys[0]
+
+
+def test_client_pool_creates_one_client_for_concurrent_threads():
+    pool = StorageClientPool(max_size=10, max_age=0)
+    key = pool.make_key('gcs', 'credentials')
+
+    def slow_factory():
+        time.sleep(0.05)
+        return object()
+
+    factory = mock.Mock(side_effect=slow_factory)
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(pool.get(key, factory))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert factory.call_count == 1
+    assert len({id(client) for client in clients}) == 1
+
+
+def test_client_pool_recreates_expired_and_unhealthy_clients():
+    pool = StorageClientPool(max_size=10, max_age=60)
+    key = pool.make_key('azure', 'account', 'key')
+    factory = mock.Mock(side_effect=lambda: object())
+
+    with mock.patch('io_storages.client_pool.time.monotonic', return_value=1000):
+        client = pool.get(key, factory)
+    with mock.patch('io_storages.client_pool.time.monotonic', return_value=1030):
+        assert pool.get(key, factory) is client
+    with mock.patch('io_storages.client_pool.time.monotonic', return_value=1100):
+        client = pool.get(key, factory)
+    assert factory.call_count == 2
+
+    pool.evict(key, reason='expired token')
+    assert pool.get(key, factory) is not client
+    assert pool.get_stats()['expired'] == 1
+    assert pool.get_stats()['unhealthy'] == 1
+
+
+@pytest.mark.django_db
+def test_s3_storages_share_pooled_client_until_auth_error():
+    client_pool.clear()
+    storage = S3ImportStorageFactory(bucket='bucket', aws_access_key_id='id', aws_secret_access_key='secret')
+    other = S3ImportStorageFactory(bucket='other', aws_access_key_id='id', aws_secret_access_key='secret')
+
+    with mock.patch.object(s3_models, 'get_client_and_resource', side_effect=lambda *a, **kw: (mock.Mock(), None)):
+        client = storage.get_client()
+        assert other.get_client() is client
+
+        # rotated credentials are detected by the health check of the storage
+        client.head_bucket.side_effect = ClientError({'Error': {'Code': 'ExpiredToken'}}, 'HeadBucket')
+        with pytest.raises(ClientError):
+            storage.validate_connection()
+        assert other.get_client() is not client
+    client_pool.clear()
@@ -0,0 +1,69 @@
+import json
+import os
+
+import mock
+import pytest
+from io_storages.localfiles.models import LocalFilesExportStorage, LocalFilesExportStorageLink
+from projects.tests.factories import ProjectFactory
+from tasks.models import Annotation
+from tests.utils import make_annotation, make_task
+
+RESULT = [{'from_name': 'label', 'to_name': 'text', 'type': 'choices', 'value': {'choices': ['pos']}}]
+
+
+@pytest.fixture
+def project_with_annotations():
+    project = ProjectFactory()
+    tasks = [make_task({'data': {'text': f'text {i}'}}, project) for i in range(2)]
+    annotations = [
+        make_annotation({'result': RESULT, 'completed_by': project.created_by}, tasks[0].id),
+        make_annotation({'result': RESULT, 'completed_by': project.created_by}, tasks[0].id),
+        make_annotation({'result': RESULT, 'completed_by': project.created_by}, tasks[1].id),
+    ]
+    return project, tasks, annotations
+
+
+@pytest.mark.django_db(transaction=True)
+def test_save_annotations_uploads_each_task_once(project_with_annotations, tmp_path, settings):
+    settings.FUTURE_SAVE_TASK_TO_STORAGE = True
+    project, tasks, annotations = project_with_annotations
+    storage = LocalFilesExportStorage.objects.create(project=project, path=str(tmp_path))
+
+    storage.info_set_queued()
+    with mock.patch.object(
+        LocalFilesExportStorage, 'save_annotation', autospec=True, side_effect=LocalFilesExportStorage.save_annotation
+    ) as save_annotation:
+        storage.save_annotations(Annotation.objects.filter(task=tasks[0]))
+
+    assert save_annotation.call_count == 1
+    assert os.listdir(tmp_path) == [f'{tasks[0].id}.json']
+    with open(tmp_path / f'{tasks[0].id}.json') as f:
+        assert [a['id'] for a in json.load(f)['annotations']] == [annotations[0].id, annotations[1].id]
+    assert set(LocalFilesExportStorageLink.objects.values_list('annotation_id', flat=True)) == {
+        annotations[0].id,
+        annotations[1].id,
+    }
+    storage.refresh_from_db()
+    assert storage.last_sync_count == 2
+
+    # only the annotation without a link is exported
+    storage.info_set_queued()
+    storage.save_only_new_annotations()
+    assert sorted(os.listdir(tmp_path)) == sorted([f'{tasks[0].id}.json', f'{tasks[1].id}.json'])
+    assert LocalFilesExportStorageLink.objects.count() == 3
+    storage.refresh_from_db()
+    assert storage.last_sync_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_save_annotations_in_annotation_format(project_with_annotations, tmp_path, settings):
+    settings.FUTURE_SAVE_TASK_TO_STORAGE = False
+    project, tasks, annotations = project_with_annotations
+    storage = LocalFilesExportStorage.objects.create(project=project, path=str(tmp_path))
+
+    storage.info_set_queued()
+    storage.save_annotations(Annotation.objects.filter(id__in=[annotations[0].id, annotations[2].id]))
+
+    assert sorted(os.listdir(tmp_path)) == sorted([str(annotations[0].id), str(annotations[2].id)])
+    storage.refresh_from_db()
+    assert storage.last_sync_count == 2
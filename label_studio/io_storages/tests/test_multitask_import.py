@@ -1,4 +1,5 @@
 import json
+import time
 
 import boto3
 import mock
@@ -12,9 +13,11 @@ from io_storages.tests.factories import (
     S3ImportStorageFactory,
 )
 from io_storages.utils import StorageObject, load_tasks_json
+from ml.models import MLBackend
 from moto import mock_s3
 from projects.tests.factories import ProjectFactory
 from rest_framework.test import APIClient
+from tasks.models import Task
 from tests.utils import azure_client_mock, gcs_client_mock, mock_feature_flag, redis_client_mock
 
 
@@ -414,3 +417,112 @@ def test_mixed_formats_jsonl(storage):
     assert output == expected_output
 
     create_tasks(storage, output)
+
+
+def test_add_tasks_in_bulk(storage):
+    project, storage = storage
+    blob = json.dumps(annots_preds_task_list).encode()
+    output = load_tasks_json(blob, 'test.json')
+
+    tasks = S3ImportStorage.add_tasks(project, 1, 1, storage, output, S3ImportStorageLink)
+
+    assert [task.inner_id for task in tasks] == [1, 2]
+    assert [task.total_annotations for task in tasks] == [1, 0]
+    assert [task.total_predictions for task in tasks] == [1, 1]
+    assert [task.is_labeled for task in tasks] == [True, False]
+    assert list(
+        S3ImportStorageLink.objects.filter(storage=storage).order_by('row_index').values_list('task_id', 'row_index')
+    ) == [(tasks[0].id, 0), (tasks[1].id, 1)]
+    assert project.annotations.get().result_count == 1
+    assert project.predictions.count() == 2
+    project.summary.refresh_from_db()
+    assert project.summary.all_data_columns == {'text': 2}
+
+
+def test_add_tasks_updates_counters_and_starts_training(storage):
+    project, storage = storage
+    project.min_annotations_to_start_training = 2
+    project.save()
+    MLBackend.objects.create(project=project, url='http://ml.backend')
+    result = annots_preds_task_list[0]['annotations'][0]['result']
+    task_list = [
+        {'data': {'text': 'a'}, 'annotations': [{'result': result}, {'result': [], 'was_cancelled': True}]},
+        {'data': {'text': 'b'}, 'annotations': [{'result': result}]},
+    ]
+    output = load_tasks_json(json.dumps(task_list).encode(), 'test.json')
+
+    with mock.patch.object(MLBackend, 'train') as train:
+        tasks = S3ImportStorage.add_tasks(project, 1, 1, storage, output, S3ImportStorageLink)
+    train.assert_called_once()
+
+    for task in tasks:
+        db_task = Task.objects.get(id=task.id)
+        assert (db_task.total_annotations, db_task.cancelled_annotations, db_task.is_labeled) == (
+            task.total_annotations,
+            task.cancelled_annotations,
+            task.is_labeled,
+        )
+    assert [(task.total_annotations, task.cancelled_annotations) for task in tasks] == [(1, 1), (1, 0)]
+    assert [task.is_labeled for task in tasks] == [True, True]
+
+    # the 4th annotation is a multiple of 2, the 5th one isn't
+    with mock.patch.object(MLBackend, 'train') as train:
+        S3ImportStorage.add_tasks(project, 1, 3, storage, output[1:], S3ImportStorageLink)
+    train.assert_called_once()
+    with mock.patch.object(MLBackend, 'train') as train:
+        S3ImportStorage.add_tasks(project, 1, 4, storage, output[1:], S3ImportStorageLink)
+    train.assert_not_called()
+
+
+def test_n_tasks_linked_bulk(storage):
+    project, storage = storage
+    blob = json.dumps(annots_preds_task_list).encode()
+    S3ImportStorage.add_tasks(project, 1, 1, storage, load_tasks_json(blob, 'a.json'), S3ImportStorageLink)
+    S3ImportStorage.add_tasks(project, 1, 3, storage, load_tasks_json(blob, 'b.json')[:1], S3ImportStorageLink)
+
+    assert S3ImportStorageLink.n_tasks_linked_bulk(['a.json', 'b.json', 'c.json'], storage) == {
+        'a.json': 2,
+        'b.json': 1,
+    }
+    assert S3ImportStorageLink.n_tasks_linked_bulk([], storage) == {}
+
+
+@pytest.mark.parametrize('prefetch_workers,prefetch_max_bytes', [(1, 0), (4, 0), (4, 1)])
+def test_prefetch_keeps_keys_order(storage, settings, prefetch_workers, prefetch_max_bytes):
+    project, storage = storage
+    settings.STORAGE_IMPORT_PREFETCH_WORKERS = prefetch_workers
+    settings.STORAGE_IMPORT_PREFETCH_MAX_BYTES = prefetch_max_bytes
+    keys = [f'{i}.json' for i in range(10)]
+
+    def get_data(key):
+        # later keys are downloaded faster than earlier ones
+        time.sleep(0.01 * (10 - int(key.split('.')[0])))
+        return load_tasks_json(json.dumps([{'text': key, 'row': row} for row in range(2)]).encode(), key)
+
+    with mock.patch.object(S3ImportStorage, 'iterkeys', return_value=iter(keys)), mock.patch.object(
+        S3ImportStorage, 'get_data', side_effect=get_data
+    ):
+        storage.info_set_queued()
+        storage.scan_and_create_links()
+
+    tasks = list(project.tasks.order_by('inner_id').values_list('inner_id', 'data'))
+    assert [inner_id for inner_id, _ in tasks] == list(range(1, 21))
+    assert [(data['text'], data['row']) for _, data in tasks] == [(key, row) for key in keys for row in range(2)]
+    storage.refresh_from_db()
+    assert storage.last_sync_count == 20
+
+
+def test_prefetched_size_is_downloaded_blob_length(storage):
+    project, storage = storage
+    blob = json.dumps(annots_preds_task_list).encode()
+
+    with mock.patch.object(S3ImportStorage, 'get_data', side_effect=lambda key: load_tasks_json(blob, key)):
+        link_objects, size = storage._get_data_with_size('a.json')
+    assert len(link_objects) == 2
+    assert size == len(blob)
+
+    # blob urls aren't downloaded
+    with mock.patch.object(
+        S3ImportStorage, 'get_data', return_value=[StorageObject(key='a.jpg', task_data={'image': 's3://a.jpg'})]
+    ):
+        assert storage._get_data_with_size('a.jpg')[1] == 0
@@ -0,0 +1,94 @@
+import mock
+import pytest
+from io_storages.presign_cache import (
+    clear_presigned_urls,
+    get_presigned_url,
+    get_presigned_urls,
+    prefetch_presigned_urls,
+)
+from io_storages.s3.models import S3ImportStorage
+from io_storages.tests.factories import S3ImportStorageFactory
+from tasks.models import Task
+
+
+@pytest.fixture
+def storage():
+    clear_presigned_urls()
+    storage = S3ImportStorageFactory(bucket='bucket', presign=True, presign_ttl=2)
+    with mock.patch.object(
+        S3ImportStorage, 'generate_http_url', autospec=True, side_effect=lambda self, url: url + '?signed'
+    ) as generate_http_url:
+        storage.generate_http_url_mock = generate_http_url
+        yield storage
+    clear_presigned_urls()
+
+
+@pytest.mark.django_db
+def test_presigned_url_is_cached_below_presign_ttl(storage, settings):
+    settings.PRESIGNED_URL_CACHE_TTL_RATIO = 0.5
+    with mock.patch('io_storages.presign_cache.time.monotonic', return_value=1000):
+        assert get_presigned_url(storage, 's3://bucket/1.jpg') == 's3://bucket/1.jpg?signed'
+        assert get_presigned_url(storage, 's3://bucket/1.jpg') == 's3://bucket/1.jpg?signed'
+    assert storage.generate_http_url_mock.call_count == 1
+
+    # half of 2 minutes presign ttl is passed
+    with mock.patch('io_storages.presign_cache.time.monotonic', return_value=1060):
+        get_presigned_url(storage, 's3://bucket/1.jpg')
+    assert storage.generate_http_url_mock.call_count == 2
+
+
+@pytest.mark.django_db
+def test_presigned_urls_are_resolved_in_bulk(storage, settings):
+    settings.PRESIGNED_URL_CACHE_SIZE = 2
+    get_presigned_url(storage, 's3://bucket/1.jpg')
+
+    urls = get_presigned_urls(storage, ['s3://bucket/1.jpg', 's3://bucket/2.jpg', 's3://bucket/3.jpg'])
+    assert urls == {f's3://bucket/{i}.jpg': f's3://bucket/{i}.jpg?signed' for i in (1, 2, 3)}
+    assert storage.generate_http_url_mock.call_count == 3
+
+    # the least recently used url is evicted
+    get_presigned_urls(storage, ['s3://bucket/2.jpg', 's3://bucket/3.jpg'])
+    assert storage.generate_http_url_mock.call_count == 3
+    get_presigned_url(storage, 's3://bucket/1.jpg')
+    assert storage.generate_http_url_mock.call_count == 4
+
+
+@pytest.mark.django_db
+def test_presigned_url_is_not_cached_without_presign(storage):
+    storage.presign = False
+    get_presigned_url(storage, 's3://bucket/1.jpg')
+    get_presigned_url(storage, 's3://bucket/1.jpg')
+    assert storage.generate_http_url_mock.call_count == 2
+
+
+@pytest.mark.django_db
+def test_prefetch_presigned_urls_for_tasks(storage, settings):
+    tasks = [
+        Task.objects.create(project=storage.project, data={'image': f's3://bucket/{i}.jpg', 'text': 'text'})
+        for i in range(3)
+    ]
+    tasks.append(Task.objects.create(project=storage.project, data={'image': 's3://other-bucket/1.jpg'}))
+
+    assert prefetch_presigned_urls(tasks, storage.project) == 3
+    assert storage.generate_http_url_mock.call_count == 3
+
+    resolved = tasks[0].resolve_storage_uri('s3://bucket/0.jpg')
+    assert resolved == {'url': 's3://bucket/0.jpg?signed', 'presign_ttl': 2}
+    assert storage.generate_http_url_mock.call_count == 3
+
+
+@pytest.mark.django_db
+def test_presigned_urls_are_signed_again_after_storage_change(storage):
+    get_presigned_url(storage, 's3://bucket/1.jpg')
+    storage.info_set_queued()
+    get_presigned_url(storage, 's3://bucket/1.jpg')
+    assert storage.generate_http_url_mock.call_count == 1
+
+    # other processes load the changed storage from the database
+    S3ImportStorage.objects.filter(id=storage.id).update(aws_secret_access_key='rotated')
+    get_presigned_url(S3ImportStorage.objects.get(id=storage.id), 's3://bucket/1.jpg')
+    assert storage.generate_http_url_mock.call_count == 2
+
+    storage.presign_ttl = 30
+    get_presigned_url(storage, 's3://bucket/1.jpg')
+    assert storage.generate_http_url_mock.call_count == 3
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import mock
+import pytest
+from django.http import FileResponse
+from io_storages import proxy_cache
+from io_storages.proxy_api import ResolveStorageUriAPIMixin
+from io_storages.s3.models import S3ImportStorage
+from io_storages.tests.factories import S3ImportStorageFactory
+from io_storages.utils import parse_range
+from rest_framework.test import APIRequestFactory
+
+CONTENT = bytes(range(256)) * 40
+
+
+class FakeStream:
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunks(self, chunk_size):
+        for i in range(0, len(self.data), chunk_size):
+            time.sleep(0.01)
+            yield self.data[i : i + chunk_size]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def storage(settings, tmp_path):
+    settings.RESOLVER_PROXY_DISK_CACHE_DIR = str(tmp_path / 'proxy_cache')
+    settings.RESOLVER_PROXY_DISK_CACHE_MAX_SIZE = 1024 * 1024
+    settings.RESOLVER_PROXY_BUFFER_SIZE = 1024
+    proxy_cache.clear_object_infos()
+    storage = S3ImportStorageFactory(bucket='bucket', presign=False)
+    objects = {'s3://bucket/video.mp4': (CONTENT, 'etag1')}
+
+    def get_bytes_stream(self, uri, range_header=None):
+        data, etag = objects[uri]
+        start, end = parse_range(range_header) if range_header else (0, '')
+        end = len(data) - 1 if end == '' else end
+        metadata = {'ETag': f'"{etag}"', 'ContentRange': f'bytes {start}-{end}/{len(data)}', 'StatusCode': 200}
+        return FakeStream(data[start : end + 1]), 'video/mp4', metadata
+
+    with mock.patch.object(
+        S3ImportStorage, 'get_bytes_stream', autospec=True, side_effect=get_bytes_stream
+    ) as get_bytes_stream_mock:
+        storage.objects = objects
+        storage.get_bytes_stream_mock = get_bytes_stream_mock
+        yield storage
+    proxy_cache.clear_object_infos()
+
+
+def full_downloads(storage):
+    return [c for c in storage.get_bytes_stream_mock.call_args_list if c.kwargs.get('range_header') is None]
+
+
+def wait_for_cache(storage, uri, timeout=5):
+    """Cached file path, the object is downloaded in the background after the first miss"""
+    info = proxy_cache.get_object_info(storage, uri)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        path = proxy_cache.get_cached_file(storage, uri, info)
+        if path is not None:
+            return path
+        time.sleep(0.01)
+    raise AssertionError(f'{uri} is not cached in {timeout}s')
+
+
+def proxy(storage, **headers):
+    request = APIRequestFactory().get('/', **headers)
+    request.user = SimpleNamespace(id=1)
+    project = mock.Mock()
+    project.has_permission.return_value = True
+    return ResolveStorageUriAPIMixin().proxy_data_from_storage(request, 's3://bucket/video.mp4', project, storage)
+
+
+@pytest.mark.django_db
+def test_concurrent_misses_download_object_once_in_background(storage):
+    info = proxy_cache.get_object_info(storage, 's3://bucket/video.mp4')
+    assert info['size'] == len(CONTENT)
+
+    paths = []
+    threads = [
+        threading.Thread(
+            target=lambda: paths.append(proxy_cache.get_cached_file(storage, 's3://bucket/video.mp4', info))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # misses don't wait for the download
+    assert paths == [None] * 8
+
+    path = wait_for_cache(storage, 's3://bucket/video.mp4')
+    assert len(full_downloads(storage)) == 1
+    with open(path, 'rb') as f:
+        assert f.read() == CONTENT
+
+
+@pytest.mark.django_db
+def test_proxy_serves_ranges_from_cached_file(storage):
+    # the first request is streamed from the storage while the object is cached
+    response = proxy(storage)
+    assert response.status_code == 200
+    assert not isinstance(response, FileResponse)
+    assert b''.join(response.streaming_content) == CONTENT
+    response.close()
+    wait_for_cache(storage, 's3://bucket/video.mp4')
+    assert len(full_downloads(storage)) == 2
+
+    response = proxy(storage, HTTP_RANGE='bytes=100-199')
+    assert isinstance(response, FileResponse)
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(CONTENT)}'
+    assert response.headers['Content-Length'] == '100'
+    assert b''.join(response.streaming_content) == CONTENT[100:200]
+    response.close()
+    assert len(full_downloads(storage)) == 2
+
+    # the changed object is cached with its new etag after the info ttl
+    storage.objects['s3://bucket/video.mp4'] = (CONTENT[::-1], 'etag2')
+    proxy_cache.clear_object_infos()
+    response = proxy(storage, HTTP_RANGE='bytes=0-9')
+    assert b''.join(response.streaming_content) == CONTENT[::-1][:10]
+    response.close()
+    with open(wait_for_cache(storage, 's3://bucket/video.mp4'), 'rb') as f:
+        assert f.read() == CONTENT[::-1]
+    assert len(full_downloads(storage)) == 3
+
+
+@pytest.mark.django_db
+def test_least_recently_used_files_are_evicted(storage, settings):
+    paths = []
+    for i in range(3):
+        uri = f's3://bucket/{i}.mp4'
+        storage.objects[uri] = (CONTENT, f'etag{i}')
+        paths.append(wait_for_cache(storage, uri))
+        os.utime(paths[-1], (1000 + i, 1000 + i))
+    # the first file is used again
+    wait_for_cache(storage, 's3://bucket/0.mp4')
+
+    assert proxy_cache.evict(max_size=2 * len(CONTENT)) == 1
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+
+
+@pytest.mark.django_db
+def test_full_cache_is_evicted_after_fill(storage, settings):
+    settings.RESOLVER_PROXY_DISK_CACHE_MAX_SIZE = int(2.5 * len(CONTENT))
+    paths = []
+    for i in range(3):
+        uri = f's3://bucket/{i}.mp4'
+        storage.objects[uri] = (CONTENT, f'etag{i}')
+        paths.append(wait_for_cache(storage, uri))
+        os.utime(paths[-1], (1000 + i, 1000 + i))
+    storage.objects['s3://bucket/3.mp4'] = (CONTENT, 'etag3')
+    paths.append(wait_for_cache(storage, 's3://bucket/3.mp4'))
+
+    # the running size exceeds the limit, the cache is evicted below 90% of it
+    assert [os.path.exists(path) for path in paths] == [False, False, True, True]
@@ -0,0 +1,60 @@
+import pytest
+from data_import.models import FileUpload
+from data_import.uploader import create_file_upload
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from io_storages.functions import StorageIndex, get_storage_by_url
+from io_storages.tests.factories import GCSImportStorageFactory, S3ImportStorageFactory
+from tasks.models import Task
+
+
+@pytest.mark.django_db
+def test_storage_index_finds_the_same_storage_as_full_scan():
+    first = S3ImportStorageFactory(bucket='first')
+    project = first.project
+    storages = [
+        first,
+        S3ImportStorageFactory(project=project, bucket='second'),
+        GCSImportStorageFactory(project=project, bucket='first'),
+    ]
+    index = StorageIndex(storages)
+
+    for url in [
+        's3://first/1.jpg',
+        's3://second/dir/2.jpg',
+        'gs://first/3.jpg',
+        '<img src="s3://second/4.jpg"/>',
+        's3://third/5.jpg',
+        'https://example.com/6.jpg',
+        ['s3://first/7.jpg'],
+    ]:
+        assert index.get(url) == get_storage_by_url(url, storages)
+    assert index.get('s3://third/5.jpg') is None
+
+
+@pytest.mark.django_db
+def test_resolve_tasks_uri_fetches_uploaded_files_at_once(settings):
+    settings.CLOUD_FILE_STORAGE_ENABLED = True
+    storage = S3ImportStorageFactory(bucket='bucket', presign=True)
+    project = storage.project
+    file_uploads = [
+        create_file_upload(project.created_by, project, SimpleUploadedFile(f'{i}.txt', b'text')) for i in range(3)
+    ]
+    tasks = [
+        Task.objects.create(project=project, data={'text': file_upload.file.name, 'image': f's3://bucket/{i}.jpg'})
+        for i, file_upload in enumerate(file_uploads)
+    ]
+    tasks.append(Task.objects.create(project=project, data={'text': 'upload/0/missing.txt'}))
+
+    with CaptureQueriesContext(connection) as queries:
+        resolved = Task.resolve_tasks_uri(tasks, project)
+    file_upload_queries = [q for q in queries if FileUpload._meta.db_table in q['sql']]
+    assert len(file_upload_queries) == 1
+
+    for task, file_upload in zip(tasks, file_uploads):
+        assert task.uri_resolved
+        assert resolved[task.id] is task.data
+        assert task.data['text'] == file_upload.url
+        assert 'fileuri=' in task.data['image']
+    assert tasks[-1].data['text'] == 'upload/0/missing.txt?not_uploaded_project_file'
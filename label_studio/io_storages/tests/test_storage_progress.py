@@ -0,0 +1,48 @@
+import mock
+import pytest
+from io_storages.base_models import StorageProgress
+from io_storages.tests.factories import S3ImportStorageFactory
+
+
+@pytest.mark.django_db
+def test_storage_progress_flushes_by_items(settings):
+    settings.STORAGE_PROGRESS_FLUSH_SECONDS = 3600
+    settings.STORAGE_PROGRESS_FLUSH_ITEMS = 10
+    storage = S3ImportStorageFactory()
+    storage.info_set_queued()
+    storage.info_set_in_progress()
+
+    progress = StorageProgress(storage, total=100)
+    with mock.patch.object(storage, 'save', wraps=storage.save) as save:
+        for i in range(25):
+            progress.update(last_sync_count=i + 1, tasks_existed=0)
+        assert save.call_count == 2
+
+    storage.refresh_from_db()
+    assert storage.last_sync_count == 20
+    assert storage.meta['items_processed'] == 20
+    assert storage.meta['throughput'] > 0
+    assert storage.meta['eta'] >= 0
+
+    progress.complete(last_sync_count=25)
+    storage.refresh_from_db()
+    assert storage.status == storage.Status.COMPLETED
+    assert storage.last_sync_count == 25
+    assert storage.meta['items_processed'] == 25
+    assert storage.meta['eta'] == 0
+    assert storage.meta['tasks_existed'] == 0
+
+
+@pytest.mark.django_db
+def test_storage_progress_flushes_by_time(settings):
+    settings.STORAGE_PROGRESS_FLUSH_SECONDS = 0
+    settings.STORAGE_PROGRESS_FLUSH_ITEMS = 1000
+    storage = S3ImportStorageFactory()
+    storage.info_set_queued()
+    storage.info_set_in_progress()
+
+    progress = StorageProgress(storage)
+    progress.update(last_sync_count=1)
+    storage.refresh_from_db()
+    assert storage.last_sync_count == 1
+    assert storage.meta['eta'] is None
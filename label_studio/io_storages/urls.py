@@ -159,20 +159,19 @@ urlpatterns = [
     path('api/storages/', include((_api_urlpatterns, app_name), namespace='api')),
 ]
 
-# URI Resolving: proxy or redirect to presigned URLs
+# URI Resolving: proxy or redirect to presigned URLs, async views stream proxied data in ASGI event loop
+if settings.RESOLVER_PROXY_ASYNC:
+    task_resolve_view = proxy_api.AsyncTaskResolveStorageUri.as_view()
+    project_resolve_view = proxy_api.AsyncProjectResolveStorageUri.as_view()
+else:
+    task_resolve_view = proxy_api.TaskResolveStorageUri.as_view()
+    project_resolve_view = proxy_api.ProjectResolveStorageUri.as_view()
+
 urlpatterns += [
     # resolving storage URIs endpoints: proxy or redirect to presigned URLs
-    path('tasks/<int:task_id>/resolve/', proxy_api.TaskResolveStorageUri.as_view(), name='task-storage-data-resolve'),
-    path(
-        'projects/<int:project_id>/resolve/',
-        proxy_api.ProjectResolveStorageUri.as_view(),
-        name='project-storage-data-resolve',
-    ),
+    path('tasks/<int:task_id>/resolve/', task_resolve_view, name='task-storage-data-resolve'),
+    path('projects/<int:project_id>/resolve/', project_resolve_view, name='project-storage-data-resolve'),
     # keep /presign/ for backwards compatibility
-    path('tasks/<int:task_id>/presign/', proxy_api.TaskResolveStorageUri.as_view(), name='task-storage-data-presign'),
-    path(
-        'projects/<int:project_id>/presign/',
-        proxy_api.ProjectResolveStorageUri.as_view(),
-        name='project-storage-data-presign',
-    ),
+    path('tasks/<int:task_id>/presign/', task_resolve_view, name='task-storage-data-presign'),
+    path('projects/<int:project_id>/presign/', project_resolve_view, name='project-storage-data-presign'),
 ]
@@ -3,6 +3,7 @@
 import json
 import logging
 import re
+import threading
 from dataclasses import dataclass
 from typing import Optional, Union
 
@@ -16,6 +17,8 @@ logger = logging.getLogger(__name__)
 
 # Put storage prefixes here
 uri_regex = r"([\"'])(?P<uri>(?P<storage>{})://[^\1=]*)\1"
+# byte length of the last blob parsed by load_tasks_json in the current thread
+_loaded_blob = threading.local()
 
 
 @dataclass
@@ -184,4 +187,12 @@ def load_tasks_json_lso(blob: bytes, key: str) -> list[StorageObject]:
 def load_tasks_json(blob: str, key: str) -> list[StorageObject]:
     # uses load_tasks_json_lso here and an LSE-specific implementation in LSE
     load_tasks_json_func = load_func(settings.STORAGE_LOAD_TASKS_JSON)
+    _loaded_blob.size = len(blob)
     return load_tasks_json_func(blob, key)
+
+
+def pop_loaded_blob_size() -> Optional[int]:
+    """Byte length of the blob parsed by the last load_tasks_json call in this thread, None if there was no call"""
+    size = getattr(_loaded_blob, 'size', None)
+    _loaded_blob.size = None
+    return size
@@ -12,7 +12,7 @@ from data_export.serializers import ExportDataSerializer
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.db.models import Count
-from requests.adapters import HTTPAdapter
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
 from label_studio.core.utils.params import get_env
@@ -50,7 +50,15 @@ class BaseHTTPAPI(object):
     }
 
     def __init__(
-        self, url, timeout=None, connection_timeout=None, max_retries=None, headers=None, auth_method=None, **kwargs
+        self,
+        url,
+        timeout=None,
+        connection_timeout=None,
+        max_retries=None,
+        headers=None,
+        auth_method=None,
+        pool_maxsize=None,
+        **kwargs,
     ):
         self._url = url
         self._timeout = timeout or TIMEOUT_DEFAULT
@@ -62,14 +70,17 @@ class BaseHTTPAPI(object):
         self._basic_auth = (kwargs.get('basic_auth_user'), kwargs.get('basic_auth_pass'))
 
         self._max_retries = max_retries or self.MAX_RETRIES
+        # number of connections kept in the session pool, it should match the number of threads using this api
+        self._pool_maxsize = pool_maxsize or DEFAULT_POOLSIZE
         self._sessions = {self._session_key(): self.create_session()}
 
     def create_session(self):
         session = requests.Session()
         session.headers.update(self.HEADERS)
         session.headers.update(self._headers)
-        session.mount('http://', HTTPAdapter(max_retries=self._max_retries))
-        session.mount('https://', HTTPAdapter(max_retries=self._max_retries))
+        adapter = HTTPAdapter(max_retries=self._max_retries, pool_maxsize=self._pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
         return session
 
     def _session_key(self):
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml', '0007_auto_20240314_1957'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlbackend',
+            name='predict_progress',
+            field=models.JSONField(default=dict, help_text='Progress of the last predictions retrieval for the project tasks', null=True, verbose_name='predict progress'),
+        ),
+    ]
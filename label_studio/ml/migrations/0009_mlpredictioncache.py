@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-17 23:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ml', '0008_mlbackend_predict_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MLPredictionCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Hash of task data, model version and context', max_length=64, verbose_name='key')),
+                ('model_version', models.TextField(blank=True, null=True, verbose_name='model version')),
+                ('response', models.JSONField(help_text='Cached ML backend response for the task', verbose_name='response')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='last used at')),
+                ('ml_backend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prediction_cache', to='ml.mlbackend')),
+            ],
+            options={
+                'unique_together': {('ml_backend', 'key')},
+            },
+        ),
+    ]
@@ -1,17 +1,24 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import hashlib
+import json
 import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import timedelta
 from typing import Dict, List
 
-from core.utils.common import conditional_atomic, db_is_not_sqlite, load_func
+from core.utils.common import batch, conditional_atomic, db_is_not_sqlite, load_func
 from django.conf import settings
 from django.db import models, transaction
 from django.db.models import Count, JSONField, Q
 from django.db.models.signals import post_save, pre_delete
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from ml.api_connector import PREDICT_URL, TIMEOUT_PREDICT, MLApi
 from projects.models import Project
+from rest_framework.exceptions import ValidationError
 from tasks.serializers import PredictionSerializer, TaskSimpleSerializer
 from webhooks.serializers import Webhook, WebhookSerializer
 
@@ -127,6 +134,12 @@ class MLBackend(models.Model):
         default=True,
         help_text='If false, model version is set by the user, if true - getting latest version from backend.',
     )
+    predict_progress = JSONField(
+        _('predict progress'),
+        null=True,
+        default=dict,
+        help_text='Progress of the last predictions retrieval for the project tasks',
+    )
 
     def __str__(self):
         return f'{self.title} (id={self.id}, url={self.url})'
@@ -185,16 +198,20 @@ class MLBackend(models.Model):
             basic_auth_pass=self.basic_auth_pass,
         )
 
-    @property
-    def api(self):
+    def get_api(self, pool_maxsize=None):
         return MLApi(
             url=self.url,
             timeout=self.timeout,
             auth_method=self.auth_method,
             basic_auth_user=self.basic_auth_user,
             basic_auth_pass=self.basic_auth_pass,
+            pool_maxsize=pool_maxsize,
         )
 
+    @property
+    def api(self):
+        return self.get_api()
+
     @property
     def not_ready(self):
         return self.state in (MLBackendState.DISCONNECTED, MLBackendState.ERROR)
@@ -259,7 +276,7 @@ class MLBackend(models.Model):
         }
 
     def _get_predictions_from_ml_backend_one_by_one(
-        self, serialized_tasks: List[Dict], current_responses: List[Dict]
+        self, serialized_tasks: List[Dict], current_responses: List[Dict], api=None
     ) -> List[Dict]:
         """
         This is helper method to get predictions from ML backend one by one
@@ -277,7 +294,7 @@ class MLBackend(models.Model):
             predictions = []
             for serialized_task in serialized_tasks:
                 # get predictions per task
-                predictions.extend(self._get_predictions_from_ml_backend([serialized_task]))
+                predictions.extend(self._get_predictions_from_ml_backend([serialized_task], api=api))
 
             return predictions
         else:
@@ -289,8 +306,23 @@ class MLBackend(models.Model):
             )
             return []
 
-    def _get_predictions_from_ml_backend(self, serialized_tasks: List[Dict]) -> List[Dict]:
-        result = self.api.make_predictions(serialized_tasks, self.project)
+    def _make_predictions_with_retries(self, serialized_tasks: List[Dict], api=None):
+        """Send tasks to ML backend, connection errors, 429 and 5xx responses are retried with exponential backoff"""
+        api = api or self.api
+        for attempt in range(settings.ML_PREDICT_MAX_RETRIES + 1):
+            result = api.make_predictions(serialized_tasks, self.project)
+            retryable = result.is_error and (result.status_code in (0, 429) or result.status_code >= 500)
+            if not retryable or attempt == settings.ML_PREDICT_MAX_RETRIES:
+                return result
+            delay = settings.ML_PREDICT_RETRY_BACKOFF * 2**attempt
+            logger.info(
+                f'ML backend {self} failed to predict {len(serialized_tasks)} tasks: {result.error_message}, '
+                f'retrying in {delay} seconds'
+            )
+            time.sleep(delay)
+
+    def _get_predictions_from_ml_backend(self, serialized_tasks: List[Dict], api=None) -> List[Dict]:
+        result = self._make_predictions_with_retries(serialized_tasks, api=api)
 
         # response validation
         if result.is_error:
@@ -312,7 +344,7 @@ class MLBackend(models.Model):
             # Number of tasks and responses are not equal
             # It can happen if ML backend doesn't support batch processing but only process one task at a time
             # In the future versions, we may better consider this as an error and deprecate this code branch
-            return self._get_predictions_from_ml_backend_one_by_one(serialized_tasks, responses)
+            return self._get_predictions_from_ml_backend_one_by_one(serialized_tasks, responses, api=api)
 
         # ML backend supports batch processing
         for task, response in zip(serialized_tasks, responses):
@@ -354,15 +386,162 @@ class MLBackend(models.Model):
         tasks = tasks.annotate(predictions_count=Count('predictions')).exclude(
             Q(predictions_count__gt=0) & Q(predictions__model_version=model_version)
         )
-        if not tasks.exists():
+        task_ids = list(tasks.order_by('id').values_list('id', flat=True))
+        if not task_ids:
             logger.debug(f'All tasks already have prediction from model version={self.model_version}')
             return model_version
-        tasks_ser = TaskSimpleSerializer(tasks, many=True).data
-        predictions = self._get_predictions_from_ml_backend(tasks_ser)
+        return self._dispatch_predictions(task_ids, model_version)
+
+    def _save_predictions(self, predictions):
+        """Validate predictions from ML backend and insert them in bulk"""
+        from data_manager.functions import maintain_materialized_columns
+        from tasks.functions import update_tasks_counters
+        from tasks.models import Prediction, Task
+
+        prediction_ser = PredictionSerializer(data=predictions, many=True)
+        prediction_ser.is_valid(raise_exception=True)
+        instances = []
+        for validated in prediction_ser.validated_data:
+            # bulk_create doesn't call save(), so the result has to be normalized here
+            validated['result'] = Prediction.prepare_prediction_result(validated['result'], self.project)
+            instances.append(Prediction(**validated))
+
         with conditional_atomic(predicate=db_is_not_sqlite):
-            prediction_ser = PredictionSerializer(data=predictions, many=True)
-            prediction_ser.is_valid(raise_exception=True)
-            instances = prediction_ser.save()
+            instances = Prediction.objects.bulk_create(instances, batch_size=settings.BATCH_SIZE)
+            task_ids = {prediction.task_id for prediction in instances}
+            tasks = Task.objects.filter(id__in=task_ids)
+            tasks.update(updated_at=timezone.now())
+            update_tasks_counters(tasks)
+            maintain_materialized_columns(self.project_id, list(task_ids))
+        return instances
+
+    def _save_batch_predictions(self, predictions, batch_size):
+        """Save predictions of one batch, invalid predictions fail only this batch
+
+        :return: saved predictions or None if ML backend returned invalid predictions
+        """
+        try:
+            return self._save_predictions(predictions)
+        except ValidationError as exc:
+            logger.error(f'ML backend {self} returned invalid predictions for {batch_size} tasks: {exc}')
+            return None
+
+    def _get_cached_predictions(self, serialized_tasks):
+        """Split serialized tasks into tasks to send to ML backend and predictions found in the prediction cache
+
+        :return: (tasks without cached predictions, {task id: cache key}, cached predictions)
+        """
+        label_config = hashlib.sha256(self.project.label_config.encode()).hexdigest()
+        cache_keys = {
+            task['id']: MLPredictionCache.get_key(task['data'], self.model_version, label_config=label_config)
+            for task in serialized_tasks
+        }
+        cached = MLPredictionCache.lookup(self, cache_keys.values())
+        predictions, tasks = [], []
+        for task in serialized_tasks:
+            response = cached.get(cache_keys[task['id']])
+            if response is None:
+                tasks.append(task)
+                continue
+            for prediction in response:
+                predictions.append({**prediction, 'task': task['id'], 'project': task['project']})
+        if predictions:
+            logger.debug(f'ML backend {self}: {len(serialized_tasks) - len(tasks)} tasks predicted from cache')
+        return tasks, cache_keys, predictions
+
+    def _store_cached_predictions(self, predictions, cache_keys):
+        responses = {}
+        for prediction in predictions:
+            key = cache_keys.get(prediction['task'])
+            if key is not None:
+                responses.setdefault(key, []).append(
+                    {k: v for k, v in prediction.items() if k not in ('task', 'project')}
+                )
+        MLPredictionCache.store(self, responses)
+
+    def _update_predict_progress(self, **kwargs):
+        self.predict_progress = {**(self.predict_progress or {}), **kwargs, 'time_last_ping': str(timezone.now())}
+        MLBackend.objects.filter(id=self.id).update(predict_progress=self.predict_progress)
+
+    def _dispatch_predictions(self, task_ids, model_version=None):
+        """Get predictions for tasks from ML backend in batches of ML_PREDICT_BATCH_SIZE tasks
+
+        Batches are sent concurrently by ML_PREDICT_CONCURRENCY threads over one pooled session,
+        predictions are saved in bulk as soon as the batch response arrives. Progress is saved to predict_progress.
+        """
+        from tasks.models import Task
+
+        concurrency = max(settings.ML_PREDICT_CONCURRENCY, 1)
+        api = self.get_api(pool_maxsize=concurrency)
+        instances = []
+        processed = failed = 0
+        self._update_predict_progress(
+            status='in_progress',
+            model_version=model_version,
+            total_tasks=len(task_ids),
+            processed_tasks=0,
+            failed_tasks=0,
+            predictions=0,
+            time_started=str(timezone.now()),
+        )
+
+        def save_batch(future, batch_size, cache_keys):
+            nonlocal processed, failed
+            try:
+                predictions = future.result()
+            except Exception as exc:
+                logger.error(f'ML backend {self} failed to predict {batch_size} tasks: {exc}', exc_info=True)
+                predictions = []
+            saved = self._save_batch_predictions(predictions, batch_size) if predictions else None
+            if saved is not None:
+                instances.extend(saved)
+                self._store_cached_predictions(predictions, cache_keys)
+            else:
+                failed += batch_size
+            processed += batch_size
+            self._update_predict_progress(processed_tasks=processed, failed_tasks=failed, predictions=len(instances))
+
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ml-predict') as executor:
+                pending = {}
+                for batch_ids in batch(task_ids, settings.ML_PREDICT_BATCH_SIZE):
+                    # tasks are serialized in the main thread, only HTTP requests go to the pool
+                    tasks_ser = TaskSimpleSerializer(
+                        Task.objects.filter(id__in=batch_ids).order_by('id'), many=True
+                    ).data
+                    cache_keys = {}
+                    if settings.ML_PREDICTION_CACHE_ENABLED:
+                        tasks_ser, cache_keys, cached_predictions = self._get_cached_predictions(tasks_ser)
+                        cached_count = len(batch_ids) - len(tasks_ser)
+                        if cached_predictions:
+                            saved = self._save_batch_predictions(cached_predictions, cached_count)
+                            if saved is not None:
+                                instances.extend(saved)
+                            else:
+                                failed += cached_count
+                        processed += cached_count
+                        if not tasks_ser:
+                            self._update_predict_progress(
+                                processed_tasks=processed, failed_tasks=failed, predictions=len(instances)
+                            )
+                            continue
+
+                    future = executor.submit(self._get_predictions_from_ml_backend, tasks_ser, api=api)
+                    pending[future] = (len(tasks_ser), cache_keys)
+                    # keep a bounded number of batches in flight
+                    if len(pending) >= concurrency * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            save_batch(future, *pending.pop(future))
+                for future in as_completed(pending):
+                    save_batch(future, *pending[future])
+        except Exception:
+            self._update_predict_progress(status='failed')
+            raise
+        if settings.ML_PREDICTION_CACHE_ENABLED:
+            # evict once per run, batches only add entries
+            MLPredictionCache.evict(self)
+        self._update_predict_progress(status='completed', time_completed=str(timezone.now()))
         return instances
 
     def interactive_annotating(self, task, context=None, user=None):
@@ -377,6 +556,21 @@ class MLBackend(models.Model):
         tasks_ser = InteractiveAnnotatingDataSerializer(
             [task], many=True, expand=['drafts', 'predictions', 'annotations'], context=options
         ).data
+
+        cache_key = None
+        if settings.ML_PREDICTION_CACHE_ENABLED:
+            label_config = hashlib.sha256(self.project.label_config.encode()).hexdigest()
+            cache_key = MLPredictionCache.get_key(
+                tasks_ser, self.model_version, context=context, label_config=label_config
+            )
+            cached = MLPredictionCache.lookup(self, [cache_key])
+            if cache_key in cached:
+                # cached responses get the same checks as responses from ML backend, invalid ones are requested again
+                data, error = self._get_interactive_result(cached[cache_key])
+                if error is None:
+                    result['data'] = data
+                    return result
+
         ml_api_result = self.api.make_predictions(
             tasks=tasks_ser,
             project=self.project,
@@ -387,14 +581,29 @@ class MLBackend(models.Model):
             result['errors'] = [ml_api_result.error_message]
             return result
 
-        if not (isinstance(ml_api_result.response, dict) and 'results' in ml_api_result.response):
-            logger.info(f'ML backend returns an incorrect response, it must be a dict: {ml_api_result.response}')
-            result['errors'] = [
-                'Incorrect response from ML service: ' 'ML backend returns an incorrect response, it must be a dict.'
-            ]
+        data, error = self._get_interactive_result(ml_api_result.response)
+        if error is not None:
+            result['errors'] = [error]
             return result
+        result['data'] = data
+        if cache_key is not None:
+            MLPredictionCache.store(self, {cache_key: ml_api_result.response})
+            MLPredictionCache.evict(self)
+        return result
 
-        ml_results = ml_api_result.response.get(
+    @staticmethod
+    def _get_interactive_result(response):
+        """Get the first result from ML backend response for interactive annotating
+
+        :return: (result, error message)
+        """
+        if not (isinstance(response, dict) and 'results' in response):
+            logger.info(f'ML backend returns an incorrect response, it must be a dict: {response}')
+            return None, (
+                'Incorrect response from ML service: ' 'ML backend returns an incorrect response, it must be a dict.'
+            )
+
+        ml_results = response.get(
             'results',
             [
                 None,
@@ -402,12 +611,10 @@ class MLBackend(models.Model):
         )
         if not isinstance(ml_results, list) or len(ml_results) < 1:
             logger.warning(f'ML backend has to return list with 1 annotation but it returned: {type(ml_results)}')
-            result['errors'] = [
+            return None, (
                 'Incorrect response from ML service: ' 'ML backend has to return list with more than 1 result.'
-            ]
-            return result
-        result['data'] = ml_results[0]
-        return result
+            )
+        return ml_results[0], None
 
     @staticmethod
     def get_versions_(url, project, auth_method, **kwargs):
@@ -479,6 +686,73 @@ class MLBackendTrainJob(models.Model):
         return status['job_status'] in ('queued', 'started')
 
 
+class MLPredictionCache(models.Model):
+    """Responses of ML backend cached by task data, model version and context
+
+    Tasks with identical data get predictions from the cache without a request to ML backend.
+    Entries expire after ML_PREDICTION_CACHE_TTL seconds, least recently used entries are evicted
+    when an ML backend has more than ML_PREDICTION_CACHE_MAX_SIZE of them.
+    """
+
+    ml_backend = models.ForeignKey(MLBackend, related_name='prediction_cache', on_delete=models.CASCADE)
+    key = models.CharField(_('key'), max_length=64, help_text='Hash of task data, model version and context')
+    model_version = models.TextField(_('model version'), blank=True, null=True)
+    response = JSONField(_('response'), help_text='Cached ML backend response for the task')
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    last_used_at = models.DateTimeField(_('last used at'), default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = [('ml_backend', 'key')]
+
+    @staticmethod
+    def get_key(data, model_version, context=None, label_config=None):
+        normalized = json.dumps(
+            [data, model_version, context, label_config], sort_keys=True, separators=(',', ':'), default=str
+        )
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    @classmethod
+    def lookup(cls, ml_backend, keys):
+        """Get {key: response} for not expired keys and mark them as recently used"""
+        expired = timezone.now() - timedelta(seconds=settings.ML_PREDICTION_CACHE_TTL)
+        entries = dict(
+            cls.objects.filter(ml_backend=ml_backend, key__in=set(keys), created_at__gte=expired).values_list(
+                'key', 'response'
+            )
+        )
+        if entries:
+            cls.objects.filter(ml_backend=ml_backend, key__in=entries).update(last_used_at=timezone.now())
+        return entries
+
+    @classmethod
+    def store(cls, ml_backend, responses):
+        """Save {key: response}, entries over the size limit are removed by evict()"""
+        if not responses:
+            return
+        cls.objects.filter(ml_backend=ml_backend, key__in=responses).delete()
+        cls.objects.bulk_create(
+            [
+                cls(ml_backend=ml_backend, key=key, model_version=ml_backend.model_version, response=response)
+                for key, response in responses.items()
+            ],
+            batch_size=settings.BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def evict(cls, ml_backend):
+        """Delete expired and least recently used entries over ML_PREDICTION_CACHE_MAX_SIZE"""
+        expired = timezone.now() - timedelta(seconds=settings.ML_PREDICTION_CACHE_TTL)
+        cache = cls.objects.filter(ml_backend=ml_backend)
+        cache.filter(created_at__lt=expired).delete()
+        lru = cache.order_by('-last_used_at', '-id').values_list('id', flat=True)[
+            settings.ML_PREDICTION_CACHE_MAX_SIZE :
+        ]
+        lru_ids = list(lru[: settings.BATCH_SIZE * 10])
+        if lru_ids:
+            cls.objects.filter(id__in=lru_ids).delete()
+
+
 def _validate_ml_api_result(ml_api_result, tasks, curr_logger):
     if ml_api_result.is_error:
         curr_logger.info(ml_api_result.error_message)
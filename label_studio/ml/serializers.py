@@ -14,6 +14,7 @@ class MLBackendSerializer(serializers.ModelSerializer):
     readable_state = serializers.SerializerMethodField()
     basic_auth_pass = serializers.CharField(write_only=True, required=False, allow_null=True, allow_blank=True)
     basic_auth_pass_is_set = serializers.SerializerMethodField()
+    predict_progress = serializers.JSONField(read_only=True)
 
     def get_basic_auth_pass_is_set(self, obj):
         return bool(obj.basic_auth_pass)
@@ -107,6 +108,7 @@ class MLBackendSerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
             'auto_update',
+            'predict_progress',
             'project',
         ]
 
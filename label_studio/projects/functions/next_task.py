@@ -5,11 +5,27 @@ from typing import List, Tuple, Union
 from core.feature_flags import flag_set
 from core.utils.common import conditional_atomic, db_is_not_sqlite, load_func
 from django.conf import settings
-from django.db.models import BooleanField, Case, Count, Exists, F, Max, OuterRef, Q, QuerySet, Value, When
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    Exists,
+    F,
+    IntegerField,
+    Max,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
 from django.db.models.fields import DecimalField
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
 from projects.functions.stream_history import add_stream_history
 from projects.models import Project
-from tasks.models import Annotation, Task
+from tasks.models import Annotation, Task, TaskLock
 from users.models import User
 
 logger = logging.getLogger(__name__)
@@ -24,7 +40,107 @@ def get_next_task_logging_level(user: User) -> int:
     return level
 
 
-def _get_random_unlocked(task_query: QuerySet[Task], user: User, upper_limit=None) -> Union[Task, None]:
+def _uses_agreement_threshold(project: Project) -> bool:
+    lse_project = getattr(project, 'lse_project', None)
+    return bool(lse_project and lse_project.agreement_threshold is not None)
+
+
+def _filter_unlocked(tasks_query: QuerySet[Task], project: Project, user: User) -> QuerySet[Task]:
+    """Set-based version of Task.has_lock(): fold lock and annotation counts into the WHERE clause"""
+    # lock exclude query depends on the project skip queue settings only, not on the task itself
+    exclude_q = Task(project=project).get_lock_exclude_query(user)
+
+    num_locks = (
+        TaskLock.objects.filter(task=OuterRef('pk'), expire_at__gt=now())
+        .exclude(user=user)
+        .order_by()
+        .values('task')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    num_annotations = (
+        Annotation.objects.filter(task=OuterRef('pk'))
+        .exclude(exclude_q)
+        .order_by()
+        .values('task')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    tasks_query = tasks_query.annotate(
+        _num_locks=Coalesce(Subquery(num_locks, output_field=IntegerField()), 0),
+        _num_annotations=Coalesce(Subquery(num_annotations, output_field=IntegerField()), 0),
+    )
+    unlocked = Q(_num_locks__lt=F('overlap') - F('_num_annotations'))
+
+    if project.show_ground_truth_first and flag_set(
+        'fflag_feat_all_leap_1825_annotator_evaluation_short', user='auto'
+    ):
+        # in onboarding mode overlap is ignored for ground truth tasks
+        unlocked |= Q(Exists(Annotation.objects.filter(task=OuterRef('pk'), ground_truth=True)))
+
+    return tasks_query.filter(unlocked)
+
+
+def _select_for_update_first(task_ids: List[int], project: Project, user: User) -> Union[Task, None]:
+    """Lock the first task from task_ids skipping rows locked by concurrent transactions.
+
+    Locks and annotations are checked again once the row is locked: a concurrent transaction
+    could lock the task and commit between the candidates query and FOR UPDATE,
+    and PostgreSQL doesn't re-evaluate subqueries of a row locking query.
+    """
+    while task_ids:
+        if db_is_not_sqlite():
+            preserved_order = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(task_ids)])
+            task = (
+                Task.objects.select_for_update(skip_locked=True)
+                .filter(pk__in=task_ids)
+                .order_by(preserved_order)
+                .first()
+            )
+        else:
+            # sqlite locks the whole database during a write, there are no row locks to skip
+            task = Task.objects.filter(pk=task_ids[0]).first()
+        if task is None:
+            return None
+        if _filter_unlocked(Task.objects.filter(pk=task.pk), project, user).exists():
+            return task
+        logger.debug(f'Task with id {task.id} was locked by a concurrent transaction')
+        task_ids = task_ids[task_ids.index(task.pk) + 1 :]
+    return None
+
+
+def _get_random_unlocked(
+    task_query: QuerySet[Task], user: User, project: Project, upper_limit=None
+) -> Union[Task, None]:
+    if not settings.NEXT_TASK_SET_BASED_SELECTION or _uses_agreement_threshold(project):
+        return _get_random_unlocked_one_by_one(task_query, user)
+
+    task_ids = list(
+        _filter_unlocked(task_query, project, user)
+        .order_by('?')
+        .values_list('id', flat=True)[: settings.RANDOM_NEXT_TASK_SAMPLE_SIZE]
+    )
+    return _select_for_update_first(task_ids, project, user)
+
+
+def _get_first_unlocked(tasks_query: QuerySet[Task], user: User, project: Project) -> Union[Task, None]:
+    if not settings.NEXT_TASK_SET_BASED_SELECTION or _uses_agreement_threshold(project):
+        return _get_first_unlocked_one_by_one(tasks_query, user)
+
+    # candidates are read in batches to keep the data manager ordering,
+    # the next batch is used only when all tasks of the current one are locked by concurrent transactions
+    candidates = _filter_unlocked(tasks_query, project, user).values_list('id', flat=True)
+    batch_size = settings.NEXT_TASK_SELECTION_BATCH_SIZE
+    offset = 0
+    while True:
+        task_ids = list(candidates[offset : offset + batch_size])
+        task = _select_for_update_first(task_ids, project, user)
+        if task is not None or len(task_ids) < batch_size:
+            return task
+        offset += batch_size
+
+
+def _get_random_unlocked_one_by_one(task_query: QuerySet[Task], user: User) -> Union[Task, None]:
     for task in task_query.order_by('?').only('id')[: settings.RANDOM_NEXT_TASK_SAMPLE_SIZE]:
         try:
             task = Task.objects.select_for_update(skip_locked=True).get(pk=task.id)
@@ -34,7 +150,7 @@ def _get_random_unlocked(task_query: QuerySet[Task], user: User, upper_limit=Non
             logger.debug('Task with id {} locked'.format(task.id))
 
 
-def _get_first_unlocked(tasks_query: QuerySet[Task], user) -> Union[Task, None]:
+def _get_first_unlocked_one_by_one(tasks_query: QuerySet[Task], user) -> Union[Task, None]:
     # Skip tasks that are locked due to being taken by collaborators
     for task_id in tasks_query.values_list('id', flat=True):
         try:
@@ -54,8 +170,17 @@ def _try_ground_truth(tasks: QuerySet[Task], project: Project, user: User) -> Un
     )
     if not_solved_tasks_with_ground_truths.exists():
         if project.sampling == project.SEQUENCE:
-            return _get_first_unlocked(not_solved_tasks_with_ground_truths, user)
-        return _get_random_unlocked(not_solved_tasks_with_ground_truths, user)
+            return _get_first_unlocked(not_solved_tasks_with_ground_truths, user, project)
+        return _get_random_unlocked(not_solved_tasks_with_ground_truths, user, project)
+
+
+def _try_next_task_queue(tasks: QuerySet[Task], project: Project, user: User) -> Union[Task, None]:
+    """Returns task from the prefetched per-annotator queue if it is enabled"""
+    from projects.functions.next_task_queue import next_task_queue_enabled, pop_next_task
+
+    if next_task_queue_enabled(project):
+        logger.debug(f'User={user} tries prefetched queue')
+        return pop_next_task(user, project, tasks)
 
 
 def _try_tasks_with_overlap(tasks: QuerySet[Task]) -> Tuple[Union[Task, None], QuerySet[Task]]:
@@ -67,7 +192,7 @@ def _try_tasks_with_overlap(tasks: QuerySet[Task]) -> Tuple[Union[Task, None], Q
         return None, tasks.filter(overlap=1)
 
 
-def _try_breadth_first(tasks: QuerySet[Task], user: User) -> Union[Task, None]:
+def _try_breadth_first(tasks: QuerySet[Task], user: User, project: Project) -> Union[Task, None]:
     """Try to find tasks with maximum amount of annotations, since we are trying to label tasks as fast as possible"""
 
     tasks = tasks.annotate(annotations_count=Count('annotations', filter=~Q(annotations__completed_by=user)))
@@ -89,7 +214,30 @@ def _try_breadth_first(tasks: QuerySet[Task], user: User) -> Union[Task, None]:
     )
     if not_solved_tasks_labeling_with_max_annotations.exists():
         # try to complete tasks that are already in progress
-        return _get_random_unlocked(not_solved_tasks_labeling_with_max_annotations, user)
+        return _get_random_unlocked(not_solved_tasks_labeling_with_max_annotations, user, project)
+
+
+def _order_by_uncertainty(
+    task_with_current_predictions: QuerySet[Task], user_solved_tasks_array: List[int], prepared_tasks: QuerySet[Task]
+) -> QuerySet[Task]:
+    """Order tasks from the least solved by user cluster and with the lowest prediction score"""
+    # collect all clusters already solved by user, count number of solved task in them
+    user_solved_clusters = (
+        prepared_tasks.filter(pk__in=user_solved_tasks_array)
+        .annotate(cluster=Max('predictions__cluster'))
+        .values_list('cluster', flat=True)
+    )
+    user_solved_clusters = Counter(user_solved_clusters)
+    # order each task by the count of how many tasks solved in it's cluster
+    cluster_num_solved_map = [When(predictions__cluster=k, then=v) for k, v in user_solved_clusters.items()]
+
+    if cluster_num_solved_map:
+        task_with_current_predictions = task_with_current_predictions.annotate(
+            cluster_num_solved=Case(*cluster_num_solved_map, default=0, output_field=DecimalField())
+        )
+        # next task is chosen from least solved cluster and with lowest prediction score
+        return task_with_current_predictions.order_by('cluster_num_solved', 'predictions__score')
+    return task_with_current_predictions.order_by('predictions__score')
 
 
 def _try_uncertainty_sampling(
@@ -102,42 +250,30 @@ def _try_uncertainty_sampling(
     task_with_current_predictions = tasks.filter(predictions__model_version=project.model_version)
     if task_with_current_predictions.exists():
         logger.debug('Use uncertainty sampling')
-        # collect all clusters already solved by user, count number of solved task in them
-        user_solved_clusters = (
-            prepared_tasks.filter(pk__in=user_solved_tasks_array)
-            .annotate(cluster=Max('predictions__cluster'))
-            .values_list('cluster', flat=True)
-        )
-        user_solved_clusters = Counter(user_solved_clusters)
-        # order each task by the count of how many tasks solved in it's cluster
-        cluster_num_solved_map = [When(predictions__cluster=k, then=v) for k, v in user_solved_clusters.items()]
-
         # WARNING! this call doesn't work after consequent annotate
         num_tasks_with_current_predictions = task_with_current_predictions.count()
-        if cluster_num_solved_map:
-            task_with_current_predictions = task_with_current_predictions.annotate(
-                cluster_num_solved=Case(*cluster_num_solved_map, default=0, output_field=DecimalField())
-            )
-            # next task is chosen from least solved cluster and with lowest prediction score
-            possible_next_tasks = task_with_current_predictions.order_by('cluster_num_solved', 'predictions__score')
-        else:
-            possible_next_tasks = task_with_current_predictions.order_by('predictions__score')
+        possible_next_tasks = _order_by_uncertainty(
+            task_with_current_predictions, user_solved_tasks_array, prepared_tasks
+        )
 
         num_annotators = project.annotators().count()
         if num_annotators > 1 and num_tasks_with_current_predictions > 0:
             # try to randomize tasks to avoid concurrent labeling between several annotators
             next_task = _get_random_unlocked(
-                possible_next_tasks, user, upper_limit=min(num_annotators + 1, num_tasks_with_current_predictions)
+                possible_next_tasks,
+                user,
+                project,
+                upper_limit=min(num_annotators + 1, num_tasks_with_current_predictions),
             )
         else:
-            next_task = _get_first_unlocked(possible_next_tasks, user)
+            next_task = _get_first_unlocked(possible_next_tasks, user, project)
     else:
         # uncertainty sampling fallback: choose by random sampling
         logger.debug(
             f'Uncertainty sampling fallbacks to random sampling '
             f'(current project.model_version={str(project.model_version)})'
         )
-        next_task = _get_random_unlocked(tasks, user)
+        next_task = _get_random_unlocked(tasks, user, project)
     return next_task
 
 
@@ -234,9 +370,14 @@ def get_next_task_without_dm_queue(
             use_task_lock = False
             queue_info += (' & ' if queue_info else '') + 'Task lock'
 
+    if not next_task and not prioritized_low_agreement:
+        next_task = _try_next_task_queue(not_solved_tasks, project, user)
+        if next_task:
+            queue_info += (' & ' if queue_info else '') + 'Prefetched queue'
+
     if not next_task and prioritized_low_agreement:
         logger.debug(f'User={user} tries low agreement from prepared tasks')
-        next_task = _get_first_unlocked(not_solved_tasks, user)
+        next_task = _get_first_unlocked(not_solved_tasks, user, project)
         queue_info += (' & ' if queue_info else '') + 'Low agreement queue'
 
     if not next_task and project.show_ground_truth_first:
@@ -247,7 +388,7 @@ def get_next_task_without_dm_queue(
     if not next_task and project.maximum_annotations > 1:
         # if there are any tasks in progress (with maximum number of annotations), randomly sampling from them
         logger.debug(f'User={user} tries depth first from prepared tasks')
-        next_task = _try_breadth_first(not_solved_tasks, user)
+        next_task = _try_breadth_first(not_solved_tasks, user, project)
         if next_task:
             queue_info += (' & ' if queue_info else '') + 'Breadth first queue'
 
@@ -261,7 +402,7 @@ def skipped_queue(next_task, prepared_tasks, project, user, queue_info):
         if skipped_tasks.exists():
             preserved_order = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(skipped_tasks)])
             skipped_tasks = prepared_tasks.filter(pk__in=skipped_tasks).order_by(preserved_order)
-            next_task = _get_first_unlocked(skipped_tasks, user)
+            next_task = _get_first_unlocked(skipped_tasks, user, project)
             queue_info = 'Skipped queue'
 
     return next_task, queue_info
@@ -274,7 +415,7 @@ def postponed_queue(next_task, prepared_tasks, project, user, queue_info):
         if postponed_tasks.exists():
             preserved_order = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(postponed_tasks)])
             postponed_tasks = prepared_tasks.filter(pk__in=postponed_tasks).order_by(preserved_order)
-            next_task = _get_first_unlocked(postponed_tasks, user)
+            next_task = _get_first_unlocked(postponed_tasks, user, project)
             if next_task is not None:
                 next_task.allow_postpone = False
             queue_info = 'Postponed draft queue'
@@ -293,7 +434,7 @@ def get_task_from_qs_with_sampling(
     next_task = None
     if project.sampling == project.SEQUENCE:
         logger.debug(f'User={user} tries sequence sampling from prepared tasks')
-        next_task = _get_first_unlocked(not_solved_tasks, user)
+        next_task = _get_first_unlocked(not_solved_tasks, user, project)
         if next_task:
             queue_info += (' & ' if queue_info else '') + 'Sequence queue'
 
@@ -305,7 +446,7 @@ def get_task_from_qs_with_sampling(
 
     elif project.sampling == project.UNIFORM:
         logger.debug(f'User={user} tries random sampling from prepared tasks')
-        next_task = _get_random_unlocked(not_solved_tasks, user)
+        next_task = _get_random_unlocked(not_solved_tasks, user, project)
         if next_task:
             queue_info += (' & ' if queue_info else '') + 'Uniform random queue'
 
@@ -0,0 +1,171 @@
+"""Prefetched per-annotator label stream queue
+
+Next task candidates for (project, user) are calculated in a background job with the same sampling rules
+as get_next_task() and stored in a Redis list. The next task API pops ids from the list and verifies them
+with a single query, the queue is refilled when it drops below the watermark. All queues of a project are
+invalidated by bumping the project queue version when project settings change.
+"""
+import logging
+from typing import List, Union
+
+from core.feature_flags import flag_set
+from core.redis import (
+    redis_connected,
+    redis_delete,
+    redis_get,
+    redis_incr,
+    redis_llen,
+    redis_lpop,
+    redis_rpush,
+    redis_set,
+    start_job_async_or_sync,
+)
+from django.conf import settings
+from django.db.models import Count, Exists, Max, OuterRef, Q, QuerySet
+from projects.functions.next_task import (
+    _filter_unlocked,
+    _order_by_uncertainty,
+    _select_for_update_first,
+    _try_tasks_with_overlap,
+    _uses_agreement_threshold,
+    get_not_solved_tasks_qs,
+)
+from projects.models import Project
+from tasks.models import Annotation, Task
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def _version_key(project_id: int) -> str:
+    return f'next_task_queue:{project_id}:version'
+
+
+def _queue_key(project_id: int, user_id: int, version: int) -> str:
+    return f'next_task_queue:{project_id}:{version}:{user_id}'
+
+
+def _fill_lock_key(project_id: int, user_id: int, version: int) -> str:
+    return f'next_task_queue:{project_id}:{version}:{user_id}:fill'
+
+
+def get_queue_version(project_id: int) -> int:
+    version = redis_get(_version_key(project_id))
+    return int(version) if version else 0
+
+
+def next_task_queue_enabled(project: Project) -> bool:
+    return (
+        settings.NEXT_TASK_QUEUE_ENABLED
+        # agreement is recalculated after each annotation, so candidates can't be precomputed
+        and not _uses_agreement_threshold(project)
+        and redis_connected()
+    )
+
+
+def invalidate_next_task_queues(project_id: int) -> None:
+    """Drop queues of all annotators in the project, old lists are removed by TTL"""
+    redis_incr(_version_key(project_id))
+
+
+def _order_by_sampling(
+    tasks: QuerySet[Task], project: Project, user_solved_tasks_array: List[int], prepared_tasks: QuerySet[Task]
+) -> QuerySet[Task]:
+    if project.sampling == project.SEQUENCE:
+        return tasks
+
+    if project.sampling == project.UNCERTAINTY:
+        task_with_current_predictions = tasks.filter(predictions__model_version=project.model_version)
+        if task_with_current_predictions.exists():
+            if project.annotators().count() > 1:
+                # randomize tasks to avoid concurrent labeling between several annotators
+                return task_with_current_predictions.order_by('?')
+            return _order_by_uncertainty(task_with_current_predictions, user_solved_tasks_array, prepared_tasks)
+
+    return tasks.order_by('?')
+
+
+def _breadth_first_tasks(tasks: QuerySet[Task], user: User) -> Union[QuerySet[Task], None]:
+    tasks = tasks.annotate(annotations_count=Count('annotations', filter=~Q(annotations__completed_by=user)))
+    max_annotations_count = tasks.aggregate(Max('annotations_count'))['annotations_count__max']
+    if not max_annotations_count:
+        return None
+    return tasks.filter(annotations_count=max_annotations_count).order_by('?')
+
+
+def get_next_task_candidates(user: User, project: Project, size: int) -> List[int]:
+    """Collect ids of next tasks for the user in the order get_next_task() would return them"""
+    prepared_tasks = Task.objects.filter(project=project).order_by('id')
+    not_solved_tasks, user_solved_tasks_array, _, _ = get_not_solved_tasks_qs(user, project, prepared_tasks, None, '')
+    not_solved_tasks = _filter_unlocked(not_solved_tasks, project, user)
+
+    queues = []
+    if project.show_ground_truth_first:
+        ground_truth = Annotation.objects.filter(task=OuterRef('pk'), ground_truth=True)
+        ground_truth_tasks = not_solved_tasks.filter(Exists(ground_truth))
+        queues.append(ground_truth_tasks if project.sampling == project.SEQUENCE else ground_truth_tasks.order_by('?'))
+
+    if project.maximum_annotations > 1:
+        breadth_first_tasks = _breadth_first_tasks(not_solved_tasks, user)
+        if breadth_first_tasks is not None:
+            queues.append(breadth_first_tasks)
+
+    if flag_set('fflag_fix_back_lsdv_4523_show_overlap_first_order_27022023_short') and project.show_overlap_first:
+        _, tasks_with_overlap = _try_tasks_with_overlap(not_solved_tasks)
+        queues.append(_order_by_sampling(tasks_with_overlap, project, user_solved_tasks_array, prepared_tasks))
+
+    queues.append(_order_by_sampling(not_solved_tasks, project, user_solved_tasks_array, prepared_tasks))
+
+    task_ids, seen = [], set()
+    for queue in queues:
+        # ordering by prediction fields can return the same task several times
+        for task_id in queue.values_list('id', flat=True)[: size * 2]:
+            if task_id not in seen:
+                seen.add(task_id)
+                task_ids.append(task_id)
+            if len(task_ids) >= size:
+                return task_ids
+    return task_ids
+
+
+def fill_next_task_queue(project_id: int, user_id: int, version: int) -> None:
+    """Background job: recalculate next task candidates for the user"""
+    try:
+        project = Project.objects.get(pk=project_id)
+        user = User.objects.get(pk=user_id)
+        task_ids = get_next_task_candidates(user, project, settings.NEXT_TASK_QUEUE_SIZE)
+        redis_rpush(_queue_key(project_id, user_id, version), task_ids, ttl=settings.NEXT_TASK_QUEUE_TTL, replace=True)
+        logger.debug(f'Next task queue for project={project_id} user={user_id} is filled with {len(task_ids)} tasks')
+    except (Project.DoesNotExist, User.DoesNotExist):
+        logger.debug(f'Next task queue for project={project_id} user={user_id} is not filled: object not found')
+    finally:
+        redis_delete(_fill_lock_key(project_id, user_id, version))
+
+
+def schedule_next_task_queue_fill(project_id: int, user_id: int, version: int) -> None:
+    # only one fill job per queue at a time
+    if redis_set(_fill_lock_key(project_id, user_id, version), 1, ttl=settings.NEXT_TASK_QUEUE_TTL, nx=True):
+        start_job_async_or_sync(fill_next_task_queue, project_id, user_id, version, queue_name='low')
+
+
+def pop_next_task(user: User, project: Project, tasks: QuerySet[Task]) -> Union[Task, None]:
+    """Pop task ids from the user queue until one of them is still in tasks, unlocked and can be row-locked
+
+    :param tasks: not solved tasks of the user, popped ids are verified against them
+    """
+    version = get_queue_version(project.id)
+    key = _queue_key(project.id, user.id, version)
+
+    next_task = None
+    for _ in range(settings.NEXT_TASK_QUEUE_MAX_POPS):
+        task_id = redis_lpop(key)
+        if task_id is None:
+            break
+        task_ids = list(_filter_unlocked(tasks.filter(pk=int(task_id)), project, user).values_list('id', flat=True))
+        next_task = _select_for_update_first(task_ids, project, user)
+        if next_task is not None:
+            break
+
+    if redis_llen(key) < settings.NEXT_TASK_QUEUE_WATERMARK:
+        schedule_next_task_queue_fill(project.id, user.id, version)
+    return next_task
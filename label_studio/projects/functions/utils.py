@@ -1,6 +1,9 @@
 from logging import getLogger
 from typing import TYPE_CHECKING
 
+from core.redis import redis_connected, redis_delete, redis_set, start_job_async_or_sync
+from django.conf import settings
+from django.db import transaction
 from tasks.models import AnnotationDraft, Task
 
 logger = getLogger(__name__)
@@ -56,12 +59,11 @@ def recalculate_created_annotations_and_labels_from_scratch(
     summary.common_data_columns = []
     summary.update_data_columns(project.tasks.only('data'))
 
-    summary.created_labels, summary.created_annotations = {}, {}
+    summary.reset(tasks_data_based=False)
     summary.update_created_annotations_and_labels(project.annotations.all())
-
-    summary.created_labels_drafts = {}
     drafts = AnnotationDraft.objects.filter(task__project=project)
     summary.update_created_labels_drafts(drafts)
+    summary.compact()
 
     logger.info(
         f'Reset cache finished for project {project.id} and organization {organization_id}:\n'
@@ -69,3 +71,36 @@ def recalculate_created_annotations_and_labels_from_scratch(
         f'created_labels = {summary.created_labels}\n'
         f'created_labels_drafts = {summary.created_labels_drafts}'
     )
+
+
+def _summary_compaction_key(project_id):
+    return f'project-summary-compact:{project_id}'
+
+
+def compact_project_summary(project_id, compaction_key=None):
+    """Background job: fold pending counter deltas into the project summary"""
+    from projects.models import ProjectSummary
+
+    # deltas added from now on schedule the next job
+    if compaction_key:
+        redis_delete(compaction_key)
+    summary = ProjectSummary.objects.filter(project_id=project_id).first()
+    if summary is not None:
+        summary.compact()
+
+
+def schedule_project_summary_compaction(project_id):
+    """Fold summary deltas in the background, one pending job per project collects all deltas
+    added while it waits in the queue. Without redis deltas are folded immediately.
+    """
+    if not redis_connected():
+        compact_project_summary(project_id)
+        return
+
+    def enqueue():
+        compaction_key = _summary_compaction_key(project_id)
+        if redis_set(compaction_key, 1, ttl=settings.PROJECT_SUMMARY_COMPACTION_TTL, nx=True):
+            start_job_async_or_sync(compact_project_summary, project_id, compaction_key, queue_name='low')
+
+    # the job must see the deltas of the current transaction
+    transaction.on_commit(enqueue)
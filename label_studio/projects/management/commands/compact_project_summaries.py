@@ -0,0 +1,26 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from projects.functions.utils import compact_project_summary
+from projects.models import ProjectSummaryDelta
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Fold pending project summary counter deltas into project summaries, can be run periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-p', '--project', type=int, help='project id', default=None)
+
+    def handle(self, *args, **options):
+        deltas = ProjectSummaryDelta.objects.all()
+        if options['project'] is not None:
+            deltas = deltas.filter(project_id=options['project'])
+
+        project_ids = deltas.order_by('project_id').values_list('project_id', flat=True).distinct()
+        for project_id in project_ids:
+            compact_project_summary(project_id)
+            logger.debug(f'Project {project_id} summary compacted.')
+
+        self.stdout.write(f'{len(project_ids)} project summaries compacted')
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-18 00:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0028_auto_20241107_1031'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectSummaryDelta',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('created_annotations', 'Created annotations'), ('created_labels', 'Created labels'), ('created_labels_drafts', 'Created labels in drafts')], max_length=32, verbose_name='field')),
+                ('key', models.TextField(verbose_name='key')),
+                ('label', models.TextField(blank=True, default='', verbose_name='label')),
+                ('delta', models.IntegerField(verbose_name='delta')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_deltas', to='projects.project')),
+            ],
+        ),
+    ]
@@ -2,6 +2,7 @@
 """
 import json
 import logging
+from collections import Counter
 from typing import Any, Mapping, Optional
 
 from annoying.fields import AutoOneToOneField
@@ -539,6 +540,8 @@ class Project(ProjectMixin, models.Model):
         with transaction.atomic():
             # Lock summary for update to avoid race conditions
             summary = ProjectSummary.objects.select_for_update().get(project=self)
+            # validation needs exact counters
+            summary.compact()
 
             if self.num_tasks == 0:
                 logger.debug(f'Project {self} has no tasks: nothing to validate here. Ensure project summary is empty')
@@ -578,7 +581,7 @@ class Project(ProjectMixin, models.Model):
         if not annotations_from_config:
             logger.debug('Annotation schema is not found in config')
             return
-        annotations_from_data = set(self.summary.created_annotations)
+        annotations_from_data = set(summary.created_annotations)
         if annotations_from_data and not annotations_from_data.issubset(annotations_from_config):
             different_annotations = list(annotations_from_data.difference(annotations_from_config))
             diff_str = []
@@ -592,7 +595,7 @@ class Project(ProjectMixin, models.Model):
                     or t not in get_all_types(config_string)
                 ):
                     diff_str.append(
-                        f'{self.summary.created_annotations[ann_tuple]} '
+                        f'{summary.created_annotations[ann_tuple]} '
                         f'with from_name={from_name}, to_name={to_name}, type={t}'
                     )
             if len(diff_str) > 0:
@@ -603,7 +606,7 @@ class Project(ProjectMixin, models.Model):
 
         # validate labels consistency
         labels_from_config, dynamic_label_from_config = get_all_labels(config_string)
-        created_labels = merge_labels_counters(self.summary.created_labels, self.summary.created_labels_drafts)
+        created_labels = merge_labels_counters(summary.created_labels, summary.created_labels_drafts)
 
         def display_count(count: int, type: str) -> Optional[str]:
             """Helper for displaying pluralized sources of validation errors,
@@ -645,8 +648,8 @@ class Project(ProjectMixin, models.Model):
                 different_labels = list(set(labels_from_data).difference(labels_from_config_by_tag))
                 diff_str = ''
                 for label in different_labels:
-                    annotation_label_count = self.summary.created_labels.get(control_tag_from_data, {}).get(label, 0)
-                    draft_label_count = self.summary.created_labels_drafts.get(control_tag_from_data, {}).get(label, 0)
+                    annotation_label_count = summary.created_labels.get(control_tag_from_data, {}).get(label, 0)
+                    draft_label_count = summary.created_labels_drafts.get(control_tag_from_data, {}).get(label, 0)
                     annotation_display_count = display_count(annotation_label_count, 'annotation')
                     draft_display_count = display_count(draft_label_count, 'draft')
 
@@ -792,6 +795,11 @@ class Project(ProjectMixin, models.Model):
             self.__maximum_annotations = self.maximum_annotations
             self.__overlap_cohort_percentage = self.overlap_cohort_percentage
 
+        if settings.NEXT_TASK_QUEUE_ENABLED and exists:
+            from projects.functions.next_task_queue import invalidate_next_task_queues
+
+            invalidate_next_task_queues(self.id)
+
         if self.__skip_queue != self.skip_queue:
             bulk_update_stats_project_tasks(
                 self.tasks.filter(Q(annotations__isnull=False) & Q(annotations__ground_truth=False))
@@ -1019,6 +1027,12 @@ class Project(ProjectMixin, models.Model):
 
         return storage_objects
 
+    @cached_property
+    def import_storage_index(self):
+        from io_storages.functions import StorageIndex
+
+        return StorageIndex(self.get_all_import_storage_objects)
+
     @cached_property
     def get_all_export_storage_objects(self):
         from io_storages.models import get_storage_classes
@@ -1045,14 +1059,13 @@ class Project(ProjectMixin, models.Model):
         return values
 
     def resolve_storage_uri(self, url: str) -> Optional[Mapping[str, Any]]:
-        from io_storages.functions import get_storage_by_url
+        from io_storages.presign_cache import get_presigned_url
 
-        storage_objects = self.get_all_import_storage_objects
-        storage = get_storage_by_url(url, storage_objects)
+        storage = self.import_storage_index.get(url)
 
         if storage:
             return {
-                'url': storage.generate_http_url(url),
+                'url': get_presigned_url(storage, url),
                 'presign_ttl': storage.presign_ttl,
             }
 
@@ -1073,8 +1086,12 @@ class Project(ProjectMixin, models.Model):
                 # If counters are updated, is_labeled must be updated as well. Hence, if either fails, we
                 # will roll back.
                 queryset = make_queryset_from_iterable(task_ids_slice)
-                num_tasks_updated += update_tasks_counters(queryset, from_scratch)
-                bulk_update_stats_project_tasks(queryset, self)
+                if from_scratch and self._can_use_overlap():
+                    # is_labeled is calculated from the new counters in the same statement
+                    num_tasks_updated += update_tasks_counters(queryset, from_scratch, project=self)
+                else:
+                    num_tasks_updated += update_tasks_counters(queryset, from_scratch)
+                    bulk_update_stats_project_tasks(queryset, self)
             page_idx += 1
         return num_tasks_updated
 
@@ -1226,6 +1243,7 @@ class ProjectSummary(models.Model):
         self.created_labels = {}
         self.created_labels_drafts = {}
         self.save()
+        ProjectSummaryDelta.objects.filter(project_id=self.project_id).delete()
 
     def update_data_columns(self, tasks):
         common_data_columns = set()
@@ -1314,9 +1332,9 @@ class ProjectSummary(models.Model):
                 labels.append(str(label))
         return labels
 
-    def update_created_annotations_and_labels(self, annotations):
-        created_annotations = dict(self.created_annotations)
-        labels = dict(self.created_labels)
+    def _get_annotations_deltas(self, annotations, sign=1):
+        """Count annotation types and labels of annotations as {(field, key, label): delta}"""
+        deltas = Counter()
         for annotation in annotations:
             results = get_attr_or_item(annotation, 'result') or []
             if not isinstance(results, list):
@@ -1327,64 +1345,16 @@ class ProjectSummary(models.Model):
                 key = self._get_annotation_key(result)
                 if not key:
                     continue
-                created_annotations[key] = created_annotations.get(key, 0) + 1
-                from_name = result['from_name']
+                deltas[(ProjectSummaryDelta.Field.CREATED_ANNOTATIONS, key, '')] += sign
 
                 # aggregate labels
-                if from_name not in self.created_labels:
-                    labels[from_name] = dict()
-
                 for label in self._get_labels(result):
-                    labels[from_name][label] = labels[from_name].get(label, 0) + 1
-
-        logger.debug(f'summary.created_annotations = {created_annotations}')
-        logger.debug(f'summary.created_labels = {labels}')
-        self.created_annotations = created_annotations
-        self.created_labels = labels
-        self.save(update_fields=['created_annotations', 'created_labels'])
+                    deltas[(ProjectSummaryDelta.Field.CREATED_LABELS, result['from_name'], label)] += sign
+        return deltas
 
-    def remove_created_annotations_and_labels(self, annotations):
-        # we are going to remove all annotations, so we'll reset the corresponding fields on the summary
-        remove_all_annotations = self.project.annotations.count() == len(annotations)
-        created_annotations, created_labels = (
-            ({}, {}) if remove_all_annotations else (dict(self.created_annotations), dict(self.created_labels))
-        )
-
-        if not remove_all_annotations:
-            for annotation in annotations:
-                results = get_attr_or_item(annotation, 'result') or []
-                if not isinstance(results, list):
-                    continue
-
-                for result in results:
-                    # reduce annotation counters
-                    key = self._get_annotation_key(result)
-                    if key in created_annotations:
-                        created_annotations[key] -= 1
-                        if created_annotations[key] == 0:
-                            created_annotations.pop(key)
-
-                    # reduce labels counters
-                    from_name = result.get('from_name', None)
-                    if from_name not in created_labels:
-                        continue
-                    for label in self._get_labels(result):
-                        label = str(label)
-                        if label in created_labels[from_name]:
-                            created_labels[from_name][label] -= 1
-                            if created_labels[from_name][label] == 0:
-                                created_labels[from_name].pop(label)
-                    if not created_labels[from_name]:
-                        created_labels.pop(from_name)
-
-        logger.debug(f'summary.created_annotations = {created_annotations}')
-        logger.debug(f'summary.created_labels = {created_labels}')
-        self.created_annotations = created_annotations
-        self.created_labels = created_labels
-        self.save(update_fields=['created_annotations', 'created_labels'])
-
-    def update_created_labels_drafts(self, drafts):
-        labels = dict(self.created_labels_drafts)
+    def _get_drafts_deltas(self, drafts, sign=1):
+        """Count labels of drafts as {(field, key, label): delta}"""
+        deltas = Counter()
         for draft in drafts:
             results = get_attr_or_item(draft, 'result') or []
             if not isinstance(results, list):
@@ -1393,46 +1363,149 @@ class ProjectSummary(models.Model):
             for result in results:
                 if 'from_name' not in result:
                     continue
-                from_name = result['from_name']
+                for label in self._get_labels(result):
+                    deltas[(ProjectSummaryDelta.Field.CREATED_LABELS_DRAFTS, result['from_name'], label)] += sign
+        return deltas
 
-                # aggregate labels
-                if from_name not in self.created_labels_drafts:
-                    labels[from_name] = dict()
+    @staticmethod
+    def _apply_deltas(counters, deltas):
+        """Apply {(field, key, label): delta} to the dict of summary counters, zero counters are removed"""
+        for (field, key, label), delta in deltas.items():
+            if not delta:
+                continue
+            if field == ProjectSummaryDelta.Field.CREATED_ANNOTATIONS:
+                value = counters[field].get(key, 0) + delta
+                if value > 0:
+                    counters[field][key] = value
+                else:
+                    counters[field].pop(key, None)
+                continue
 
-                for label in self._get_labels(result):
-                    labels[from_name][label] = labels[from_name].get(label, 0) + 1
+            labels = dict(counters[field].get(key, {}))
+            value = labels.get(label, 0) + delta
+            if value > 0:
+                labels[label] = value
+            else:
+                labels.pop(label, None)
+            if labels:
+                counters[field][key] = labels
+            else:
+                counters[field].pop(key, None)
+
+    def _get_pending_deltas(self, max_id=None):
+        deltas = ProjectSummaryDelta.objects.filter(project_id=self.project_id)
+        if max_id is not None:
+            deltas = deltas.filter(id__lte=max_id)
+        rows = deltas.values('field', 'key', 'label').annotate(total=Sum('delta')).order_by()
+        return {(row['field'], row['key'], row['label']): row['total'] for row in rows}
+
+    def add_deltas(self, deltas):
+        """Append counter changes to the delta log, the summary row is not locked here.
+        Deltas are folded into the summary by the compaction job.
+        """
+        from projects.functions.utils import schedule_project_summary_compaction
 
-        logger.debug(f'update summary.created_labels_drafts = {labels}')
-        self.created_labels_drafts = labels
-        self.save(update_fields=['created_labels_drafts'])
+        rows = [
+            ProjectSummaryDelta(project_id=self.project_id, field=field, key=key, label=label, delta=delta)
+            for (field, key, label), delta in deltas.items()
+            if delta
+        ]
+        if not rows:
+            return
+        ProjectSummaryDelta.objects.bulk_create(rows, batch_size=settings.BATCH_SIZE)
+        schedule_project_summary_compaction(self.project_id)
+
+    def compact(self):
+        """Fold pending counter deltas into the summary
+        :return: Number of folded delta log records
+        """
+        with transaction.atomic():
+            summary = ProjectSummary.objects.select_for_update().get(project_id=self.project_id)
+            pending = ProjectSummaryDelta.objects.filter(project_id=self.project_id)
+            max_id = pending.aggregate(max_id=Max('id'))['max_id']
+            if max_id is None:
+                return 0
+
+            counters = {field: dict(getattr(summary, field) or {}) for field in ProjectSummaryDelta.Field.values}
+            self._apply_deltas(counters, self._get_pending_deltas(max_id))
+            for field, value in counters.items():
+                setattr(summary, field, value)
+                setattr(self, field, value)
+            summary.save(update_fields=list(counters))
+            folded, _ = pending.filter(id__lte=max_id).delete()
+        logger.debug(f'summary project_id={self.project_id}: {folded} deltas folded')
+        return folded
+
+    def get_counters(self):
+        """Merged view of created_annotations, created_labels and created_labels_drafts with pending deltas"""
+        counters = {field: dict(getattr(self, field) or {}) for field in ProjectSummaryDelta.Field.values}
+        self._apply_deltas(counters, self._get_pending_deltas())
+        return counters
+
+    def _reset_counters(self, fields):
+        with transaction.atomic():
+            ProjectSummary.objects.select_for_update().get(project_id=self.project_id)
+            ProjectSummaryDelta.objects.filter(project_id=self.project_id, field__in=fields).delete()
+            for field in fields:
+                setattr(self, field, {})
+            self.save(update_fields=fields)
+
+    @staticmethod
+    def _is_removing_all(queryset, removed):
+        """Check if no other objects are left except the removed ones (deleted already or not).
+        EXISTS stops at the first remaining object, so it's bounded by the number of removed objects
+        instead of the project size like COUNT.
+        """
+        if isinstance(removed, models.QuerySet):
+            removed_ids = removed.values('id')
+        else:
+            removed_ids = [get_attr_or_item(obj, 'id') for obj in removed]
+        return not queryset.exclude(id__in=removed_ids).exists()
+
+    def update_created_annotations_and_labels(self, annotations):
+        self.add_deltas(self._get_annotations_deltas(annotations))
+
+    def remove_created_annotations_and_labels(self, annotations):
+        # we are going to remove all annotations, so we'll reset the corresponding fields on the summary
+        remove_all_annotations = self._is_removing_all(self.project.annotations.all(), annotations)
+        if remove_all_annotations:
+            self._reset_counters(['created_annotations', 'created_labels'])
+        else:
+            self.add_deltas(self._get_annotations_deltas(annotations, sign=-1))
+
+    def update_created_labels_drafts(self, drafts):
+        self.add_deltas(self._get_drafts_deltas(drafts))
 
     def remove_created_drafts_and_labels(self, drafts):
         # we are going to remove all drafts, so we'll reset the corresponding field on the summary
-        remove_all_drafts = AnnotationDraft.objects.filter(task__project=self.project).count() == len(drafts)
-        labels = {} if remove_all_drafts else dict(self.created_labels_drafts)
+        remove_all_drafts = self._is_removing_all(
+            AnnotationDraft.objects.filter(task__project_id=self.project_id), drafts
+        )
+        if remove_all_drafts:
+            self._reset_counters(['created_labels_drafts'])
+        else:
+            self.add_deltas(self._get_drafts_deltas(drafts, sign=-1))
 
-        if not remove_all_drafts:
-            for draft in drafts:
-                results = get_attr_or_item(draft, 'result') or []
-                if not isinstance(results, list):
-                    continue
 
-                for result in results:
-                    # reduce labels counters
-                    from_name = result.get('from_name', None)
-                    if from_name not in labels:
-                        continue
-                    for label in self._get_labels(result):
-                        label = str(label)
-                        if label in labels[from_name]:
-                            labels[from_name][label] -= 1
-                            if labels[from_name][label] == 0:
-                                labels[from_name].pop(label)
-                    if not labels[from_name]:
-                        labels.pop(from_name)
-        logger.debug(f'summary.created_labels_drafts = {labels}')
-        self.created_labels_drafts = labels
-        self.save(update_fields=['created_labels_drafts'])
+class ProjectSummaryDelta(models.Model):
+    """Append-only log of ProjectSummary counter changes.
+
+    Annotation and draft signals only insert rows here, so concurrent annotators don't wait for
+    the summary row lock and don't overwrite each other's changes. ProjectSummary.compact()
+    folds the log into the summary JSON fields.
+    """
+
+    class Field(models.TextChoices):
+        CREATED_ANNOTATIONS = 'created_annotations', _('Created annotations')
+        CREATED_LABELS = 'created_labels', _('Created labels')
+        CREATED_LABELS_DRAFTS = 'created_labels_drafts', _('Created labels in drafts')
+
+    project = models.ForeignKey(Project, related_name='summary_deltas', on_delete=models.CASCADE)
+    field = models.CharField(_('field'), max_length=32, choices=Field.choices)
+    # annotation tuple for created_annotations, from_name for labels
+    key = models.TextField(_('key'))
+    label = models.TextField(_('label'), blank=True, default='')
+    delta = models.IntegerField(_('delta'))
 
 
 class ProjectImport(models.Model):
@@ -342,6 +342,12 @@ class ProjectSummarySerializer(serializers.ModelSerializer):
         model = ProjectSummary
         fields = '__all__'
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # include counter deltas which are not folded into the summary yet
+        data.update(instance.get_counters())
+        return data
+
 
 class ProjectImportSerializer(serializers.ModelSerializer):
     class Meta:
@@ -4,7 +4,6 @@ import os
 import shutil
 import sys
 
-from core.bulk_update_utils import bulk_update
 from core.models import AsyncMigrationStatus
 from core.redis import start_job_async_or_sync
 from core.utils.common import batch
@@ -13,8 +12,10 @@ from data_export.models import DataExport
 from data_export.serializers import ExportDataSerializer
 from data_manager.managers import TaskQuerySet
 from django.conf import settings
-from django.db import transaction
-from django.db.models import Count, Q
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
 from organizations.models import Organization
 from projects.models import Project
 from tasks.models import Annotation, Prediction, Task
@@ -114,14 +115,14 @@ def export_project(project_id, export_format, path, serializer_context=None):
         serializer_context = json.loads(serializer_context)
     serializer_options = ExportMixin._get_export_serializer_option(serializer_context)
 
-    # export cycle
-    tasks = []
-    for _task_ids in batch(task_ids, 1000):
-        tasks += ExportDataSerializer(_task_ids, many=True, **serializer_options).data
+    # export cycle, tasks are serialized by batches while they are written to the export file
+    def iter_tasks():
+        for _task_ids in batch(task_ids, 1000):
+            yield from ExportDataSerializer(_task_ids, many=True, **serializer_options).data
 
     # convert to output format
     export_file, _, filename = DataExport.generate_export_file(
-        project, tasks, export_format, settings.CONVERTER_DOWNLOAD_RESOURCES, {}
+        project, iter_tasks(), export_format, settings.CONVERTER_DOWNLOAD_RESOURCES, {}
     )
 
     # write to file
@@ -174,21 +175,110 @@ def fill_predictions_project(migration_name):
     logger.info('Finished filling project field for Prediction model')
 
 
-def update_tasks_counters(queryset, from_scratch=True):
+def _count_by_task(queryset):
+    """Correlated COUNT of the related objects for the outer task, 0 if there are none"""
+    counts = queryset.filter(task_id=OuterRef('id')).order_by().values('task_id').annotate(count=Count('id'))
+    return Coalesce(Subquery(counts.values('count')), 0, output_field=IntegerField())
+
+
+def _update_tasks_counters_postgresql(queryset, project=None):
+    """Recalculate counters of all tasks from the queryset with a single UPDATE ... FROM statement,
+    annotations and predictions are grouped by task on the database side
+    """
+    quote = connection.ops.quote_name
+    task_table = quote(Task._meta.db_table)
+    ids_sql, ids_params = queryset.order_by().values('id').query.sql_with_params()
+
+    new_values = ['c.total_annotations', 'c.cancelled_annotations', 'c.total_predictions']
+    fields = ['total_annotations', 'cancelled_annotations', 'total_predictions']
+    if project is not None:
+        completed = 'c.total_annotations'
+        if project.skip_queue == project.SkipQueue.IGNORE_SKIPPED:
+            completed += ' + c.cancelled_annotations'
+        new_values.append(f'({completed}) >= {task_table}.overlap')
+        fields.append('is_labeled')
+
+    sql = f"""
+        WITH ids AS ({ids_sql})
+        UPDATE {task_table}
+        SET {', '.join(f'{field} = {value}' for field, value in zip(fields, new_values))}
+        FROM (
+            SELECT ids.id,
+                   COALESCE(a.total_annotations, 0) AS total_annotations,
+                   COALESCE(a.cancelled_annotations, 0) AS cancelled_annotations,
+                   COALESCE(p.total_predictions, 0) AS total_predictions
+            FROM ids
+            LEFT JOIN (
+                SELECT task_id,
+                       COUNT(*) FILTER (WHERE NOT was_cancelled) AS total_annotations,
+                       COUNT(*) FILTER (WHERE was_cancelled) AS cancelled_annotations
+                FROM {quote(Annotation._meta.db_table)}
+                WHERE task_id IN (SELECT id FROM ids)
+                GROUP BY task_id
+            ) a ON a.task_id = ids.id
+            LEFT JOIN (
+                SELECT task_id, COUNT(*) AS total_predictions
+                FROM {quote(Prediction._meta.db_table)}
+                WHERE task_id IN (SELECT id FROM ids)
+                GROUP BY task_id
+            ) p ON p.task_id = ids.id
+        ) c
+        WHERE {task_table}.id = c.id
+          AND ({', '.join(f'{task_table}.{field}' for field in fields)}) IS DISTINCT FROM ({', '.join(new_values)})
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ids_params)
+        return cursor.rowcount
+
+
+def _update_tasks_counters_chunked(queryset, project=None):
+    """Recalculate counters with correlated subqueries in UPDATE statements,
+    tasks are split into id ranges of UPDATE_TASKS_COUNTERS_CHUNK_SIZE tasks
+    """
+    values = {
+        'total_annotations': _count_by_task(Annotation.objects.filter(was_cancelled=False)),
+        'cancelled_annotations': _count_by_task(Annotation.objects.filter(was_cancelled=True)),
+        'total_predictions': _count_by_task(Prediction.objects.all()),
+    }
+    if project is not None:
+        completed = values['total_annotations']
+        if project.skip_queue == project.SkipQueue.IGNORE_SKIPPED:
+            completed = completed + values['cancelled_annotations']
+        values['is_labeled'] = ExpressionWrapper(
+            Q(GreaterThanOrEqual(completed, F('overlap'))), output_field=BooleanField()
+        )
+
+    chunk_size = settings.UPDATE_TASKS_COUNTERS_CHUNK_SIZE
+    ids = queryset.order_by('id').values_list('id', flat=True)
+    updated = 0
+    start = ids.first()
+    while start is not None:
+        end = ids.filter(id__gte=start)[chunk_size : chunk_size + 1].first()
+        chunk = ids.filter(id__gte=start) if end is None else ids.filter(id__gte=start, id__lt=end)
+        # skip tasks with up-to-date counters to avoid rewriting unchanged rows
+        changed = (
+            Task.objects.filter(id__in=chunk)
+            .annotate(**{f'new_{field}': value for field, value in values.items()})
+            .exclude(**{field: F(f'new_{field}') for field in values})
+        )
+        updated += Task.objects.filter(id__in=changed.values('id')).update(**values)
+        start = end
+    return updated
+
+
+def update_tasks_counters(queryset, from_scratch=True, project=None):
     """
     Update tasks counters for the passed queryset of Tasks
     :param queryset: Tasks to update queryset
     :param from_scratch: Skip calculated tasks
-    :return: Count of updated tasks
+    :param project: If passed and the project uses overlap, is_labeled is calculated in the same statement
+    :return: Count of tasks with changed counters
     """
-    objs = []
-
-    total_annotations = Count('annotations', distinct=True, filter=Q(annotations__was_cancelled=False))
-    cancelled_annotations = Count('annotations', distinct=True, filter=Q(annotations__was_cancelled=True))
-    total_predictions = Count('predictions', distinct=True)
     # construct QuerySet in case of list of Tasks
-    if isinstance(queryset, list) and len(queryset) > 0 and isinstance(queryset[0], Task):
-        queryset = Task.objects.filter(id__in=[task.id for task in queryset])
+    if isinstance(queryset, list):
+        if len(queryset) == 0:
+            return 0
+        queryset = Task.objects.filter(id__in=[task.id if isinstance(task, Task) else task for task in queryset])
     # construct QuerySet in case annotated queryset
     if isinstance(queryset, TaskQuerySet) and queryset.exists() and isinstance(queryset[0], int):
         queryset = Task.objects.filter(id__in=queryset)
@@ -197,29 +287,10 @@ def update_tasks_counters(queryset, from_scratch=True):
         queryset = queryset.exclude(
             Q(total_annotations__gt=0) | Q(cancelled_annotations__gt=0) | Q(total_predictions__gt=0)
         )
+    if project is not None and not project._can_use_overlap():
+        project = None
 
-    # filter our tasks with 0 annotations and 0 predictions and update them with 0
-    queryset.filter(annotations__isnull=True, predictions__isnull=True).update(
-        total_annotations=0, cancelled_annotations=0, total_predictions=0
-    )
-
-    # filter our tasks with 0 annotations and 0 predictions
-    queryset = queryset.filter(Q(annotations__isnull=False) | Q(predictions__isnull=False))
-    queryset = queryset.annotate(
-        new_total_annotations=total_annotations,
-        new_cancelled_annotations=cancelled_annotations,
-        new_total_predictions=total_predictions,
-    )
-
-    for task in queryset.only('id', 'total_annotations', 'cancelled_annotations', 'total_predictions'):
-        task.total_annotations = task.new_total_annotations
-        task.cancelled_annotations = task.new_cancelled_annotations
-        task.total_predictions = task.new_total_predictions
-        objs.append(task)
     with transaction.atomic():
-        bulk_update(
-            objs,
-            update_fields=['total_annotations', 'cancelled_annotations', 'total_predictions'],
-            batch_size=settings.BATCH_SIZE,
-        )
-    return len(objs)
+        if settings.DJANGO_DB == settings.DJANGO_DB_POSTGRESQL:
+            return _update_tasks_counters_postgresql(queryset, project)
+        return _update_tasks_counters_chunked(queryset, project)
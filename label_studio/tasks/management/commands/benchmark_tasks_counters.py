@@ -0,0 +1,124 @@
+import logging
+import random
+import time
+
+from core.bulk_update_utils import bulk_update
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+from organizations.models import Organization
+from projects.models import Project
+from tasks.functions import _update_tasks_counters_chunked, _update_tasks_counters_postgresql
+from tasks.models import Annotation, Prediction, Task, bulk_update_stats_project_tasks
+
+logger = logging.getLogger(__name__)
+
+
+def update_tasks_counters_legacy(queryset, project):
+    """Previous implementation: counters are loaded into python and written back with bulk_update,
+    is_labeled is recalculated with a separate query
+    """
+    objs = []
+    queryset.filter(annotations__isnull=True, predictions__isnull=True).update(
+        total_annotations=0, cancelled_annotations=0, total_predictions=0
+    )
+    queryset = queryset.filter(Q(annotations__isnull=False) | Q(predictions__isnull=False)).annotate(
+        new_total_annotations=Count('annotations', distinct=True, filter=Q(annotations__was_cancelled=False)),
+        new_cancelled_annotations=Count('annotations', distinct=True, filter=Q(annotations__was_cancelled=True)),
+        new_total_predictions=Count('predictions', distinct=True),
+    )
+    for task in queryset.only('id', 'total_annotations', 'cancelled_annotations', 'total_predictions'):
+        task.total_annotations = task.new_total_annotations
+        task.cancelled_annotations = task.new_cancelled_annotations
+        task.total_predictions = task.new_total_predictions
+        objs.append(task)
+    with transaction.atomic():
+        bulk_update(
+            objs,
+            update_fields=['total_annotations', 'cancelled_annotations', 'total_predictions'],
+            batch_size=settings.BATCH_SIZE,
+        )
+        bulk_update_stats_project_tasks(Task.objects.filter(project=project), project)
+    return len(objs)
+
+
+def create_synthetic_project(organization, num_tasks, max_annotations, max_predictions):
+    """Project with random numbers of annotations & predictions per task, signals are bypassed
+    so all task counters are left at zero
+    """
+    user = organization.created_by
+    project = Project.objects.create(
+        title=f'Tasks counters benchmark {num_tasks}', created_by=user, organization=organization
+    )
+    for offset in range(0, num_tasks, settings.BATCH_SIZE):
+        size = min(settings.BATCH_SIZE, num_tasks - offset)
+        tasks = Task.objects.bulk_create(
+            [Task(project=project, data={'text': f'task {offset + i}'}) for i in range(size)]
+        )
+        annotations, predictions = [], []
+        for task in tasks:
+            for _ in range(random.randint(0, max_annotations)):
+                annotations.append(
+                    Annotation(
+                        task=task,
+                        project=project,
+                        completed_by=user,
+                        result=[],
+                        was_cancelled=random.random() < 0.1,
+                    )
+                )
+            for _ in range(random.randint(0, max_predictions)):
+                predictions.append(Prediction(task=task, project=project, result=[]))
+        Annotation.objects.bulk_create(annotations, batch_size=settings.BATCH_SIZE)
+        Prediction.objects.bulk_create(predictions, batch_size=settings.BATCH_SIZE)
+    return project
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the previous and the set-based update of task counters & is_labeled on a synthetic project. '
+        'The project is created in the organization and deleted after the run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('organization', type=int, help='organization id')
+        parser.add_argument('-t', '--tasks', type=int, help='number of tasks', default=10000)
+        parser.add_argument('-a', '--annotations', type=int, help='max annotations per task', default=3)
+        parser.add_argument('-p', '--predictions', type=int, help='max predictions per task', default=2)
+        parser.add_argument('-r', '--repeat', type=int, help='number of runs of each path', default=1)
+        parser.add_argument('--keep', action='store_true', default=False, help='keep the synthetic project')
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.get(id=options['organization'])
+        start = time.perf_counter()
+        project = create_synthetic_project(
+            organization, options['tasks'], options['annotations'], options['predictions']
+        )
+        self.stdout.write(
+            f'Project {project.id} with {options["tasks"]} tasks created in {time.perf_counter() - start:.2f} sec'
+        )
+
+        tasks = Task.objects.filter(project=project)
+        paths = [
+            ('legacy', lambda: update_tasks_counters_legacy(tasks, project)),
+            ('chunked', lambda: _update_tasks_counters_chunked(tasks, project)),
+        ]
+        if settings.DJANGO_DB == settings.DJANGO_DB_POSTGRESQL:
+            paths.append(('update from', lambda: _update_tasks_counters_postgresql(tasks, project)))
+
+        try:
+            for name, run in paths:
+                for i in range(options['repeat']):
+                    tasks.update(total_annotations=0, cancelled_annotations=0, total_predictions=0, is_labeled=False)
+                    start = time.perf_counter()
+                    with transaction.atomic():
+                        updated = run()
+                    duration = time.perf_counter() - start
+                    self.stdout.write(
+                        f'{name} #{i + 1}: {duration:.2f} sec, {updated} tasks updated, '
+                        f'{options["tasks"] / duration if duration else 0:.1f} tasks/sec'
+                    )
+        finally:
+            if not options['keep']:
+                project.delete()
@@ -29,7 +29,7 @@ from data_import.models import FileUpload
 from data_manager.managers import PreparedTaskManager, TaskManager
 from django.conf import settings
 from django.db import OperationalError, models, transaction
-from django.db.models import CheckConstraint, F, JSONField, Q
+from django.db.models import CheckConstraint, ExpressionWrapper, F, JSONField, Q
 from django.db.models.lookups import GreaterThanOrEqual
 from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import Signal, receiver
@@ -418,22 +418,24 @@ class Task(TaskMixin, models.Model):
         return filename
 
     def resolve_storage_uri(self, url) -> Optional[Mapping[str, Any]]:
-        from io_storages.functions import get_storage_by_url
+        from io_storages.presign_cache import get_presigned_url
 
         # Instead of using self.storage, we check all storage objects for the project to
         # support imported tasks that point to another bucket
-        storage_objects = self.project.get_all_import_storage_objects
-        storage = get_storage_by_url(url, storage_objects)
+        storage = self.project.import_storage_index.get(url)
 
         if storage:
             return {
-                'url': storage.generate_http_url(url),
+                'url': get_presigned_url(storage, url),
                 'presign_ttl': storage.presign_ttl,
             }
 
-    def resolve_uri(self, task_data, project):
-        from io_storages.functions import get_storage_by_url
+    def resolve_uri(self, task_data, project, file_uploads=None):
+        """Resolve storage and uploaded file uris in task data
 
+        :param file_uploads: dict uploaded file name => url prefetched for a page of tasks,
+        if it's None, uploaded files are queried one by one
+        """
         if project.task_data_login and project.task_data_password:
             protected_data = {}
             for key, value in task_data.items():
@@ -447,7 +449,7 @@ class Task(TaskMixin, models.Model):
                 protected_data[key] = value
             return protected_data
         else:
-            storage_objects = project.get_all_import_storage_objects
+            storage_index = project.import_storage_index
 
             # try resolve URLs via storage associated with that task
             for field in task_data:
@@ -455,9 +457,13 @@ class Task(TaskMixin, models.Model):
                 prepared_filename = self.prepare_filename(task_data[field])
                 if settings.CLOUD_FILE_STORAGE_ENABLED and self.is_upload_file(prepared_filename):
                     # permission check: resolve uploaded files to the project only
-                    file_upload = fast_first(FileUpload.objects.filter(project=project, file=prepared_filename))
-                    if file_upload is not None:
-                        task_data[field] = file_upload.url
+                    if file_uploads is None:
+                        file_upload = fast_first(FileUpload.objects.filter(project=project, file=prepared_filename))
+                        url = file_upload.url if file_upload is not None else None
+                    else:
+                        url = file_uploads.get(prepared_filename)
+                    if url is not None:
+                        task_data[field] = url
                     # it's very rare case, e.g. user tried to reimport exported file from another project
                     # or user wrote his django storage path manually
                     else:
@@ -466,9 +472,9 @@ class Task(TaskMixin, models.Model):
 
                 # project storage
                 # TODO: to resolve nested lists and dicts we should improve get_storage_by_url(),
-                # Now always using get_storage_by_url to ensure the storage with the correct bucket is used
+                # Now always using the storage index to ensure the storage with the correct bucket is used
                 # As a last fallback we can use self.storage which is the storage the Task was imported from
-                storage = get_storage_by_url(task_data[field], storage_objects) or self.storage
+                storage = storage_index.get(task_data[field]) or self.storage
                 if storage:
                     try:
                         resolved_uri = storage.resolve_uri(task_data[field], self)
@@ -479,6 +485,33 @@ class Task(TaskMixin, models.Model):
                         task_data[field] = resolved_uri
             return task_data
 
+    @classmethod
+    def resolve_tasks_uri(cls, tasks, project):
+        """Resolve uris in data of a page of tasks: storages are found with the project storage index
+        and uploaded files are fetched with one query. Resolved tasks are marked with uri_resolved,
+        so serializers don't resolve them again.
+
+        :return: dict task id => resolved task data
+        """
+        file_uploads = None
+        if settings.CLOUD_FILE_STORAGE_ENABLED:
+            filenames = set()
+            for task in tasks:
+                for value in task.data.values():
+                    prepared_filename = cls.prepare_filename(value)
+                    if cls.is_upload_file(prepared_filename):
+                        filenames.add(prepared_filename)
+            file_uploads = {}
+            if filenames:
+                for file_upload in FileUpload.objects.filter(project=project, file__in=filenames):
+                    file_uploads[file_upload.file.name] = file_upload.url
+
+        resolved = {}
+        for task in tasks:
+            task.data = resolved[task.id] = task.resolve_uri(task.data, project, file_uploads=file_uploads)
+            task.uri_resolved = True
+        return resolved
+
     @property
     def storage(self):
         # maybe task has storage link
@@ -1327,6 +1360,39 @@ def save_predictions_to_project(sender, instance, **kwargs):
 # =========== END OF PROJECT SUMMARY UPDATES ===========
 
 
+# =========== MATERIALIZED DATA MANAGER COLUMNS ===========
+
+
+@receiver(post_save, sender=Annotation)
+@receiver(post_save, sender=Prediction)
+def update_materialized_columns(sender, instance, **kwargs):
+    """Recalculate aggregated Data Manager columns for the task of saved annotation or prediction"""
+    from data_manager.functions import maintain_materialized_columns
+
+    maintain_materialized_columns(instance.project_id, [instance.task_id])
+
+
+@receiver(post_delete, sender=Annotation)
+@receiver(post_delete, sender=Prediction)
+def update_materialized_columns_after_delete(sender, instance, **kwargs):
+    """Recalculate aggregated Data Manager columns for the task of deleted annotation or prediction"""
+    from data_manager.functions import maintain_materialized_columns
+
+    # don't insert new rows here: the task itself can be removed in the same cascade
+    maintain_materialized_columns(instance.project_id, [instance.task_id], create=False)
+
+
+@receiver(post_bulk_create, sender=Annotation)
+def update_materialized_columns_after_bulk_create(sender, objs, **kwargs):
+    from data_manager.functions import maintain_materialized_columns
+
+    if objs:
+        maintain_materialized_columns(objs[0].project_id, [obj.task_id for obj in objs])
+
+
+# =========== END OF MATERIALIZED DATA MANAGER COLUMNS ===========
+
+
 @receiver(post_save, sender=Annotation)
 def delete_draft(sender, instance, **kwargs):
     task = instance.task
@@ -1386,8 +1452,9 @@ def bulk_update_stats_project_tasks(tasks, project=None):
     :return:
     """
     # recalc accuracy
-    if not tasks:
-        # break if tasks is empty
+    # break if tasks is empty, querysets are checked without loading all tasks
+    is_empty = not tasks.exists() if isinstance(tasks, models.QuerySet) else not tasks
+    if is_empty:
         return
     # get project if it's not in params
     if project is None:
@@ -1403,9 +1470,8 @@ def bulk_update_stats_project_tasks(tasks, project=None):
             if project.skip_queue == project.SkipQueue.IGNORE_SKIPPED:
                 completed_annotations_f_expr += F('cancelled_annotations')
             finished_q = Q(GreaterThanOrEqual(completed_annotations_f_expr, F('overlap')))
-            finished_tasks = tasks.filter(finished_q)
-            finished_tasks_ids = finished_tasks.values_list('id', flat=True)
-            tasks.update(is_labeled=Q(id__in=finished_tasks_ids))
+            # single UPDATE computing the flag from the counters of each row
+            tasks.update(is_labeled=ExpressionWrapper(finished_q, output_field=models.BooleanField()))
 
         else:
             # update objects without saving if we can't use overlap
@@ -7,6 +7,7 @@ from core.feature_flags import flag_set
 from core.label_config import replace_task_data_undefined_with_config_field
 from core.utils.common import load_func, retry_database_locked
 from core.utils.db import fast_first
+from data_manager.functions import maintain_materialized_columns
 from django.conf import settings
 from django.db import IntegrityError, transaction
 from drf_yasg import openapi
@@ -186,7 +187,7 @@ class BaseTaskSerializer(FlexFieldsModelSerializer):
         project = self.project(instance)
         if project:
             # resolve uri for storage (s3/gcs/etc)
-            if self.context.get('resolve_uri', False):
+            if self.context.get('resolve_uri', False) and not getattr(instance, 'uri_resolved', False):
                 instance.data = instance.resolve_uri(instance.data, project)
 
             # resolve $undefined$ key in task data
@@ -446,6 +447,7 @@ class BaseTaskSerializerBulk(serializers.ListSerializer):
         # predictions: DB bulk create
         self.db_predictions = Prediction.objects.bulk_create(db_predictions, batch_size=settings.BATCH_SIZE)
         logging.info(f'Predictions serialization success, len = {len(self.db_predictions)}')
+        maintain_materialized_columns(self.project.id, [prediction.task_id for prediction in self.db_predictions])
 
         # renew project model version if it's empty
         if not self.project.model_version and last_model_version is not None:
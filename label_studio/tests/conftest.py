@@ -19,6 +19,7 @@ import ujson as json
 from botocore.exceptions import ClientError
 from django.conf import settings
 from freezegun import freeze_time
+from io_storages.client_pool import client_pool
 from moto import mock_s3
 from organizations.models import Organization
 from projects.models import Project
@@ -75,6 +76,14 @@ def disable_sentry(settings):
     settings.SENTRY_DSN = None
 
 
+@pytest.fixture(autouse=True)
+def clear_storage_client_pool():
+    """Storage clients are pooled per process, don't reuse mocked clients of other tests"""
+    client_pool.clear()
+    yield
+    client_pool.clear()
+
+
 @pytest.fixture()
 def debug_modal_exceptions_false(settings):
     settings.DEBUG_MODAL_EXCEPTIONS = False
@@ -0,0 +1,90 @@
+import json
+
+import mock
+import pytest
+from data_import import functions
+from data_import.functions import async_import_background
+from data_import.uploader import create_file_upload
+from django.core.files.uploadedfile import SimpleUploadedFile
+from projects.models import ProjectImport
+from rest_framework.exceptions import ValidationError
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def streaming_import(settings):
+    settings.IMPORT_STREAMING_MIN_FILE_SIZE = 0
+    settings.IMPORT_STREAMING_CHUNK_SIZE = 2
+
+
+@pytest.mark.parametrize(
+    'filename, content',
+    [
+        ('tasks.json', json.dumps([{'text': f'text {i}', 'meta_info': i + 0.5} for i in range(5)])),
+        ('tasks.json', json.dumps([{'data': {'text': f'text {i}', 'meta_info': i + 0.5}} for i in range(5)])),
+        ('tasks.csv', 'text,meta_info\n' + ''.join(f'text {i},{i + 0.5}\n' for i in range(5))),
+        ('tasks.tsv', 'text\tmeta_info\n' + ''.join(f'text {i}\t{i + 0.5}\n' for i in range(5))),
+    ],
+)
+def test_iter_tasks_matches_read_tasks(configured_project, streaming_import, filename, content):
+    project = configured_project
+    file_upload = create_file_upload(project.created_by, project, SimpleUploadedFile(filename, content.encode()))
+
+    tasks = file_upload.read_tasks()
+    assert list(file_upload.iter_tasks()) == tasks
+    chunks = [chunk for _, chunk in file_upload.iter_tasks_chunks_from_uploaded_files(project, [file_upload.id])]
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+def test_iter_tasks_single_json_object(configured_project):
+    project = configured_project
+    content = json.dumps({'data': {'text': 'text', 'meta_info': 'meta'}}).encode()
+    file_upload = create_file_upload(project.created_by, project, SimpleUploadedFile('task.json', content))
+
+    assert list(file_upload.iter_tasks()) == [{'data': {'text': 'text', 'meta_info': 'meta'}}]
+
+
+def test_async_import_by_chunks(configured_project, streaming_import, settings):
+    settings.WEBHOOK_BATCH_SIZE = 3
+    project = configured_project
+    tasks_before = project.tasks.count()
+    content = json.dumps([{'text': f'text {i}', 'meta_info': 'meta'} for i in range(5)]).encode()
+    file_upload = create_file_upload(project.created_by, project, SimpleUploadedFile('tasks.json', content))
+    project_import = ProjectImport.objects.create(
+        project=project, file_upload_ids=[file_upload.id], commit_to_project=True, return_task_ids=True
+    )
+
+    with mock.patch.object(functions, 'emit_webhooks_for_instance') as emit_webhooks:
+        async_import_background(project_import.id, project.created_by.id)
+
+    project_import.refresh_from_db()
+    assert project_import.status == ProjectImport.Status.COMPLETED
+    # webhooks are sent after the last chunk in batches of WEBHOOK_BATCH_SIZE tasks
+    assert [len(call.args[3]) for call in emit_webhooks.call_args_list] == [3, 2]
+    assert project_import.task_count == 5
+    assert project_import.found_formats == {'.json': 1}
+    assert sorted(project_import.data_columns) == ['meta_info', 'text']
+    assert sorted(project_import.task_ids) == sorted(
+        project.tasks.filter(file_upload=file_upload).values_list('id', flat=True)
+    )
+    assert project.tasks.count() == tasks_before + 5
+
+
+def test_async_import_by_chunks_rolls_back_on_invalid_chunk(configured_project, streaming_import):
+    project = configured_project
+    tasks_before = project.tasks.count()
+    tasks = [{'data': {'text': f'text {i}', 'meta_info': 'meta'}} for i in range(4)]
+    tasks.append({'data': 'not a dict'})
+    file_upload = create_file_upload(
+        project.created_by, project, SimpleUploadedFile('tasks.json', json.dumps(tasks).encode())
+    )
+    project_import = ProjectImport.objects.create(
+        project=project, file_upload_ids=[file_upload.id], commit_to_project=True
+    )
+
+    with mock.patch.object(functions, 'emit_webhooks_for_instance') as emit_webhooks, pytest.raises(ValidationError):
+        async_import_background(project_import.id, project.created_by.id)
+
+    assert project.tasks.count() == tasks_before
+    emit_webhooks.assert_not_called()
@@ -2,7 +2,9 @@
 """
 import json
 
+import mock
 import pytest
+from ml.models import MLBackend
 from projects.models import Project
 
 from ..utils import make_annotation, make_prediction, make_task, project_id  # noqa
@@ -128,3 +130,131 @@ def test_views_total_counters(tasks_count, annotations_count, predictions_count,
     assert response_data['total'] == tasks_count, response_data
     assert response_data['total_annotations'] == tasks_count * annotations_count, response_data
     assert response_data['total_predictions'] == tasks_count * predictions_count, response_data
+
+
+@pytest.mark.parametrize(
+    'ordering, expected_order',
+    [
+        [[], [0, 1, 2, 3, 4]],
+        [['-tasks:inner_id'], [4, 3, 2, 1, 0]],
+        [['tasks:total_annotations'], [1, 3, 0, 2, 4]],
+    ],
+)
+@pytest.mark.django_db
+def test_tasks_cursor_pagination(ordering, expected_order, business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    tasks = [make_task({'data': {'text': str(i)}}, project) for i in range(5)]
+    for task in tasks[::2]:
+        make_annotation({'result': []}, task.id)
+
+    ids, cursor = [], ''
+    for _ in range(5):
+        response = business_client.get(
+            '/api/tasks',
+            data={
+                'project': project_id,
+                'page_size': 2,
+                'cursor': cursor,
+                'query': json.dumps({'ordering': ordering}),
+            },
+        )
+        assert response.status_code == 200, response.content
+        response_data = response.json()
+        assert 'total' not in response_data
+        ids += [t['id'] for t in response_data['tasks']]
+        cursor = response_data['next_cursor']
+        if cursor is None:
+            break
+
+    assert ids == [tasks[i].id for i in expected_order]
+
+
+@pytest.mark.django_db
+def test_tasks_cursor_pagination_invalid_cursor(business_client, project_id):
+    response = business_client.get('/api/tasks', data={'project': project_id, 'cursor': 'not-a-cursor'})
+    assert response.status_code == 400, response.content
+
+
+@pytest.mark.django_db
+def test_tasks_count_api(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    for i in range(3):
+        task = make_task({'data': {'text': str(i)}}, project)
+        make_annotation({'result': []}, task.id)
+        make_prediction({'result': []}, task.id)
+
+    query = {
+        'filters': {
+            'conjunction': 'and',
+            'items': [{'filter': 'filter:tasks:data.text', 'operator': 'not_equal', 'type': 'String', 'value': '0'}],
+        }
+    }
+    response = business_client.get('/api/dm/tasks/count/', data={'project': project_id, 'query': json.dumps(query)})
+    assert response.status_code == 200, response.content
+    assert response.json() == {'total': 2, 'total_annotations': 2, 'total_predictions': 2, 'approximate': False}
+
+    # approximate count falls back to the exact one on non-PostgreSQL databases
+    response = business_client.get('/api/dm/tasks/count/', data={'project': project_id, 'approximate': 'true'})
+    assert response.status_code == 200, response.content
+    assert response.json()['total'] == 3
+
+
+@pytest.mark.django_db
+def test_tasks_api_predictions_fill(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    project.evaluate_predictions_automatically = True
+    project.save(update_fields=['evaluate_predictions_automatically'])
+    MLBackend.objects.create(project=project, url='http://localhost:8999')
+    task = make_task({'data': {'text': 'aaa'}}, project)
+    predicted = make_task({'data': {'text': 'bbb'}}, project)
+    prediction_result = {'from_name': 'my_class', 'to_name': 'text', 'type': 'choices', 'value': {'choices': ['pos']}}
+    make_prediction({'result': [prediction_result]}, predicted.id)
+
+    # with redis the page is returned at once and the fill job is enqueued once for all viewers
+    fill_keys = set()
+
+    def redis_set(key, value, ttl=None, nx=False):
+        if key in fill_keys:
+            return None
+        fill_keys.add(key)
+        return True
+
+    with mock.patch('data_manager.functions.redis_connected', return_value=True), mock.patch(
+        'data_manager.functions.redis_set', side_effect=redis_set
+    ), mock.patch('data_manager.functions.start_job_async_or_sync') as start_job:
+        for _ in range(2):
+            response = business_client.get(f'/api/tasks?project={project_id}')
+            assert response.status_code == 200, response.content
+            tasks = {t['id']: t for t in response.json()['tasks']}
+            assert tasks[task.id]['predictions_pending'] is True
+            assert tasks[predicted.id]['predictions_pending'] is False
+
+    start_job.assert_called_once()
+    assert start_job.call_args.args[1:3] == (project_id, [task.id])
+
+    # without redis predictions are retrieved before the page is returned
+    def evaluate_predictions(tasks):
+        for t in tasks:
+            make_prediction({'result': [prediction_result]}, t.id)
+
+    with mock.patch('data_manager.functions.evaluate_predictions', side_effect=evaluate_predictions):
+        response = business_client.get(f'/api/tasks?project={project_id}&fields=all')
+    tasks = {t['id']: t for t in response.json()['tasks']}
+    assert tasks[task.id]['predictions_pending'] is False
+    assert tasks[task.id]['total_predictions'] == 1
+
+
+@pytest.mark.django_db
+def test_predictions_fill_without_ml_backend(business_client, project_id):
+    from data_manager.functions import schedule_predictions_fill
+
+    project = Project.objects.get(pk=project_id)
+    task = make_task({'data': {}}, project)
+
+    with mock.patch('data_manager.functions.fill_predictions') as fill_predictions, mock.patch(
+        'data_manager.functions.start_job_async_or_sync'
+    ) as start_job:
+        assert schedule_predictions_fill(project, [task.id]) == set()
+
+    fill_predictions.assert_not_called()
+    start_job.assert_not_called()
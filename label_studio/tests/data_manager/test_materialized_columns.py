@@ -0,0 +1,74 @@
+"""This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
+"""
+import json
+
+import pytest
+from data_manager.functions import rebuild_materialized_columns
+from data_manager.models import MaterializedColumnsState, MaterializedTaskColumns
+from django.core.management import call_command
+from projects.models import Project
+
+from ..utils import make_annotation, make_prediction, make_task, project_id  # noqa
+
+RESULT = [{'from_name': 'my_class', 'to_name': 'text', 'type': 'choices', 'value': {'choices': ['pos']}}]
+
+
+@pytest.mark.django_db
+def test_materialized_columns_incremental_updates(business_client, project_id, settings):
+    settings.DATA_MANAGER_MATERIALIZED_COLUMNS = True
+    project = Project.objects.get(pk=project_id)
+    task = make_task({'data': {'text': 'aaa'}}, project)
+    make_task({'data': {'text': 'bbb'}}, project)
+
+    rebuild_materialized_columns(project)
+    assert MaterializedColumnsState.objects.get(project=project).is_fresh
+    assert MaterializedTaskColumns.objects.filter(project=project).count() == 2
+
+    annotation = make_annotation({'result': RESULT, 'completed_by': business_client.user}, task.id)
+    make_prediction({'result': RESULT, 'model_version': 'v1'}, task.id)
+
+    row = MaterializedTaskColumns.objects.get(task=task)
+    assert row.annotations_ids == [annotation.id]
+    assert row.annotators == [business_client.user.id]
+    assert row.annotations_results == [RESULT]
+    assert row.predictions_results == [RESULT]
+    assert row.predictions_model_versions == ['v1']
+
+    annotation.delete()
+    row.refresh_from_db()
+    assert row.annotations_ids == []
+    assert row.annotators == []
+
+    # the Data Manager reads aggregated columns from the materialized table
+    response = business_client.get(
+        '/api/tasks',
+        data={
+            'project': project_id,
+            'fields': 'all',
+            'query': json.dumps({'ordering': ['-tasks:predictions_model_versions']}),
+        },
+    )
+    assert response.status_code == 200, response.content
+    tasks = {t['id']: t for t in response.json()['tasks']}
+    assert tasks[task.id]['predictions_model_versions'] == 'v1'
+    assert tasks[task.id]['annotators'] == []
+
+
+@pytest.mark.django_db
+def test_materialized_columns_are_not_used_before_rebuild(business_client, project_id, settings):
+    settings.DATA_MANAGER_MATERIALIZED_COLUMNS = True
+    project = Project.objects.get(pk=project_id)
+    task = make_task({'data': {'text': 'aaa'}}, project)
+    make_annotation({'result': RESULT, 'completed_by': business_client.user}, task.id)
+
+    # not built yet: signals don't write rows, data manager uses aggregations
+    assert not MaterializedTaskColumns.objects.filter(project=project).exists()
+    response = business_client.get(f'/api/tasks?project={project_id}&fields=all')
+    assert response.json()['tasks'][0]['annotators'] == [business_client.user.id]
+
+    call_command('rebuild_materialized_columns', project=project_id)
+    assert MaterializedTaskColumns.objects.get(task=task).annotators == [business_client.user.id]
+
+    # deleting a task removes its row in cascade
+    task.delete()
+    assert not MaterializedTaskColumns.objects.filter(project=project).exists()
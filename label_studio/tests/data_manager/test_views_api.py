@@ -3,9 +3,10 @@
 import json
 
 import pytest
+from projects.models import Project
 from rest_framework import status
 
-from ..utils import project_id  # noqa
+from ..utils import make_task, project_id  # noqa
 
 pytestmark = pytest.mark.django_db
 
@@ -241,3 +242,49 @@ def test_update_views_order(business_client, project_id):
 
     returned_ids = [view['id'] for view in data]
     assert returned_ids == new_order['ids']
+
+
+def test_view_query_plan(business_client, project_id):
+    project = Project.objects.get(pk=project_id)
+    task_a = make_task({'data': {'text': 'aaa'}}, project)
+    task_b = make_task({'data': {'text': 'bbb'}}, project)
+
+    def text_filter(value):
+        return {
+            'conjunction': 'and',
+            'items': [{'filter': 'filter:tasks:data.text', 'operator': 'equal', 'type': 'String', 'value': value}],
+        }
+
+    payload = dict(project=project_id, data={'filters': text_filter('aaa'), 'ordering': ['-tasks:id']})
+    response = business_client.post('/api/dm/views/', data=json.dumps(payload), content_type='application/json')
+    assert response.status_code == 201, response.content
+    view_id = response.json()['id']
+
+    response = business_client.get(f'/api/dm/views/{view_id}/plan/')
+    assert response.status_code == 200, response.content
+    plan = response.json()
+    assert plan['cached'] is False
+    assert plan['plan']['filter_field_names'] == ['data__text']
+    assert plan['plan']['ordering_field_name'] == ['id', False]
+    assert 'ORDER BY' in plan['sql']
+
+    # the same compiled plan is reused by the task list
+    response = business_client.get('/api/tasks', data={'project': project_id, 'view': view_id})
+    assert [t['id'] for t in response.json()['tasks']] == [task_a.id]
+    response = business_client.get(f'/api/dm/views/{view_id}/plan/')
+    assert response.json()['cached'] is True
+    assert response.json()['plan']['key'] == plan['plan']['key']
+
+    # view update invalidates the plan
+    payload['data']['filters'] = text_filter('bbb')
+    response = business_client.put(
+        f'/api/dm/views/{view_id}/', data=json.dumps(payload), content_type='application/json'
+    )
+    assert response.status_code == 200, response.content
+    response = business_client.get('/api/tasks', data={'project': project_id, 'view': view_id})
+    assert [t['id'] for t in response.json()['tasks']] == [task_b.id]
+
+    response = business_client.get(f'/api/dm/views/{view_id}/plan/', data={'explain': 1})
+    assert response.json()['cached'] is True
+    assert response.json()['plan']['key'] != plan['plan']['key']
+    assert response.json()['explain']
@@ -0,0 +1,83 @@
+"""This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
+
+Next task contention benchmark: many annotators request /api/projects/<id>/next for the same project.
+Run with run_next_task_test.sh and compare "99%" column of results_<users>_stats.csv
+for NEXT_TASK_SET_BASED_SELECTION=1 and NEXT_TASK_SET_BASED_SELECTION=0 on the server side.
+"""
+import os
+import random
+from uuid import uuid4
+
+from locust import HttpUser, between, events, task
+
+PROJECT_ID = os.environ.get('NEXT_TASK_PROJECT_ID')
+IMPORTED_TASKS = int(os.environ.get('IMPORTED_TASKS', 10000))
+SUBMIT_RATIO = float(os.environ.get('NEXT_TASK_SUBMIT_RATIO', 0.5))
+
+label_config = (
+    '<View><Text name="text" value="$text"/>'
+    '<Choices name="label" toName="text"><Choice value="1"/><Choice value="2"/></Choices></View>'
+)
+
+
+def signup(client):
+    username = str(uuid4())[:8]
+    response = client.get('/')
+    csrftoken = response.cookies['csrftoken']
+    client.post(
+        '/user/signup',
+        {'email': f'{username}@heartex.com', 'password': 'password'},
+        headers={'X-CSRFToken': csrftoken},
+    )
+    return username
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    """Create one shared project with tasks unless NEXT_TASK_PROJECT_ID is provided"""
+    global PROJECT_ID
+    if PROJECT_ID:
+        return
+
+    user = HttpUser(environment)
+    signup(user.client)
+    r = user.client.post('/api/projects', json={'title': 'Next task benchmark', 'label_config': label_config})
+    PROJECT_ID = r.json()['id']
+    tasks = [{'text': f'task {i}'} for i in range(IMPORTED_TASKS)]
+    user.client.post(f'/api/projects/{PROJECT_ID}/import', json=tasks)
+    print(f'Project {PROJECT_ID} with {IMPORTED_TASKS} tasks has been created')
+
+
+class Annotator(HttpUser):
+    wait_time = between(0.1, 0.5)
+
+    def on_start(self):
+        signup(self.client)
+
+    @task
+    def next_task(self):
+        with self.client.get(
+            f'/api/projects/{PROJECT_ID}/next', name='/api/projects/<pk>/next', catch_response=True
+        ) as r:
+            if r.status_code == 404:
+                # all tasks are labeled
+                r.success()
+                return
+            task_id = r.json()['id']
+
+        # the rest of the annotators keep the task locked and request next task again
+        if random.random() < SUBMIT_RATIO:
+            self.client.post(
+                f'/api/tasks/{task_id}/annotations',
+                name='/api/tasks/<pk>/annotations',
+                json={
+                    'result': [
+                        {
+                            'from_name': 'label',
+                            'to_name': 'text',
+                            'type': 'choices',
+                            'value': {'choices': [random.choice(['1', '2'])]},
+                        }
+                    ]
+                },
+            )
@@ -0,0 +1,11 @@
+# p99 latency of /api/projects/<id>/next for 10, 50 and 200 concurrent annotators,
+# see "99%" column in results_next_task_<users>_stats.csv
+for USERS in 10 50 200
+do
+  IMPORTED_TASKS=10000 \
+  LOCUST_USERS=$USERS \
+  LOCUST_HOST=http://localhost:8000 \
+  LOCUST_LOCUSTFILE=locustfile_next_task.py \
+  LOCUST_SPAWN_RATE=10 \
+  locust --headless -t 2m --csv results_next_task_$USERS
+done
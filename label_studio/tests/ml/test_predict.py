@@ -1,6 +1,7 @@
 import json
 
 import pytest
+from ml.models import MLBackend, MLPredictionCache
 
 from label_studio.tests.utils import make_project, make_task
 
@@ -89,3 +90,151 @@ def test_get_multiple_predictions_on_task(business_client, ml_backend_for_test_p
     assert payload['predictions'][0]['model_version'] == 'ModelA'
     assert payload['predictions'][1]['result'][0]['value']['choices'][0] == 'label_B'
     assert payload['predictions'][1]['model_version'] == 'ModelB'
+
+
+def _predict_callback(request, context):
+    tasks = request.json()['tasks']
+    return {
+        'results': [
+            {
+                'score': 0.5,
+                'result': [
+                    {
+                        'from_name': 'label',
+                        'to_name': 'text',
+                        'type': 'choices',
+                        'value': {'choices': [task['data']['text']]},
+                    }
+                ],
+            }
+            for task in tasks
+        ]
+    }
+
+
+@pytest.mark.django_db
+def test_predict_tasks_in_concurrent_batches(business_client, ml_backend, settings):
+    settings.ML_PREDICT_BATCH_SIZE = 2
+    settings.ML_PREDICT_CONCURRENCY = 2
+    settings.ML_PREDICT_RETRY_BACKOFF = 0
+    project = make_project(
+        config=dict(is_published=True, title='test_predict_tasks_in_concurrent_batches'),
+        user=business_client.user,
+        use_ml_backend=False,
+    )
+    tasks = [make_task({'data': {'text': f'text {i}'}}, project) for i in range(5)]
+    backend = MLBackend.objects.create(project=project, url='http://localhost:9090')
+    # the first request fails and is retried
+    ml_backend.post(
+        'http://localhost:9090/predict',
+        [{'status_code': 500}, {'json': _predict_callback}, {'json': _predict_callback}],
+    )
+
+    predictions = backend.predict_tasks(project.tasks.all())
+
+    assert len(predictions) == 5
+    assert sum(1 for r in ml_backend.request_history if r.url.endswith('/predict')) == 4
+    for task in tasks:
+        task.refresh_from_db()
+        assert task.total_predictions == 1
+        prediction = task.predictions.get()
+        assert prediction.result[0]['value']['choices'] == [task.data['text']]
+        assert prediction.model_version == 'abc'
+    backend.refresh_from_db()
+    assert backend.predict_progress['status'] == 'completed'
+    assert backend.predict_progress['processed_tasks'] == 5
+    assert backend.predict_progress['failed_tasks'] == 0
+    assert backend.predict_progress['predictions'] == 5
+
+    # tasks with predictions of the current model version are skipped
+    assert backend.predict_tasks(project.tasks.all()) == 'abc'
+
+
+@pytest.mark.django_db
+def test_invalid_predictions_fail_only_their_batch(business_client, ml_backend, settings):
+    settings.ML_PREDICT_BATCH_SIZE = 2
+    project = make_project(
+        config=dict(is_published=True, title='test_invalid_predictions_fail_only_their_batch'),
+        user=business_client.user,
+        use_ml_backend=False,
+    )
+    tasks = [make_task({'data': {'text': f'text {i}'}}, project) for i in range(4)]
+    backend = MLBackend.objects.create(project=project, url='http://localhost:9090')
+
+    def callback(request, context):
+        response = _predict_callback(request, context)
+        if request.json()['tasks'][0]['data']['text'] == 'text 0':
+            for result in response['results']:
+                result['score'] = 'invalid'
+        return response
+
+    ml_backend.post('http://localhost:9090/predict', json=callback)
+
+    predictions = backend.predict_tasks(project.tasks.all())
+
+    assert sorted(p.task_id for p in predictions) == [tasks[2].id, tasks[3].id]
+    backend.refresh_from_db()
+    assert backend.predict_progress['status'] == 'completed'
+    assert backend.predict_progress['processed_tasks'] == 4
+    assert backend.predict_progress['failed_tasks'] == 2
+    assert backend.predict_progress['predictions'] == 2
+
+
+@pytest.mark.django_db
+def test_predictions_from_cache(business_client, ml_backend, settings):
+    settings.ML_PREDICTION_CACHE_ENABLED = True
+    project = make_project(
+        config=dict(is_published=True, title='test_predictions_from_cache'),
+        user=business_client.user,
+        use_ml_backend=False,
+    )
+    make_task({'data': {'text': 'text 0'}}, project)
+    make_task({'data': {'text': 'text 1'}}, project)
+    backend = MLBackend.objects.create(project=project, url='http://localhost:9090', is_interactive=True)
+    ml_backend.post('http://localhost:9090/predict', json=_predict_callback)
+
+    def predict_requests():
+        return sum(1 for r in ml_backend.request_history if r.url.endswith('/predict'))
+
+    assert len(backend.predict_tasks(project.tasks.all())) == 2
+    assert predict_requests() == 1
+    assert MLPredictionCache.objects.filter(ml_backend=backend).count() == 2
+
+    # re-imported task with the same data gets the prediction without a request to ML backend
+    duplicate = make_task({'data': {'text': 'text 1'}}, project)
+    predictions = backend.predict_tasks(project.tasks.all())
+    assert [p.task_id for p in predictions] == [duplicate.id]
+    assert predictions[0].result[0]['value']['choices'] == ['text 1']
+    assert predict_requests() == 1
+    duplicate.refresh_from_db()
+    assert duplicate.total_predictions == 1
+
+    # interactive annotating with the same context is requested once
+    first = backend.interactive_annotating(duplicate, context={'result': []})
+    second = backend.interactive_annotating(duplicate, context={'result': []})
+    assert first == second
+    assert predict_requests() == 2
+    backend.interactive_annotating(duplicate, context={'result': [1]})
+    assert predict_requests() == 3
+
+    # invalid cached response is not returned, ML backend is requested again
+    MLPredictionCache.objects.filter(ml_backend=backend).update(response=[])
+    assert backend.interactive_annotating(duplicate, context={'result': []}) == first
+    assert predict_requests() == 4
+
+
+@pytest.mark.django_db
+def test_prediction_cache_eviction(business_client, settings):
+    settings.ML_PREDICTION_CACHE_MAX_SIZE = 2
+    project = make_project(config=dict(title='test_prediction_cache_eviction'), user=business_client.user)
+    backend = MLBackend.objects.create(project=project, url='http://localhost:9090')
+
+    for i in range(3):
+        MLPredictionCache.store(backend, {f'key{i}': [{'result': []}]})
+    assert MLPredictionCache.objects.filter(ml_backend=backend).count() == 3
+    MLPredictionCache.evict(backend)
+    assert MLPredictionCache.lookup(backend, ['key0']) == {}
+    assert set(MLPredictionCache.lookup(backend, ['key1', 'key2'])) == {'key1', 'key2'}
+
+    settings.ML_PREDICTION_CACHE_TTL = -1
+    assert MLPredictionCache.lookup(backend, ['key1', 'key2']) == {}
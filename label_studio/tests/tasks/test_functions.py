@@ -53,12 +53,19 @@ class TestExportProject:
             context={'interpolate_key_frames': settings.INTERPOLATE_KEY_FRAMES},
         ).data
 
+        exported_tasks = []
+        generate_export_file.side_effect = lambda project, tasks, *args: (
+            exported_tasks.extend(tasks) or generate_export_file.return_value
+        )
         with mocker.patch('builtins.open'):
             filepath = export_project(project.id, 'JSON', settings.EXPORT_DIR)
 
         assert filepath == os.path.join(settings.EXPORT_DIR, 'project.json')
 
-        generate_export_file.assert_called_once_with(project, data, 'JSON', settings.CONVERTER_DOWNLOAD_RESOURCES, {})
+        generate_export_file.assert_called_once_with(
+            project, mocker.ANY, 'JSON', settings.CONVERTER_DOWNLOAD_RESOURCES, {}
+        )
+        assert exported_tasks == data
 
     def test_project_does_not_exist(self, mocker, generate_export_file):
         with mocker.patch('builtins.open'):
@@ -1,9 +1,18 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
+import hashlib
 import json
+import os
+from types import SimpleNamespace
+from unittest import mock
 
 import pytest
+from data_export.mixins import export_background, set_export_background_failure
+from data_export.models import ConvertedFormat, DataExport, Export
+from data_export.serializers import ExportDataSerializer
 from django.apps import apps
+from django.conf import settings
+from label_studio_sdk.converter import Converter
 from tasks.models import Annotation, Prediction, Task
 from tasks.serializers import AnnotationSerializer
 
@@ -318,3 +327,175 @@ def test_export_with_predictions(
             assert task['predictions'][0]['score'] == predictions['score']
         else:
             assert task['predictions'] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_to_file_by_shards_is_resumed(business_client, configured_project, settings):
+    settings.EXPORT_SHARD_SIZE = 1
+    settings.EXPORT_WORKERS = 2
+    for task in configured_project.tasks.all():
+        Annotation.objects.create(task=task, project=configured_project, result=[], completed_by=business_client.admin)
+    export = Export.objects.create(project=configured_project, created_by=business_client.admin)
+    expected = list(export.get_export_data())
+    assert len(expected) == 2
+
+    # the first run fails on the second shard, the first shard stays checkpointed
+    export_shard = Export._export_shard
+
+    def failing_export_shard(self, index, *args):
+        if index == 1:
+            raise ValueError('Shard failed')
+        return export_shard(self, index, *args)
+
+    export.status = Export.Status.IN_PROGRESS
+    export.save(update_fields=['status'])
+    with mock.patch.object(Export, '_export_shard', failing_export_shard), pytest.raises(ValueError):
+        export_background(export.id, None, None, None)
+    # the job is retried by rq, so the export isn't failed yet
+    set_export_background_failure(SimpleNamespace(args=[export.id], retries_left=1), None, None, None, None)
+    export.refresh_from_db()
+    assert export.status == Export.Status.IN_PROGRESS
+    assert export.counters['shards']['completed'] == {'0': 1}
+    assert os.path.exists(export._get_shard_path(0))
+
+    # the retried job serializes the failed shard only
+    with mock.patch.object(Export, '_export_shard', autospec=True, side_effect=export_shard) as spy:
+        export_background(export.id, None, None, None)
+    assert [call.args[1] for call in spy.call_args_list] == [1]
+
+    export.refresh_from_db()
+    assert export.status == Export.Status.COMPLETED
+    assert export.counters == {'task_number': 2}
+    assert not os.path.exists(export.shards_dir)
+    with export.file.open('rb') as f:
+        content = f.read()
+    assert json.loads(content) == json.loads(json.dumps(expected))
+    assert export.md5 == hashlib.md5(content).hexdigest()
+
+
+@pytest.mark.django_db
+def test_failed_export_removes_shards(business_client, configured_project, settings):
+    settings.EXPORT_SHARD_SIZE = 1
+    settings.EXPORT_WORKERS = 1
+    export = Export.objects.create(project=configured_project, created_by=business_client.admin)
+    export_shard = Export._export_shard
+
+    def failing_export_shard(self, index, *args):
+        if index == 1:
+            raise ValueError('Shard failed')
+        return export_shard(self, index, *args)
+
+    # exports without retries are failed at once
+    with mock.patch.object(Export, '_export_shard', failing_export_shard):
+        export.export_to_file()
+    export.refresh_from_db()
+    assert export.status == Export.Status.FAILED
+    assert not os.path.exists(export.shards_dir)
+
+    # the background job removes shards when retries are exhausted
+    with mock.patch.object(Export, '_export_shard', failing_export_shard), pytest.raises(ValueError):
+        export_background(export.id, None, None, None)
+    assert os.path.exists(export._get_shard_path(0))
+    set_export_background_failure(SimpleNamespace(args=[export.id], retries_left=0), None, None, None, None)
+    export.refresh_from_db()
+    assert export.status == Export.Status.FAILED
+    assert not os.path.exists(export.shards_dir)
+
+
+@pytest.mark.parametrize('export_type', ['JSON', 'JSON_MIN', 'CSV'])
+@pytest.mark.django_db
+def test_generate_export_file_streams_tasks(business_client, configured_project, export_type, tmp_path):
+    for task in configured_project.tasks.all():
+        Annotation.objects.create(task=task, project=configured_project, result=[], completed_by=business_client.admin)
+    tasks = ExportDataSerializer(configured_project.tasks.order_by('id'), many=True).data
+
+    export_file, _, filename = DataExport.generate_export_file(configured_project, iter(tasks), export_type, False, {})
+    with export_file:
+        content = export_file.read()
+
+    # the converted result is the same as converting the file with the whole task list
+    input_json = tmp_path / 'input.json'
+    input_json.write_text(json.dumps(tasks))
+    Converter(config=configured_project.get_parsed_config(), project_dir=None).convert(
+        str(input_json), str(tmp_path / 'out'), export_type, is_dir=False
+    )
+    expected = next((tmp_path / 'out').iterdir()).read_bytes()
+    if export_type in ('CSV', 'JSON_MIN'):
+        assert content == expected
+    else:
+        assert json.loads(content) == json.loads(expected)
+
+    with open(os.path.join(settings.EXPORT_DIR, filename.rsplit('.', 1)[0] + '.json'), 'rb') as f:
+        assert json.loads(f.read()) == json.loads(json.dumps(tasks))
+        f.seek(0)
+        assert hashlib.md5(f.read()).hexdigest()[:8] == filename.rsplit('.', 1)[0][-8:]
+
+
+@pytest.mark.django_db
+def test_converted_formats_are_reused_for_identical_snapshots(business_client, configured_project):
+    for task in configured_project.tasks.all():
+        Annotation.objects.create(task=task, project=configured_project, result=[], completed_by=business_client.admin)
+    snapshots = []
+    for _ in range(2):
+        snapshot = Export.objects.create(project=configured_project, created_by=business_client.admin)
+        snapshot.export_to_file()
+        snapshot.refresh_from_db()
+        snapshots.append(snapshot)
+    assert snapshots[0].md5 == snapshots[1].md5
+    stats = ConvertedFormat.get_cache_stats()
+
+    responses = [
+        business_client.post(
+            f'/api/projects/{configured_project.id}/exports/{snapshot.id}/convert',
+            data=json.dumps({'export_type': 'CSV'}),
+            content_type='application/json',
+        )
+        for snapshot in snapshots
+    ]
+    assert [r.status_code for r in responses] == [200, 200]
+    assert 'cached' not in responses[0].json()
+    assert responses[1].json()['cached'] is True
+
+    converted, reused = (ConvertedFormat.objects.get(id=r.json()['converted_format']) for r in responses)
+    assert converted.status == reused.status == ConvertedFormat.Status.COMPLETED
+    assert reused.export_id == snapshots[1].id
+    assert reused.file.name == converted.file.name
+    assert converted.size == converted.file.size
+    new_stats = ConvertedFormat.get_cache_stats()
+    assert new_stats['hits'] == stats['hits'] + 1
+    assert new_stats['misses'] == stats['misses'] + 1
+    # hits are stored with the converted files, so the stats are the same in every process
+    assert new_stats['hits'] == sum(ConvertedFormat.objects.values_list('hits', flat=True))
+
+    # the shared file is removed with all its conversions when the cache is over the limit
+    file_name = converted.file.name
+    assert ConvertedFormat.evict_cache(max_size=1) == 1
+    assert not ConvertedFormat.objects.filter(file=file_name).exists()
+    assert not converted.file.storage.exists(file_name)
+
+
+@pytest.mark.django_db
+def test_converted_formats_are_not_reused_after_label_config_change(business_client, configured_project):
+    for task in configured_project.tasks.all():
+        Annotation.objects.create(task=task, project=configured_project, result=[], completed_by=business_client.admin)
+    snapshots = []
+    for _ in range(3):
+        snapshot = Export.objects.create(project=configured_project, created_by=business_client.admin)
+        snapshot.export_to_file()
+        snapshots.append(snapshot)
+
+    def convert(snapshot):
+        response = business_client.post(
+            f'/api/projects/{configured_project.id}/exports/{snapshot.id}/convert',
+            data=json.dumps({'export_type': 'CSV'}),
+            content_type='application/json',
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    assert 'cached' not in convert(snapshots[0])
+    # the converter output depends on the label config, so the identical snapshot is converted again
+    configured_project.label_config = configured_project.label_config.replace('class_B', 'class_C')
+    configured_project.save(update_fields=['label_config'])
+    assert 'cached' not in convert(snapshots[1])
+    assert convert(snapshots[2])['cached'] is True
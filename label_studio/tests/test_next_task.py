@@ -1,13 +1,17 @@
 """This file and its contents are licensed under the Apache License 2.0. Please see the included NOTICE for copyright information and LICENSE for a copy of the license.
 """
 import json
+import threading
 import time
 from unittest import mock
 
 import pytest
 from core.redis import redis_healthcheck
+from core.utils.common import db_is_not_sqlite
 from django.apps import apps
+from django.db import connection, transaction
 from django.db.models import Q
+from projects.functions.next_task import _filter_unlocked, _get_first_unlocked, _select_for_update_first
 from projects.models import Project
 from tasks.models import Annotation, Prediction, Task
 
@@ -1327,3 +1331,174 @@ def test_overlap_first(business_client, setup_before_upload, show_overlap_first)
     else:
         assert not all_tasks_with_overlap_are_labeled
         assert not all_tasks_without_overlap_are_not_labeled
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('set_based_selection', [True, False])
+def test_next_task_skips_locked_tasks(business_client, settings, set_based_selection):
+    settings.NEXT_TASK_SET_BASED_SELECTION = set_based_selection
+    config = dict(
+        title='test_next_task_skips_locked_tasks',
+        is_published=True,
+        label_config="""
+            <View>
+              <Text name="text" value="$text"></Text>
+              <Choices name="text_class" choice="single" toName="text">
+                <Choice value="class_A"></Choice>
+                <Choice value="class_B"></Choice>
+              </Choices>
+            </View>""",
+    )
+    annotation_result = json.dumps(
+        [{'from_name': 'text_class', 'to_name': 'text', 'type': 'choices', 'value': {'choices': ['class_A']}}]
+    )
+    project = make_project(config, business_client.user)
+    project.sampling = Project.SEQUENCE
+    project.save()
+    tasks = [make_task({'data': {'text': f'this is {i}'}}, project) for i in range(3)]
+
+    ann1 = make_annotator({'email': 'ann1@testskiplocked.com'}, project, True)
+    ann2 = make_annotator({'email': 'ann2@testskiplocked.com'}, project, True)
+    ann3 = make_annotator({'email': 'ann3@testskiplocked.com'}, project, True)
+
+    # the first task is locked by ann1, so the others get the next tasks in sequence
+    r = ann1.get(f'/api/projects/{project.id}/next')
+    assert json.loads(r.content)['id'] == tasks[0].id
+    r = ann2.get(f'/api/projects/{project.id}/next')
+    assert json.loads(r.content)['id'] == tasks[1].id
+
+    # the second task is labeled by ann2 and doesn't need more annotations
+    ann2.post(f'/api/tasks/{tasks[1].id}/annotations/', data={'task': tasks[1].id, 'result': annotation_result})
+    r = ann3.get(f'/api/projects/{project.id}/next')
+    assert json.loads(r.content)['id'] == tasks[2].id
+
+
+def _make_race_project(business_client, title):
+    project = make_project(
+        dict(
+            title=title,
+            is_published=True,
+            sampling=Project.SEQUENCE,
+            label_config='<View><Text name="text" value="$text"></Text></View>',
+        ),
+        business_client.user,
+    )
+    tasks = [make_task({'data': {'text': f'this is {i}'}}, project) for i in range(2)]
+    return project, tasks
+
+
+@pytest.mark.django_db
+def test_next_task_rechecks_lock_after_row_lock(business_client, settings):
+    """The first candidate is locked by another annotator after the candidates query"""
+    settings.NEXT_TASK_SET_BASED_SELECTION = True
+    project, tasks = _make_race_project(business_client, 'test_next_task_rechecks_lock_after_row_lock')
+    other = make_annotator({'email': 'other@testrecheck.com'}, project)
+    user = make_annotator({'email': 'user@testrecheck.com'}, project)
+
+    task_ids = list(_filter_unlocked(project.tasks.order_by('id'), project, user).values_list('id', flat=True))
+    assert task_ids == [tasks[0].id, tasks[1].id]
+    tasks[0].set_lock(other)
+
+    assert _select_for_update_first(task_ids, project, user) == tasks[1]
+
+
+@pytest.mark.skipif(not db_is_not_sqlite(), reason='row locks are not supported by sqlite')
+@pytest.mark.django_db(transaction=True)
+def test_next_task_concurrent_annotators_get_different_tasks(business_client, settings):
+    settings.NEXT_TASK_SET_BASED_SELECTION = True
+    project, tasks = _make_race_project(business_client, 'test_next_task_concurrent_annotators')
+    first = make_annotator({'email': 'first@testrace.com'}, project)
+    second = make_annotator({'email': 'second@testrace.com'}, project)
+    candidates_read, lock_committed = threading.Event(), threading.Event()
+    selected = {}
+
+    def select_after_concurrent_lock():
+        try:
+            with transaction.atomic():
+                task_ids = list(
+                    _filter_unlocked(project.tasks.order_by('id'), project, first).values_list('id', flat=True)
+                )
+                candidates_read.set()
+                lock_committed.wait(10)
+                selected['first'] = _select_for_update_first(task_ids, project, first)
+        finally:
+            connection.close()
+
+    def lock_first_task():
+        try:
+            candidates_read.wait(10)
+            with transaction.atomic():
+                task = _get_first_unlocked(project.tasks.order_by('id'), second, project)
+                task.set_lock(second)
+                selected['second'] = task
+        finally:
+            lock_committed.set()
+            connection.close()
+
+    threads = [threading.Thread(target=select_after_concurrent_lock), threading.Thread(target=lock_first_task)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert selected['second'] == tasks[0]
+    assert selected['first'] == tasks[1]
+
+
+@pytest.mark.django_db
+def test_next_task_queue_candidates(business_client):
+    from projects.functions.next_task_queue import get_next_task_candidates
+
+    project = make_project(
+        dict(
+            title='test_next_task_queue_candidates',
+            is_published=True,
+            sampling=Project.SEQUENCE,
+            show_ground_truth_first=True,
+            label_config="""
+                <View>
+                  <Text name="text" value="$text"></Text>
+                  <Choices name="text_class" choice="single" toName="text">
+                    <Choice value="class_A"></Choice>
+                  </Choices>
+                </View>""",
+        ),
+        business_client.user,
+    )
+    tasks = [make_task({'data': {'text': f'this is {i}'}}, project) for i in range(4)]
+    ann1 = make_annotator({'email': 'ann1@testnexttaskqueue.com'}, project, True)
+
+    # completed by ann1 → not in the queue, ground truth task goes first
+    make_annotation({'result': [], 'completed_by': ann1.annotator}, tasks[0].id)
+    make_annotation({'result': [], 'completed_by': business_client.user, 'ground_truth': True}, tasks[2].id)
+    Task.objects.filter(id=tasks[2].id).update(is_labeled=False)
+
+    assert get_next_task_candidates(ann1.annotator, project, size=10) == [tasks[2].id, tasks[1].id, tasks[3].id]
+    assert get_next_task_candidates(ann1.annotator, project, size=2) == [tasks[2].id, tasks[1].id]
+
+
+@pytest.mark.skipif(not redis_healthcheck(), reason='Next task queue requires redis')
+@pytest.mark.django_db
+def test_next_task_queue(business_client, settings):
+    from projects.functions.next_task_queue import _queue_key, get_queue_version
+
+    settings.NEXT_TASK_QUEUE_ENABLED = True
+    project = make_project(
+        dict(title='test_next_task_queue', is_published=True, sampling=Project.SEQUENCE), business_client.user
+    )
+    tasks = [make_task({'data': {'text': f'this is {i}'}}, project) for i in range(3)]
+    ann1 = make_annotator({'email': 'ann1@testnexttaskqueue.com'}, project, True)
+
+    # the first call fills the queue, the next ones are served from it
+    r = ann1.get(f'/api/projects/{project.id}/next')
+    assert json.loads(r.content)['id'] == tasks[0].id
+    Task.objects.get(id=tasks[0].id).release_lock()
+    r = ann1.get(f'/api/projects/{project.id}/next')
+    assert json.loads(r.content)['queue'] == 'Prefetched queue'
+    assert json.loads(r.content)['id'] == tasks[0].id
+
+    # project update invalidates the queue
+    version = get_queue_version(project.id)
+    project.save()
+    assert get_queue_version(project.id) == version + 1
+    assert _queue_key(project.id, ann1.annotator.id, version) != _queue_key(project.id, ann1.annotator.id, version + 1)
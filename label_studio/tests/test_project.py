@@ -2,7 +2,8 @@ import json
 
 import pytest
 from django.db.models.query import QuerySet
-from tests.utils import make_project
+from tasks.models import Task
+from tests.utils import make_annotation, make_prediction, make_project, make_task
 from users.models import User
 
 
@@ -33,6 +34,40 @@ def test_update_tasks_counters_and_task_states(business_client):
     assert obj == 0
 
 
+@pytest.mark.django_db
+def test_update_tasks_counters_and_is_labeled(business_client, settings):
+    settings.UPDATE_TASKS_COUNTERS_CHUNK_SIZE = 2
+    project = make_project({}, business_client.user, use_ml_backend=False)
+    tasks = [make_task({'data': {'text': f'text {i}'}}, project) for i in range(5)]
+    user = business_client.user
+    make_annotation({'result': [], 'completed_by': user}, tasks[0].id)
+    make_annotation({'result': [], 'completed_by': user, 'was_cancelled': True}, tasks[1].id)
+    make_annotation({'result': [], 'completed_by': user}, tasks[3].id)
+    make_annotation({'result': [], 'completed_by': user}, tasks[3].id)
+    make_prediction({'result': []}, tasks[4].id)
+    # break counters and is_labeled which were maintained by signals
+    Task.objects.filter(project=project).update(
+        total_annotations=7, cancelled_annotations=7, total_predictions=7, is_labeled=False
+    )
+    Task.objects.filter(id=tasks[2].id).update(total_annotations=0, cancelled_annotations=0, total_predictions=0)
+
+    ids = [task.id for task in tasks]
+    assert project._update_tasks_counters_and_is_labeled(ids) == 4
+    counters = {
+        task['id']: task
+        for task in Task.objects.filter(project=project).values(
+            'id', 'total_annotations', 'cancelled_annotations', 'total_predictions', 'is_labeled'
+        )
+    }
+    assert [counters[i]['total_annotations'] for i in ids] == [1, 0, 0, 2, 0]
+    assert [counters[i]['cancelled_annotations'] for i in ids] == [0, 1, 0, 0, 0]
+    assert [counters[i]['total_predictions'] for i in ids] == [0, 0, 0, 0, 1]
+    assert [counters[i]['is_labeled'] for i in ids] == [True, False, False, True, False]
+
+    # nothing changed, nothing is written
+    assert project._update_tasks_counters_and_is_labeled(ids) == 0
+
+
 @pytest.mark.django_db
 def test_project_all_members(business_client):
     project = make_project({}, business_client.user, use_ml_backend=False)
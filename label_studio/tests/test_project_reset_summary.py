@@ -1,9 +1,12 @@
 import json
 
+import mock
 import pytest
-from tasks.models import Task
+from projects.functions.utils import compact_project_summary
+from projects.models import ProjectSummary, ProjectSummaryDelta
+from tasks.models import Annotation, AnnotationDraft, Task
 from tests.conftest import project_choices
-from tests.utils import make_project
+from tests.utils import make_annotation, make_project, make_task
 
 pytestmark = pytest.mark.django_db
 
@@ -146,3 +149,64 @@ def test_logged_out_user_cannot_reset_summary(business_client):
     assert r.status_code == 401
     assert 'detail' in (r_json := r.json())
     assert r_json['detail'] == 'Authentication credentials were not provided.'
+
+
+def test_summary_deltas_are_compacted(business_client):
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    task = make_task({'data': {'image': 'kittens.jpg'}}, project)
+
+    def result(*labels):
+        return [{'from_name': 'some', 'to_name': 'x', 'type': 'none', 'value': {'none': list(labels)}}]
+
+    # with redis, signals only append deltas and the compaction job is scheduled after commit
+    with mock.patch('projects.functions.utils.redis_connected', return_value=True), mock.patch(
+        'projects.functions.utils.transaction.on_commit'
+    ) as on_commit:
+        make_annotation({'result': result('Opossum'), 'completed_by': business_client.user}, task.id)
+        annotation = make_annotation(
+            {'result': result('Opossum', 'Mouse'), 'completed_by': business_client.user}, task.id
+        )
+        make_annotation({'result': result('Mouse'), 'completed_by': business_client.user}, task.id)
+        annotation.delete()
+    assert on_commit.called
+
+    summary = ProjectSummary.objects.get(project=project)
+    assert summary.created_labels == {}
+    assert ProjectSummaryDelta.objects.filter(project=project).exists()
+
+    # summary API returns the merged view
+    r = business_client.get(f'/api/projects/{project.id}/summary/')
+    assert r.status_code == 200
+    assert r.json()['created_labels'] == {'some': {'Opossum': 1, 'Mouse': 1}}
+    assert r.json()['created_annotations'] == {'some|x|none': 2}
+
+    compact_project_summary(project.id)
+    summary.refresh_from_db()
+    assert summary.created_labels == {'some': {'Opossum': 1, 'Mouse': 1}}
+    assert summary.created_annotations == {'some|x|none': 2}
+    assert not ProjectSummaryDelta.objects.filter(project=project).exists()
+
+
+def test_summary_keeps_counters_of_remaining_annotations_and_drafts(business_client):
+    project = make_project(project_choices(), business_client.user, use_ml_backend=False)
+    task = make_task({'data': {'image': 'kittens.jpg'}}, project)
+    result = [{'from_name': 'some', 'to_name': 'x', 'type': 'none', 'value': {'none': ['Opossum']}}]
+    annotations = [
+        make_annotation({'result': result, 'completed_by': business_client.user}, task.id) for _ in range(2)
+    ]
+    drafts = [AnnotationDraft.objects.create(task=task, user=business_client.user, result=result) for _ in range(2)]
+
+    # the last remaining annotation and draft are still counted
+    annotations[0].delete()
+    drafts[0].delete()
+    summary = ProjectSummary.objects.get(project=project)
+    assert summary.created_labels == {'some': {'Opossum': 1}}
+    assert summary.created_labels_drafts == {'some': {'Opossum': 1}}
+
+    # removing all of them resets the counters
+    project.summary.remove_created_annotations_and_labels(Annotation.objects.filter(project=project))
+    project.summary.remove_created_drafts_and_labels(AnnotationDraft.objects.filter(task__project=project))
+    summary.refresh_from_db()
+    assert summary.created_annotations == {}
+    assert summary.created_labels == {}
+    assert summary.created_labels_drafts == {}
@@ -141,6 +141,7 @@ def gcs_client_mock():
     class DummyGCSClient:
         def __init__(self, sample_json_contents=None, sample_blob_names=None):
             self.sample_blob_names = sample_blob_names or ['abc', 'def', 'ghi']
+            self._http = requests.Session()
 
         def get_bucket(self, bucket_name):
             is_json = bucket_name.endswith('_JSON')
@@ -161,7 +162,7 @@ def gcs_client_mock():
 def azure_client_mock(sample_json_contents=None, sample_blob_names=None):
     from collections import namedtuple
 
-    from io_storages.azure_blob import models
+    from io_storages.azure_blob import models, utils
 
     File = namedtuple('File', ['name'])
 
@@ -228,7 +229,7 @@ def azure_client_mock(sample_json_contents=None, sample_blob_names=None):
     # def dummy_generate_blob_sas(*args, **kwargs):
     #     return 'token'
 
-    with mock.patch.object(models.BlobServiceClient, 'from_connection_string', return_value=DummyAzureClient()):
+    with mock.patch.object(utils.BlobServiceClient, 'from_connection_string', return_value=DummyAzureClient()):
         with mock.patch.object(models, 'generate_blob_sas', return_value='token'):
             yield
 